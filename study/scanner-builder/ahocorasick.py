@@ -0,0 +1,270 @@
+##------------------------------------------------------------------------------
+##
+## ahocorasick.py -- Fast construction of scanners and searchers for sets of
+##                   literal keywords (reserved words, product codes, ...).
+##
+## An RE set made up entirely of literal strings ("if", "then", "else", ...)
+## needs none of the machinery of the general constructions: the DFA is just
+## the trie of the keywords.  Building it directly takes time proportional to
+## the total length of the keywords, where the NFA and subset route (with an
+## OuterChoiceNFA of thousands of branches) takes time roughly proportional to
+## its square, and builds a far bigger NFA along the way.
+##
+## The trie is also the basis of the Aho-Corasick string-matching automaton
+## (Aho & Corasick, "Efficient String Matching", CACM 18(6), 1975), which
+## finds every occurrence of every keyword in a text in a single pass.  The
+## failure links of Aho-Corasick are compiled into a DFA transition table
+## here, so the search never follows failure links at run time: each
+## character costs at most two dictionary lookups.
+##
+## Functions:
+##
+##          literalREs(regExpressions)
+##                  -- If every RE in regExpressions (given as for parseREs)
+##                     is a literal string, return the list of strings,
+##                     otherwise return None.
+##
+##          keywordDFA(keywords)
+##                  -- Return the DFA (the trie) recognising a list of
+##                     keyword strings, usable exactly like one built by
+##                     subset (scan, minimiseDFA, output_table etc.).  As
+##                     with parseREs, if a keyword appears more than once,
+##                     the first occurrence has priority.
+##
+## Class:
+##
+##          AhoCorasick(keywords)
+##                  -- An Aho-Corasick searcher for a list of keywords.
+##
+##              methods: finditer -- generate (start,end,keyword) for every
+##                                   occurrence of a keyword in a text,
+##                                   overlapping ones included.
+##                       findall  -- the same, as a list.
+##                       scan     -- anchored tokenisation, as DFA.scan.
+##
+## N.B. The keywords given to keywordDFA and AhoCorasick are plain strings,
+## not REs, so they may contain any characters ('*', '|' etc. included).
+##
+##
+from retree import parseTrees, Char, Concat
+from dfa import DFA, nameDFAStates
+from state import DFAState
+
+
+##------------------------------------------------------------------------------
+##
+## literalREs: detect an all-literal RE set (see header).
+##
+##
+def literalREs(regExpressions):
+    "Return the REs as plain strings if they are all literals, else None."
+    if isinstance(regExpressions,basestring): regExpressions = regExpressions.split()
+    for regExpr in regExpressions:
+        for ch in "|*()":
+            if ch in regExpr: return None
+    trees = parseTrees(list(regExpressions))
+    if trees is None: return None
+    keywords = []
+    for tree in trees:
+        if isinstance(tree,Char): keywords.append(tree.ch)
+        elif isinstance(tree,Concat) and all(isinstance(item,Char) for item in tree.items):
+            keywords.append("".join([item.ch for item in tree.items]))
+        else: return None
+    return keywords
+
+
+##------------------------------------------------------------------------------
+##
+## buildTrie: build the trie of a list of keywords.  Returns (goto,accepts),
+## where goto is a list, indexed by trie node (0 is the root), of dictionaries
+## mapping characters to child nodes, and accepts is a list, indexed by node,
+## of the index of the (first) keyword ending at that node, or None.  Nodes
+## are numbered in the order they are created.
+##
+##
+def buildTrie(keywords):
+    "Build the trie of a list of keywords."
+    goto = [{}]
+    accepts = [None]
+    for i,keyword in enumerate(keywords):
+        node = 0
+        for ch in keyword:
+            child = goto[node].get(ch)
+            if child is None:
+                child = len(goto)
+                goto[node][ch] = child
+                goto.append({})
+                accepts.append(None)
+            node = child
+        if accepts[node] is None: accepts[node] = i
+    return goto,accepts
+
+
+def breadthFirst(goto):
+    "Return the nodes of a trie in breadth-first order (children in character order)."
+    order = [0]
+    index = 0
+    while index < len(order):
+        for ch in sorted(goto[order[index]]): order.append(goto[order[index]][ch])
+        index += 1
+    return order
+
+
+##------------------------------------------------------------------------------
+##
+## keywordDFA: the trie as a DFA (see header).  States are named, as by
+## subset, in breadth-first order.
+##
+##
+def keywordDFA(keywords):
+    "Build a DFA recognising a list of literal keywords."
+    keywords = list(keywords)
+    goto,accepts = buildTrie(keywords)
+    order = breadthFirst(goto)
+    dfaStates = [DFAState("") for node in goto]
+    dfa = DFA()
+    for node in order:
+        aDFAState = dfaStates[node]
+        aDFAState.stateSet = TrieNode(node)
+        for ch in sorted(goto[node]):
+            aDFAState.successors.append((ch,dfaStates[goto[node][ch]],None))
+            dfa.alphabet.add(ch)
+        if accepts[node] is not None:
+            dfa.finalStates.append(aDFAState)
+            dfa.regExprs.append(keywords[accepts[node]])
+    dfaStateList = [dfaStates[node] for node in order]
+    nameDFAStates(dfaStateList)
+    dfa.startState = dfaStateList[0]
+    dfa.stateCount = len(dfaStateList)
+    return dfa
+
+
+##------------------------------------------------------------------------------
+##
+## TrieNode is the "stateSet" of the DFA states built by keywordDFA: just the
+## number of the trie node, printed like a one-element state set.
+##
+##
+class TrieNode(int):
+    def __str__(this):
+        return this.toString()
+
+    def toString(this,laTeX=False):
+        if laTeX: return "\\{%d\\}" % this
+        return "{%d}" % this
+
+
+##------------------------------------------------------------------------------
+##
+## AhoCorasick (see header).  Fields are:
+##
+##    keywords:  The keywords, as given.
+##
+##    goto:      The trie (see buildTrie).
+##
+##    accepts:   Per node, the keyword ending there (see buildTrie).
+##
+##    rootRow:   The transition row of the root, mapping each character that
+##               begins a keyword to its node.  Any other character leads
+##               (from the root, or wherever "table" has no entry for it)
+##               back to the root.
+##
+##    table:     The rest of the compiled transition table.  table[node] maps
+##               a character to the next node only where that differs from
+##               rootRow, so the complete table costs little more memory
+##               than the trie, while the next node is still found with (at
+##               most) two dictionary lookups.
+##
+##    fail:      The failure link of each node: the node for the longest
+##               proper suffix of its string that is also in the trie.
+##
+##    outLink:   For each node, the nearest node on its failure chain (not
+##               counting itself) at which a keyword ends, or None.  Every
+##               keyword occurring at a point in the text is found by
+##               following these links from the current node.
+##
+##
+class AhoCorasick(object):
+    "An Aho-Corasick automaton, compiled to a DFA table, for a list of keywords."
+    def __init__(this,keywords):
+        this.keywords = list(keywords)
+        this.goto,this.accepts = buildTrie(this.keywords)
+        this.rootRow = dict(this.goto[0])
+        this.table = [{}] * len(this.goto)
+        this.fail = [0] * len(this.goto)
+        this.outLink = [None] * len(this.goto)
+        this.compile()
+
+    def compile(this):
+        """Compute the failure links, output links and compiled transition table.
+           Nodes are taken in breadth-first order, so the failure link of a node
+           (which is always shallower) has its row complete before it is needed."""
+        goto = this.goto
+        rootRow = this.rootRow
+        for node in breadthFirst(goto):
+            if node == 0: failRow = row = {}
+            else:
+                failRow = this.table[this.fail[node]]
+                row = dict(failRow)
+            for ch,child in goto[node].iteritems():
+                if node != 0: this.fail[child] = failRow.get(ch,rootRow.get(ch,0))
+                target = this.fail[child]
+                if this.accepts[target] is not None: this.outLink[child] = target
+                else: this.outLink[child] = this.outLink[target]
+                row[ch] = child
+            for ch in [ch for ch in row if row[ch] == rootRow.get(ch,0)]: del row[ch]
+            this.table[node] = row
+
+    def next(this,node,ch):
+        "Return the node reached from node on character ch."
+        row = this.table[node]
+        if ch in row: return row[ch]
+        return this.rootRow.get(ch,0)
+
+    def finditer(this,text):
+        """Generate (start,end,keyword) for every occurrence of every keyword in
+           text, in order of end position (longest first for the same end)."""
+        table = this.table
+        rootRow = this.rootRow
+        accepts = this.accepts
+        outLink = this.outLink
+        keywords = this.keywords
+        node = 0
+        for end,ch in enumerate(text):
+            row = table[node]
+            if ch in row: node = row[ch]
+            else: node = rootRow.get(ch,0)
+            if accepts[node] is not None: found = node
+            else: found = outLink[node]
+            while found is not None:
+                keyword = keywords[accepts[found]]
+                yield end + 1 - len(keyword),end + 1,keyword
+                found = outLink[found]
+
+    def findall(this,text):
+        "Return a list of (start,end,keyword) for every keyword occurrence in text."
+        return list(this.finditer(text))
+
+    def scan(this,text):
+        """Tokenise text from its start, taking the longest keyword at each
+           point, exactly as DFA.scan does with the DFA from keywordDFA.
+           Returns a list of (keyword,matched-string) tuples."""
+        goto = this.goto
+        accepts = this.accepts
+        matches = []
+        start = 0
+        while True:
+            node = 0
+            matched = accepts[0]
+            end = start
+            i = start
+            while i < len(text):
+                node = goto[node].get(text[i])
+                if node is None: break
+                i += 1
+                if accepts[node] is not None: matched,end = accepts[node],i
+            if matched is None: break
+            matches.append((this.keywords[matched],text[start:end]))
+            if end == start: break
+            start = end
+        return matches
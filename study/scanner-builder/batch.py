@@ -0,0 +1,290 @@
+##------------------------------------------------------------------------------
+##
+## batch.py -- Build DFAs for many independent RE sets at once, in a pool of
+##             worker processes.
+##
+## Each RE set (a "job": one tenant's token set, one log format ...) is built
+## completely independently of the others, so a batch of them can be spread
+## over all the machine's cores.  A worker builds the DFA for a job (with
+## buildDFA, see builder.py), minimises it, and hands it back in the binary
+## interchange format of fabin.py: a single string, far cheaper to pickle and
+## send between processes than a graph of State objects, and ready to be
+## written to a file as it is.
+##
+## Each job is timed in its worker, and a job that fails (a syntax error in
+## an RE, an unknown engine, or any exception raised while building) is
+## reported in its result without affecting the others.
+##
+## Manifest format.  A batch can be read from a manifest file, one job per
+## line:
+##
+##     <name>  <re1> <re2> ... <reN>
+##
+## The name and the REs are separated by white space (so, as on the
+## command-line of re2nfa, an RE can't contain a space).  Blank lines and
+## lines starting with '#' are ignored.
+##
+## Use:
+##
+##     From the command-line:
+##
+##       $ ./batch.py [<option(s)>] <manifest>
+##       $ ./scanbuild.py batch [<option(s)>] <manifest>
+##
+##     where <option(s)> are
+##
+##       -h or -help  Help
+##       -j <n>       Use n worker processes (default: one per CPU).  With
+##                    "-j 1" the jobs are built in this process.
+##       -engine <e>  The DFA construction engine (see builder.py, default
+##                    "subset").
+##       -nomin       Don't minimise the DFAs.
+##       -o <dir>     Write each DFA to <dir>/<name>.fab, in binary format.
+##
+##     A line is printed for each job, in manifest order, with its time,
+##     the size of its DFA or its error, and then a summary of the batch.
+##
+## Functions:
+##
+##          readManifest(stream)
+##                  -- Read a manifest from a file object, returning a list
+##                     of (name,regExprs) pairs, or None if it is badly
+##                     formed (which is reported).
+##
+##          buildBatch(jobs,processes=None,engine="subset",minimise=True)
+##
+##              Arguments:
+##
+##                  jobs - A list of (name,regExpressions) pairs, where
+##                         regExpressions is as for parseREs.
+##
+##                  processes - The number of worker processes (None for one
+##                         per CPU).  If 1, the jobs are built in this
+##                         process, one after another.
+##
+##                  engine, minimise - As for buildDFA.
+##
+##              Returns: a list of BatchResult objects, one per job, in the
+##                       order of the jobs.
+##
+## Class:
+##
+##          BatchResult
+##
+##              fields:  name, regExprs -- The job.
+##                       data    -- The DFA in binary format (see fabin.py),
+##                                  or None if the job failed.
+##                       states  -- The number of states of the DFA.
+##                       seconds -- The time the job took in its worker.
+##                       error   -- None, or the reason the job failed.
+##
+##              methods: dfa -- the DFA, rebuilt from data.
+##
+##
+import sys
+import time
+
+
+##------------------------------------------------------------------------------
+##
+## BatchResult (see header).
+##
+##
+class BatchResult(object):
+    "The result of building one job of a batch."
+    def __init__(this,name,regExprs,data,states,seconds,error):
+        this.name = name
+        this.regExprs = regExprs
+        this.data = data
+        this.states = states
+        this.seconds = seconds
+        this.error = error
+
+    def dfa(this):
+        "Rebuild the DFA from its binary form (None if the job failed)."
+        if this.data is None: return None
+        from fabin import loads
+        return loads(this.data)
+
+
+##------------------------------------------------------------------------------
+##
+## buildJob: build one job, in a worker.  Anything printed while building
+## (syntax errors are reported that way) is caught, and is the job's error:
+## a job that prints anything fails, even if a DFA results.  Returns (index,data,states,seconds,error), plain
+## values, so the result pickles small.
+##
+##
+def buildJob(args):
+    "Build the DFA for one job of a batch, returning it in binary format."
+    index,regExprs,engine,minimise = args
+    from StringIO import StringIO
+    from builder import buildDFA
+    from fabin import dumps
+    startTime = time.time()
+    stdout = sys.stdout
+    sys.stdout = messages = StringIO()
+    data,states,error = None,0,None
+    try:
+        try:
+            dfa = buildDFA(regExprs,engine,minimise)
+            error = messages.getvalue().strip() or None
+            if dfa is None: error = error or "no DFA built"
+            elif error is None: data,states = dumps(dfa),dfa.stateCount
+        except Exception, e:
+            error = "%s: %s" % (e.__class__.__name__,e)
+    finally:
+        sys.stdout = stdout
+    return index,data,states,time.time() - startTime,error
+
+
+##------------------------------------------------------------------------------
+##
+## buildBatch (see header).  Jobs are handed to the workers one at a time,
+## as each becomes free, since their sizes vary a lot.
+##
+##
+def buildBatch(jobs,processes=None,engine="subset",minimise=True):
+    "Build a DFA for each of a list of (name,regExprs) jobs, in a process pool."
+    tasks = [(i,regExprs,engine,minimise) for i,(name,regExprs) in enumerate(jobs)]
+    if processes == 1 or len(tasks) <= 1:
+        outcomes = [buildJob(task) for task in tasks]
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+        try:
+            outcomes = list(pool.imap_unordered(buildJob,tasks))
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    results = [None] * len(jobs)
+    for index,data,states,seconds,error in outcomes:
+        name,regExprs = jobs[index]
+        results[index] = BatchResult(name,regExprs,data,states,seconds,error)
+    return results
+
+
+##------------------------------------------------------------------------------
+##
+## readManifest (see header).
+##
+##
+def readManifest(stream):
+    "Read a batch manifest, returning a list of (name,regExprs) pairs, or None."
+    jobs = []
+    names = set()
+    for lineNumber,line in enumerate(stream):
+        fields = line.split()
+        if not fields or fields[0].startswith('#'): continue
+        if len(fields) < 2:
+            print "Manifest Error: line %d: job '%s' has no REs" % (lineNumber+1,fields[0])
+            return None
+        if fields[0] in names:
+            print "Manifest Error: line %d: job name '%s' used twice" % (lineNumber+1,fields[0])
+            return None
+        names.add(fields[0])
+        jobs.append((fields[0],fields[1:]))
+    return jobs
+
+
+##------------------------------------------------------------------------------
+##
+## Command-line handling.
+##
+##
+def processArgs(argList):
+    processes,engine,minimise,outputDir = None,"subset",True,None
+    argList = list(argList)
+    try:
+        while len(argList) > 0 and argList[0].startswith('-'):
+            option = argList.pop(0)
+            if option.startswith("-h"):
+                print_help_text()
+                return
+            elif option == "-j":        processes = int(argList.pop(0))
+            elif option == "-engine":   engine = argList.pop(0)
+            elif option == "-nomin":    minimise = False
+            elif option == "-o":        outputDir = argList.pop(0)
+            else:
+                print "Unknown option: %s" % option
+                print_help_text()
+                return
+    except (IndexError,ValueError):
+        print "Missing or bad argument for option %s" % option
+        print_help_text()
+        return
+    if len(argList) != 1:
+        print "No manifest file given"
+        print_help_text()
+        return
+    if processes is not None and processes < 1:
+        print "The number of processes must be at least 1"
+        return
+    try:
+        stream = open(argList[0])
+    except IOError, e:
+        print "Can't read manifest file: %s" % e
+        print_help_text()
+        return
+    try: jobs = readManifest(stream)
+    finally: stream.close()
+    if jobs is None: return
+
+    startTime = time.time()
+    results = buildBatch(jobs,processes,engine,minimise)
+    elapsed = time.time() - startTime
+
+    import os
+    failures = 0
+    for result in results:
+        if result.error is not None:
+            failures += 1
+            print "%-20s FAILED  %8.1f ms  %s" % (result.name,1000*result.seconds,
+                                                result.error.replace("\n","; "))
+            continue
+        print "%-20s ok      %8.1f ms  %5d states  %7d bytes" % \
+              (result.name,1000*result.seconds,result.states,len(result.data))
+        if outputDir is not None:
+            output = open(os.path.join(outputDir,result.name + ".fab"),"wb")
+            try: output.write(result.data)
+            finally: output.close()
+    busy = sum([result.seconds for result in results])
+    print "%d jobs, %d failed: %.1f ms elapsed, %.1f ms in jobs (%.1fx)" % \
+          (len(results),failures,1000*elapsed,1000*busy,busy/max(elapsed,1e-9))
+
+
+def print_help_text():
+    print """    Use:
+
+         From the command-line
+
+           $ ./batch.py [<option(s)>] <manifest>
+
+         where <manifest> is a file with one job per line, a name
+         followed by the job's REs, e.g.,
+
+           ident    [a-z][a-z0-9]*  [0-9][0-9]*
+           keywords if then else
+
+         and <option(s)> are
+
+           -h        Help
+           -j <n>    Use n worker processes (default: one per CPU).
+           -engine <e>
+                     DFA construction engine: subset, factored,
+                     glushkov, followpos, derivative, keywords or
+                     auto.
+           -nomin    Don't minimise the DFAs.
+           -o <dir>  Write each DFA to <dir>/<name>.fab in binary
+                     format (see fabin.py).
+
+         A line is printed per job with its time and DFA size (or
+         its error), followed by a summary.
+    """
+
+
+if __name__ == "__main__":
+    processArgs(sys.argv[1:])
@@ -0,0 +1,126 @@
+##------------------------------------------------------------------------------
+##
+## builder.py -- Build a DFA for a list of regular expressions, with a choice
+##               of construction engine.
+##
+## All the engines build equivalent DFAs (they scan identically, and give the
+## same minimal DFA after minimiseDFA), but they differ a good deal in speed
+## and in the size of the unminimised DFA, depending on the REs.  This module
+## gives them a common interface, so that the cheapest one for a given RE set
+## can be picked.
+##
+## Engines:
+##
+##     "subset"     -- parseREs -> NFA -> subset construction.  The original
+##                     route, and the one the command-line tools use.
+##     "factored"   -- As "subset", but with the literal prefixes of the REs
+##                     shared in a trie at the front of the NFA
+##                     (FactoredChoiceNFA, see nfa.py).
+##     "glushkov"   -- The epsilon-free Glushkov NFA of glushkov.py -> subset.
+##     "followpos"  -- The followpos (position) construction, followpos.py.
+##     "derivative" -- Brzozowski derivatives, derivative.py.
+##     "keywords"   -- For sets of literal strings only: the keyword trie,
+##                     ahocorasick.py.  Far faster than any of the above for
+##                     big keyword sets.
+##     "auto"       -- "keywords" if the REs are all literal strings,
+##                     otherwise "followpos".
+##
+## Function:
+##
+##          buildDFA(regExpressions,engine="subset",minimise=False)
+##
+##              Arguments:
+##
+##                  regExpressions - As for parseREs: either a string
+##                            containing a number of (space-separated) REs,
+##                            or a list of strings, each holding one RE.
+##
+##                  engine - The name of the engine to use (see above).
+##
+##                  minimise - A boolean.  If True, minimise the DFA (with
+##                            its states renamed in order) before returning
+##                            it.
+##
+##              Returns: a DFA object, or None if there is a syntax error in
+##                       an RE or the engine name is not known.
+##
+## ENGINES is a dictionary mapping each engine name to a function taking the
+## REs and returning a DFA (or None).
+##
+##
+from dfa import subset
+from dfamin import minimiseDFA
+
+
+def subsetEngine(regExpressions):
+    "Build a DFA via a Thompson-style NFA and the subset construction."
+    from re2nfa import parseREs
+    nfa = parseREs(regExpressions)
+    if nfa is None: return None
+    return subset(nfa,verbose=False)
+
+
+def factoredEngine(regExpressions):
+    "Build a DFA via a prefix-factored NFA and the subset construction."
+    from re2nfa import parseREs
+    nfa = parseREs(regExpressions,factor=True)
+    if nfa is None: return None
+    return subset(nfa,verbose=False)
+
+
+def glushkovEngine(regExpressions):
+    "Build a DFA via the (epsilon-free) Glushkov NFA and the subset construction."
+    from glushkov import glushkovNFA
+    nfa = glushkovNFA(regExpressions)
+    if nfa is None: return None
+    return subset(nfa,verbose=False)
+
+
+def followposEngine(regExpressions):
+    "Build a DFA using the followpos construction."
+    from followpos import followposDFA
+    return followposDFA(regExpressions)
+
+
+def derivativeEngine(regExpressions):
+    "Build a DFA using Brzozowski derivatives."
+    from derivative import derivativeDFA
+    return derivativeDFA(regExpressions)
+
+
+def keywordsEngine(regExpressions):
+    "Build a DFA (a trie) for a set of literal REs."
+    from ahocorasick import literalREs, keywordDFA
+    keywords = literalREs(regExpressions)
+    if keywords is None:
+        print "The keywords engine needs REs that are all literal strings."
+        return None
+    return keywordDFA(keywords)
+
+
+def autoEngine(regExpressions):
+    "Pick the keywords engine for a literal RE set, otherwise followpos."
+    from ahocorasick import literalREs, keywordDFA
+    keywords = literalREs(regExpressions)
+    if keywords is not None: return keywordDFA(keywords)
+    return followposEngine(regExpressions)
+
+
+ENGINES = {"subset":     subsetEngine,
+           "factored":   factoredEngine,
+           "glushkov":   glushkovEngine,
+           "followpos":  followposEngine,
+           "derivative": derivativeEngine,
+           "keywords":   keywordsEngine,
+           "auto":       autoEngine}
+
+
+def buildDFA(regExpressions,engine="subset",minimise=False):
+    "Build a DFA for a list of REs using the named construction engine."
+    if not engine in ENGINES:
+        print "Unknown DFA construction engine '%s' (known engines are %s)." % \
+              (engine,", ".join(sorted(ENGINES)))
+        return None
+    dfa = ENGINES[engine](regExpressions)
+    if dfa is not None and minimise: dfa = minimiseDFA(dfa,reorder=True)
+    return dfa
@@ -0,0 +1,265 @@
+#!/usr/bin/python
+##------------------------------------------------------------------------------
+##
+## compileserver.py -- A long-running compile server for the scanner-builder
+##                     tools, listening on a Unix domain socket.
+##
+## A build that runs the tools thousands of times pays, every time, for
+## starting Python and importing the tools, and builds the same DFAs over
+## and over.  The server is started once; it imports the tools, then runs
+## the commands sent to it by scanclient.py (which see, for the wire format)
+## in the same process, so a request costs only the work of the command
+## itself.  The DFAs built by "re2dfa" commands are kept in an LRU cache,
+## keyed by the REs and the options they were built with, so a request to
+## output or scan with a DFA built recently doesn't build it again.
+##
+## Each connection is served by its own thread (SocketServer.ThreadingMixIn),
+## so any number of clients can be connected at once, each being read from
+## and answered independently.  The commands themselves run one at a time:
+## the tools report on sys.stdout, and keep module-level state (e.g., the
+## intern table of RE syntax tree nodes, retree.py), so the server takes a
+## lock and redirects the standard streams to buffers around each command.
+## (Python 2 has no asyncio; and, with the interpreter lock, running the
+## commands in threads at once would not make them faster.)
+##
+## The socket is created readable and writable by its owner only.
+##
+## Use:
+##
+##     From the command-line:
+##
+##       $ ./compileserver.py [-socket <path>] [-cache <n>]
+##
+##     where
+##
+##       -h or -help     Help
+##       -socket <path>  The socket to listen on (default: as for
+##                       scanclient.py, $SCANBUILD_SOCKET or
+##                       /tmp/scanbuild-<uid>.sock).
+##       -cache <n>      Keep up to n DFAs in memory (default 64).
+##
+##     The server runs until it is sent a "stop" request
+##     ("scanclient.py -stop") or is interrupted.
+##
+## Classes:
+##
+##          DFACache(size)
+##
+##              methods: get -- get(key), the DFA for a key (None if it isn't
+##                              in the cache).
+##                       put -- put(key,dfa), add a DFA, dropping the least
+##                              recently used if the cache is full.
+##
+##              fields:  hits, misses -- counts of get calls.
+##
+##          CompileServer(path,cacheSize=DEFAULT_CACHE_SIZE)
+##
+##              A SocketServer.UnixStreamServer serving scanclient requests.
+##
+##              methods: run -- run(command,args,stdin), run a scanbuild
+##                              command, returning (status,stdout,stderr).
+##                       serve_forever, shutdown -- as for any SocketServer.
+##
+##
+import os
+import sys
+import socket
+import threading
+import SocketServer
+from collections import OrderedDict
+from StringIO import StringIO
+from scanclient import socketPath, readFields, writeFields
+
+DEFAULT_CACHE_SIZE = 64
+PRELOAD = ("re2nfa","nfa2dfa","re2dfa","builder","dfamin","fabin")
+
+
+##------------------------------------------------------------------------------
+##
+## DFACache (see header).
+##
+##
+class DFACache(object):
+    "A least-recently-used cache of DFAs."
+    def __init__(this,size=DEFAULT_CACHE_SIZE):
+        this.size = size
+        this.entries = OrderedDict()
+        this.hits = this.misses = 0
+
+    def get(this,key):
+        "Return the DFA for a key, or None."
+        dfa = this.entries.pop(key,None)
+        if dfa is None:
+            this.misses += 1
+            return None
+        this.hits += 1
+        this.entries[key] = dfa         ## Now the most recently used.
+        return dfa
+
+    def put(this,key,dfa):
+        "Add a DFA to the cache."
+        this.entries.pop(key,None)
+        this.entries[key] = dfa
+        while len(this.entries) > this.size: this.entries.popitem(last=False)
+
+
+##------------------------------------------------------------------------------
+##
+## CompileServer (see header).  A stale socket file (one left by a server
+## that is no longer running) is removed before binding.
+##
+##
+class CompileServer(SocketServer.ThreadingMixIn,SocketServer.UnixStreamServer):
+    "Runs scanbuild commands for scanclient.py, keeping DFAs warm."
+    daemon_threads = True
+
+    def __init__(this,path,cacheSize=DEFAULT_CACHE_SIZE):
+        this.path = path
+        this.cache = DFACache(cacheSize)
+        this.lock = threading.Lock()
+        this.requests = 0
+        for module in PRELOAD: __import__(module)
+        if os.path.exists(path):
+            if isListening(path): raise socket.error, "a server is already listening on %s" % path
+            os.unlink(path)
+        mask = os.umask(077)
+        try: SocketServer.UnixStreamServer.__init__(this,path,CompileRequestHandler)
+        finally: os.umask(mask)
+
+    def run(this,command,args,stdin=""):
+        "Run a scanbuild command, returning (status,stdout,stderr)."
+        output,errors = StringIO(),StringIO()
+        status = 0
+        with this.lock:
+            this.requests += 1
+            streams = sys.stdin,sys.stdout,sys.stderr
+            sys.stdin,sys.stdout,sys.stderr = StringIO(stdin),output,errors
+            try:
+                try:
+                    this.dispatch(command,args)
+                except SystemExit, e:
+                    if isinstance(e.code,int): status = e.code
+                    elif e.code is not None: status = 1
+                except Exception:
+                    import traceback
+                    traceback.print_exc()
+                    status = 1
+            finally:
+                sys.stdin,sys.stdout,sys.stderr = streams
+        return status,output.getvalue(),errors.getvalue()
+
+    def dispatch(this,command,args):
+        "Run a command, with the standard streams redirected."
+        from scanbuild import COMMANDS, importCommand
+        if command == "re2dfa":
+            from re2dfa import parseOptions, run
+            options = parseOptions(args)
+            if options is not None: run(options,this.cache)
+        elif command in COMMANDS:
+            importCommand(command).processArgs(list(args))
+        else:
+            print "Unknown command: %s" % command
+
+    def statistics(this):
+        "Return a line of statistics about the requests served."
+        return "%d requests; %d DFAs cached (of %d), %d hits, %d misses\n" % \
+               (this.requests,len(this.cache.entries),this.cache.size,
+                this.cache.hits,this.cache.misses)
+
+
+class CompileRequestHandler(SocketServer.StreamRequestHandler):
+    "Reads a request from a client, runs it and sends back the result."
+    def handle(this):
+        try:
+            fields = readFields(this.rfile)
+        except (ValueError,EOFError):
+            return                          ## Badly-formed request.
+        if fields is None or len(fields) < 2: return
+        command,stdin,args = fields[0],fields[1],fields[2:]
+        if command == "stats":
+            writeFields(this.wfile,["0",this.server.statistics(),""])
+        elif command == "stop":
+            writeFields(this.wfile,["0","",""])
+            threading.Thread(target=this.server.shutdown).start()
+        else:
+            status,output,errors = this.server.run(command,args,stdin)
+            writeFields(this.wfile,[str(status),output,errors])
+
+
+def isListening(path):
+    "Return True if a server is accepting connections on the socket at path."
+    sock = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+    try:
+        try: sock.connect(path)
+        except socket.error: return False
+        return True
+    finally:
+        sock.close()
+
+
+##------------------------------------------------------------------------------
+##
+## Command-line handling.
+##
+##
+def processArgs(argList):
+    path,cacheSize = None,DEFAULT_CACHE_SIZE
+    argList = list(argList)
+    try:
+        while len(argList) > 0:
+            option = argList.pop(0)
+            if option.startswith("-h"):
+                print_help_text()
+                return
+            elif option == "-socket":   path = argList.pop(0)
+            elif option == "-cache":    cacheSize = int(argList.pop(0))
+            else:
+                print "Unknown option: %s" % option
+                print_help_text()
+                return
+    except (IndexError,ValueError):
+        print "Missing or bad argument for option %s" % option
+        print_help_text()
+        return
+    if path is None: path = socketPath()
+    try:
+        server = CompileServer(path,cacheSize)
+    except socket.error, e:
+        print "Can't listen on %s: %s" % (path,e)
+        return
+    print "Compile server listening on %s" % path
+    sys.stdout.flush()
+    try:
+        try: server.serve_forever()
+        except KeyboardInterrupt: pass
+    finally:
+        server.server_close()
+        if os.path.exists(path): os.unlink(path)
+
+
+def print_help_text():
+    print """    Use:
+
+         From the command-line
+
+           $ ./compileserver.py [-socket <path>] [-cache <n>]
+
+         Run a compile server, which runs scanbuild commands sent by
+         scanclient.py without starting Python each time, and keeps
+         the DFAs built by "re2dfa" in memory.
+
+         where
+
+           -h        Help
+           -socket <path>
+                     The socket to listen on (default $SCANBUILD_SOCKET,
+                     or /tmp/scanbuild-<uid>.sock).
+           -cache <n>
+                     Keep up to n DFAs in memory (default 64).
+
+         Stop the server with "scanclient.py -stop".
+    """
+
+
+if __name__ == "__main__":
+    processArgs(sys.argv[1:])
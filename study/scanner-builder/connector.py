@@ -124,3 +124,18 @@ class CurvedNFA(Connector):
         ex = c2x + this.endPoint[0]
         ey = c2y + this.endPoint[1]
         paper.drawCurve(sx,sy,c1x,c1y,c2x,c2y,ex,ey)
+
+
+##
+## Parallel is a connector that draws nothing.  It is used for all but one of
+## a group of transitions between the same two states (e.g., those of a
+## ClassNFA, one per character of a class), which are drawn as a single
+## labelled arrow by the first transition's connector.
+##
+class Parallel(Connector):
+    "A transition drawn by another connector between the same two states."
+    def __repr__(this):
+        return "Parallel (drawn with another connector)."
+
+    def draw(this,state,paper):
+        pass
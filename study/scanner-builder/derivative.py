@@ -0,0 +1,216 @@
+##------------------------------------------------------------------------------
+##
+## derivative.py -- Direct construction of a DFA from regular expressions
+##                  using Brzozowski derivatives.
+##
+## The derivative of an RE r with respect to a character c is an RE matching
+## every string s such that cs is matched by r.  Each DFA state here *is* an
+## RE (or rather, a vector of REs, one per RE being scanned for): the start
+## state is the vector of the original REs, and the transition on c goes to
+## the vector of their derivatives with respect to c.  A state accepts RE i
+## if the i'th element of its vector matches the empty string.  As with the
+## NFA route, if more than one RE is accepted the earliest in the list has
+## priority.
+##
+## REs are built with the hash-consing smart constructors of retree.py, so
+## that a state's vector can be looked up in constant time, and so that the
+## simplifications they make (r|r = r etc.) keep the number of different
+## derivatives, and hence the number of DFA states, finite.  The DFA built
+## is usually close to minimal, but is not guaranteed to be so.
+##
+## Rather than trying every character of the alphabet in every state, the
+## alphabet is split into "derivative classes": sets of characters that are
+## known to give the same derivative for every element of a state's vector.
+## One derivative is calculated per class, and characters which can not
+## begin a match of any element are skipped altogether (they lead to the
+## dead state, which is never built).
+##
+## Functions:
+##
+##          derivativeDFA(regExpressions,verbose=False)
+##
+##              Arguments:
+##
+##                  regExpressions - As for parseREs: either a string
+##                            containing a number of (space-separated) REs,
+##                            or a list of strings, each holding one RE.
+##
+##                  verbose - A boolean.  If True, print the RE vector for
+##                            each DFA state.
+##
+##              Returns: a DFA object (or None if there is a syntax error
+##                       in an RE), usable exactly like one built by subset.
+##                       The "stateSet" of each DFAState is the REVector
+##                       from which it was built.
+##
+##          derivative(tree,ch)    -- The derivative of a syntax tree with
+##                                    respect to character ch.
+##
+##          derivativeClasses(trees)
+##                                 -- The derivative classes (as a list of
+##                                    frozensets of characters) for a list of
+##                                    syntax trees.
+##
+##
+from retree import parseTrees, Char, CharClass, Alt, Concat, Star, EMPTY, EPSILON, alt, cat
+from dfa import DFA, nameDFAStates
+from state import DFAState
+
+
+##------------------------------------------------------------------------------
+##
+## derivative: the derivative of a syntax tree with respect to a character.
+## Derivatives are memoised in a dictionary on each (hash-consed) node, so
+## each is only ever calculated once.
+##
+##
+def derivative(tree,ch):
+    "Return the derivative of a syntax tree with respect to a character."
+    cache = getattr(tree,"derivatives",None)
+    if cache is None: cache = tree.derivatives = {}
+    result = cache.get(ch)
+    if result is None:
+        result = cache[ch] = calculateDerivative(tree,ch)
+    return result
+
+
+def calculateDerivative(tree,ch):
+    "Calculate the derivative of a syntax tree with respect to a character."
+    if isinstance(tree,Char):
+        if tree.ch == ch: return EPSILON
+        return EMPTY
+    if isinstance(tree,CharClass) and tree.chars is not None:
+        if ch in tree.chars: return EPSILON
+        return EMPTY
+    if isinstance(tree,Alt):
+        return alt([derivative(item,ch) for item in tree.items])
+    if isinstance(tree,Concat):
+        head,rest = tree.items[0],cat(tree.items[1:])
+        result = cat([derivative(head,ch),rest])
+        if head.nullable(): result = alt([result,derivative(rest,ch)])
+        return result
+    if isinstance(tree,Star):
+        return cat([derivative(tree.item,ch),tree])
+    return EMPTY    ## Empty and Epsilon.
+
+
+##------------------------------------------------------------------------------
+##
+## Derivative classes.  "firstSets" returns a list of character sets such that
+## two characters lying in exactly the same sets give the same derivative of
+## the tree.  Characters in none of the sets give the empty derivative.
+## "derivativeClasses" refines the sets of a number of trees into disjoint
+## classes.
+##
+##
+def firstSets(tree):
+    "Return the character sets that distinguish the derivatives of a tree."
+    if isinstance(tree,Char): return [frozenset(tree.ch)]
+    if isinstance(tree,CharClass) and tree.chars is not None: return [tree.chars]
+    if isinstance(tree,Alt):
+        sets = []
+        for item in tree.items: sets.extend(firstSets(item))
+        return sets
+    if isinstance(tree,Concat):
+        sets = []
+        for item in tree.items:
+            sets.extend(firstSets(item))
+            if not item.nullable(): break
+        return sets
+    if isinstance(tree,Star): return firstSets(tree.item)
+    return []       ## Empty and Epsilon.
+
+
+def derivativeClasses(trees):
+    "Return the (disjoint) derivative classes for a list of syntax trees."
+    classes = []
+    for tree in trees:
+        for charSet in firstSets(tree):
+            newClasses = []
+            remaining = set(charSet)
+            for aClass in classes:
+                inside = aClass & charSet
+                if inside and inside != aClass:
+                    newClasses.append(inside)
+                    newClasses.append(aClass - charSet)
+                else:
+                    newClasses.append(aClass)
+                remaining -= aClass
+            if remaining: newClasses.append(frozenset(remaining))
+            classes = newClasses
+    return classes
+
+
+def alphabetOf(tree,alphabet):
+    "Add the characters used by a syntax tree to the set alphabet."
+    if isinstance(tree,Char): alphabet.add(tree.ch)
+    elif isinstance(tree,Star): alphabetOf(tree.item,alphabet)
+    elif isinstance(tree,(Alt,Concat)):
+        for item in tree.items: alphabetOf(item,alphabet)
+
+
+##------------------------------------------------------------------------------
+##
+## REVector is a tuple of syntax trees, one per RE being scanned for, used as
+## the "stateSet" of the DFA states built by derivativeDFA.
+##
+##
+class REVector(tuple):
+    def __str__(this):
+        return this.toString()
+
+    def toString(this,laTeX=False):
+        s = ", ".join([tree.toString() for tree in this])
+        if laTeX: return "\\langle %s\\rangle" % s
+        return "<%s>" % s
+
+
+##------------------------------------------------------------------------------
+##
+## derivativeDFA: build a DFA directly from a list of REs (see header).
+##
+##
+def derivativeDFA(regExpressions,verbose=False):
+    "Build a DFA for a list of REs using Brzozowski derivatives."
+    trees = parseTrees(regExpressions)
+    if trees is None: return None
+    dfa = DFA()
+    for tree in trees: alphabetOf(tree,dfa.alphabet)
+    regExprs = [tree.toString() for tree in trees]
+    dead = REVector([EMPTY] * len(trees))
+
+    startVector = REVector(trees)
+    dfaStateList = [DFAState("")]     ## States are named once they are all built.
+    dfaStateList[0].stateSet = startVector
+    dfaStates = {startVector: dfaStateList[0]}
+    index = 0
+    while index < len(dfaStateList):
+        aDFAState = dfaStateList[index] ; index += 1
+        vector = aDFAState.stateSet
+        for i,tree in enumerate(vector):
+            if tree.nullable():
+                dfa.finalStates.append(aDFAState)
+                dfa.regExprs.append(regExprs[i])
+                break
+        moves = {}
+        for aClass in derivativeClasses(vector):
+            ch = min(aClass)
+            targetVector = REVector([derivative(tree,ch) for tree in vector])
+            if targetVector == dead: continue
+            targetDFAState = dfaStates.get(targetVector)
+            if targetDFAState is None:
+                targetDFAState = DFAState("")
+                targetDFAState.stateSet = targetVector
+                dfaStates[targetVector] = targetDFAState
+                dfaStateList.append(targetDFAState)
+            for ch in aClass: moves[ch] = targetDFAState
+        for ch in sorted(moves):
+            aDFAState.successors.append((ch,moves[ch],None))
+
+    nameDFAStates(dfaStateList)
+    if verbose:
+        for aDFAState in dfaStateList:
+            print "DFA state %s = %s" % (aDFAState.name,aDFAState.stateSet)
+    dfa.startState = dfaStateList[0]
+    dfa.stateCount = len(dfaStateList)
+    return dfa
@@ -7,7 +7,12 @@
 ## Classes: DFA --        A specialization of the FA class from fa.py for
 ##                        deterministic automata.
 ##             method: scan -- return all matches found by this DFA when
-##                             matching an argument string.
+##                             matching an argument string (optionally with
+##                             their line and column numbers).
+##                     search, finditer -- find matches anywhere in a string
+##                             (see dfasearch.py).
+##                     pack -- return the DFA with its transition table
+##                             packed (see dfapack.py).
 ##
 ##          StateSet   -- A set of NFA State objects.  Method "toString"
 ##                        is used to print it out in a "pretty" way.
@@ -24,6 +29,11 @@
 ##          e_closure: Generate the epsilon-closure of a set of NFA states
 ##                     (represented as a StateSet object).
 ##
+##          nameDFAStates: Name a list of DFA states the way subset does.
+##
+##          trimDFA: Remove the states of a DFA that can't be reached from
+##                   its start state, or can't reach an accepting state.
+##
 ##
 from fa import FA
 from nfa import NFA, ThompsonNFA
@@ -49,21 +59,58 @@ class DFA(FA):
     ## This method is basically a wrapper around a DFAScanner object (see
     ## below).
     ##
-    def scan(this,astring,verbose=False):
+    ## If argument "positions" is passed as True, each element of the list
+    ## also gives the position of the token in the string, as a third field,
+    ## a (line,column) tuple (numbered from 1, see lineindex.py).
+    ##
+    def scan(this,astring,verbose=False,positions=False):
         scanner = DFAScanner(this,astring)
+        if positions:
+            from lineindex import LineIndex
+            lineIndex = LineIndex(astring)
         matches = []
         sepstr = 70*"="
         if verbose: print sepstr
         while True:
+            start = scanner.startIndex
             (regExpr,matchedStr)=scanner.scanNext(verbose)
             if verbose:
                 if regExpr: print "\nMatched RE %s, string '%s'\n" % (regExpr,matchedStr)
                 else: print "\nNo match\n"
                 print sepstr
             if not regExpr: break
-            matches.append((regExpr,matchedStr))
+            if positions: matches.append((regExpr,matchedStr,lineIndex.position(start)))
+            else: matches.append((regExpr,matchedStr))
             if len(matchedStr) == 0: break
         return matches
+
+    ## search and finditer: unanchored, leftmost-longest search for matches
+    ## anywhere in the argument string "text" (scan only tokenises from the
+    ## start of its string).  Matches are reported as (start,end,matching-re)
+    ## tuples, giving the slice text[start:end] matched.  search returns the
+    ## first match (or None), finditer generates them all in turn.
+    ##
+    ## These are wrappers around a DFASearcher object (see dfasearch.py),
+    ## which is kept with the DFA for later searches.
+    ##
+    def search(this,text):
+        return this.searcher().search(text)
+
+    def finditer(this,text):
+        return this.searcher().finditer(text)
+
+    def searcher(this):
+        if getattr(this,"dfaSearcher",None) is None:
+            from dfasearch import DFASearcher
+            this.dfaSearcher = DFASearcher(this)
+        return this.dfaSearcher
+
+    ## pack: return a PackedDFA (see dfapack.py) for this DFA, a compact,
+    ## comb-vector form of its transition table that can also scan.
+    ##
+    def pack(this,maxChain=1):
+        from dfapack import PackedDFA
+        return PackedDFA(this,maxChain)
         
 
 ##------------------------------------------------------------------------------
@@ -88,6 +135,7 @@ def subset(nfa, verbose=True):
     else: dfaStartStateName = "A"    
     if dfa.stateCount <= 14 or verbose:
         dfa = doSubset(nfa,dfaStartStateName,verbose)
+    trimDFA(dfa,verbose)
     return dfa
 
 
@@ -139,6 +187,64 @@ def doSubset(nfa,stateName,verbose):
     return dfa
 
 
+##------------------------------------------------------------------------------
+##
+## trimDFA: remove the "useless" states of a DFA, in place: those that can't
+## be reached from the start state, and those from which no accepting state
+## can be reached (e.g., from an NFA, not built by re2nfa, with a branch that
+## leads nowhere).  A scanner in such a state would go on reading characters
+## that can never be part of a token, only to roll back when it halts;
+## without the transitions into them, it halts at once.  The co-accessible
+## states are found with a sweep backwards from the accepting states over
+## the reversed transitions.  The start state is always kept (with no
+## transitions, if nothing can be accepted at all), and characters left with
+## no transitions are dropped from the alphabet.  The states kept are then
+## renamed A, B, C ... in breadth-first order, as subset names them, so the
+## names have no gaps.  Returns the list of states removed.
+##
+##
+def trimDFA(dfa,verbose=False):
+    "Remove the unreachable and dead (non-co-accessible) states of a DFA."
+    states = [dfa.startState]
+    reachable = set(states)
+    predecessors = {}
+    index = 0
+    while index < len(states):
+        state = states[index] ; index += 1
+        for successor in state.successors:
+            predecessors.setdefault(successor[1],[]).append(state)
+            if not successor[1] in reachable:
+                reachable.add(successor[1])
+                states.append(successor[1])
+    live = set([state for state in dfa.finalStates if state in reachable])
+    queue = list(live)
+    while queue:
+        for state in predecessors.get(queue.pop(),()):
+            if not state in live:
+                live.add(state)
+                queue.append(state)
+    live.add(dfa.startState)
+    removed = [state for state in states if not state in live]
+    if removed:
+        for state in live:
+            state.successors = [successor for successor in state.successors
+                                if successor[1] in live]
+        dfa.alphabet = set([successor[0] for state in live for successor in state.successors])
+        if verbose:
+            print "Trimmed dead state(s) %s: no accepting state can be reached from them." % \
+                  ", ".join([state.name for state in removed])
+    kept = [i for i,state in enumerate(dfa.finalStates) if state in live]
+    if len(kept) < len(dfa.finalStates):        ## Unreachable accepting states.
+        dfa.finalStates = [dfa.finalStates[i] for i in kept]
+        dfa.regExprs = [dfa.regExprs[i] for i in kept]
+    if removed or len(live) != dfa.stateCount:
+        ## Rename the states kept, in breadth-first order, as subset does.
+        nameDFAStates([state for state in states if state in live])
+    dfa.stateCount = len(live)
+    dfa.dfaSearcher = None
+    return removed
+
+
 ##------------------------------------------------------------------------------
 ##
 ## findTargetSet: Given an NFA StateSet, a transition character and an nfa as
@@ -168,6 +274,23 @@ def nextDFAStateName(stateName):
     else:                     ## Name is single char alphabetic, A, B, C, ...
         return chr(ord(stateName)+1)
 
+
+##------------------------------------------------------------------------------
+##
+## nameDFAStates: Name a list of DFA states in order, the way subset does:
+## A, B, C, ... for 14 states or less, otherwise S0, S1, S2, ... (avoiding
+## 'O', which could be confused with 0).  For constructions that only know
+## how many states they have once they have built them all.
+##
+##
+def nameDFAStates(dfaStateList):
+    "Name a list of DFA states A, B, C, ... (or S0, S1, ... if there are many)."
+    if len(dfaStateList) > 14: name = "S0"
+    else: name = "A"
+    for aDFAState in dfaStateList:
+        aDFAState.name = name
+        name = nextDFAStateName(name)
+
             
 ##------------------------------------------------------------------------------
 ##
@@ -272,7 +395,8 @@ class DFAScanner(object):
                 else: s = "  %3s" % this.state.name
                 if stateIsFinal: s += " (Acc) |"
                 else: s += "       |"
-                s += " '%s'  | (%s)" % (ch, this.state.stateSet)
+                if ch is None: s += " end  | (%s)" % (this.state.stateSet,)
+                else: s += " '%s'  | (%s)" % (ch, this.state.stateSet)
                 print s
             newState = this.findTransition(ch)
             if not newState: break
@@ -294,7 +418,7 @@ class DFAScanner(object):
         if this.currentIndex < len(this.string):
             return this.string[this.currentIndex]
         else:
-            return '$'
+            return None     ## End of input: no transition is taken.
 
     def findTransition(this,ch):
         for succ in this.state.successors:
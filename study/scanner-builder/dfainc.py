@@ -0,0 +1,395 @@
+##------------------------------------------------------------------------------
+##
+## dfainc.py -- A scanner DFA that can have REs added to it and removed from
+##              it, without being rebuilt from scratch.
+##
+## The DFA for a list of REs is, state for state, the product of the DFAs for
+## the REs one at a time: each of its states is the tuple of the states the
+## single-RE DFAs are in after reading the same input, and it accepts the
+## first (highest-priority) RE whose DFA accepts.  This module keeps the DFA
+## in that form.  Each RE has its own small, minimised DFA (a "component"),
+## and each state of the combined DFA is held as the tuple of the (component,
+## state) pairs still alive in it (the components that have died, by having
+## no transition on some character read, are left out, so the tuples stay
+## short).  Then:
+##
+##     add     -- builds the DFA for the new RE alone, and then the product
+##                of the existing combined DFA with it.  No other RE is
+##                parsed, or has its NFA or DFA rebuilt: each state of the
+##                result comes from one existing state and one state of the
+##                new component, and its transitions from theirs.
+##
+##     remove  -- needs no construction at all: the new states are just the
+##                existing ones with the removed component's pairs dropped
+##                (states that become equal are merged), with the same
+##                transitions.
+##
+## Either way the combined DFA is exactly the one that building the product
+## from scratch would give, so changes can be made any number of times.  The
+## minimal DFA (the "dfa" method) is made from it on demand, by partition
+## refinement over the state numbers, and kept until the next change.
+##
+## Class:
+##
+##          IncrementalDFA(regExpressions=None,engine="auto")
+##
+##              Arguments:
+##
+##                  regExpressions - The initial REs, as for parseREs:
+##                            either a string containing a number of
+##                            (space-separated) REs, or a list of strings,
+##                            each holding one RE.  May be omitted.
+##
+##                  engine - The construction engine used for each RE's own
+##                            DFA (see builder.py).
+##
+##              methods: add    -- add an RE (at the end of the list, lowest
+##                                 priority, or at a given index).  Returns
+##                                 False (having reported it) if there is a
+##                                 syntax error in the RE.
+##                       remove -- remove an RE, given as its index in the
+##                                 list or as a string (its first
+##                                 occurrence).  Returns False if there is
+##                                 no such RE.
+##                       dfa    -- the minimal DFA for the current REs, a
+##                                 DFA object (as from minimiseDFA).
+##                       scan   -- tokenise a string, exactly as DFA.scan.
+##
+##              fields:  regExprs   -- the current REs, in priority order,
+##                                     as the engine labels them (as
+##                                     DFA.scan reports them, e.g. c* for
+##                                     (c)*).
+##                       sources    -- the same REs as they were passed to
+##                                     add (which remove looks them up in).
+##                       stateCount -- the number of states of the combined
+##                                     (unminimised) DFA.
+##
+## If the initial REs contain a syntax error, it is reported and the object
+## starts with no REs.
+##
+##
+from dfa import DFA, nameDFAStates
+from state import DFAState
+
+
+##------------------------------------------------------------------------------
+##
+## dfaTables: number the states of a DFA (breadth-first from the start state)
+## and return (delta,accepting), per state a dictionary mapping characters
+## to target state numbers, and the index of the RE accepted (or None).
+##
+##
+def dfaTables(dfa):
+    "Return the transition dictionaries and accepted REs of a DFA's states, numbered."
+    states = [dfa.startState]
+    number = {dfa.startState: 0}
+    index = 0
+    while index < len(states):
+        for successor in states[index].successors:
+            if not successor[1] in number:
+                number[successor[1]] = len(states)
+                states.append(successor[1])
+        index += 1
+    delta = [dict((successor[0],number[successor[1]]) for successor in state.successors)
+             for state in states]
+    accepting = [None] * len(states)
+    for i,finalState in enumerate(dfa.finalStates):
+        s = number.get(finalState)
+        if s is not None and accepting[s] is None: accepting[s] = i
+    return delta,accepting
+
+
+##------------------------------------------------------------------------------
+##
+## minimalBlocks: partition refinement (Moore's algorithm) over numbered
+## states.  States start in blocks by the RE they accept, and blocks are
+## split until all the states of each have transitions, on every character,
+## into the same blocks.  Returns (blockOf,blockCount), where blockOf maps
+## each state to its block, numbered in order of first appearance (so the
+## block of state 0 is 0).  A missing transition is to the dead state, and
+## no state here is equivalent to it (every state can reach acceptance).
+##
+##
+def minimalBlocks(delta,accepting):
+    "Return the blocks of equivalent states of a DFA given as tables."
+    blockOf,blockCount = renumberBlocks(accepting)
+    while True:
+        signatures = [(blockOf[s],tuple(sorted([(ch,blockOf[t]) for ch,t in row.iteritems()])))
+                      for s,row in enumerate(delta)]
+        newBlockOf,newBlockCount = renumberBlocks(signatures)
+        if newBlockCount == blockCount: return newBlockOf,newBlockCount
+        blockOf,blockCount = newBlockOf,newBlockCount
+
+
+def renumberBlocks(keys):
+    "Number distinct keys in order of first appearance, returning (numbers,count)."
+    numbers = {}
+    return [numbers.setdefault(key,len(numbers)) for key in keys],len(numbers)
+
+
+##------------------------------------------------------------------------------
+##
+## ProductState is the "stateSet" of the DFA states built by IncrementalDFA:
+## the (component,state) pairs of one of the combined states it stands for.
+##
+##
+class ProductState(tuple):
+    def __str__(this):
+        return this.toString()
+
+    def toString(this,laTeX=False):
+        s = ", ".join(["%d.%d" % pair for pair in this])
+        if laTeX: return "\\langle %s\\rangle" % s
+        return "<%s>" % s
+
+
+##------------------------------------------------------------------------------
+##
+## IncrementalDFA (see header).  Fields are:
+##
+##    components:  A dictionary mapping component ids (never reused) to the
+##                 component of each RE, a (delta,accepting) pair of tables
+##                 (see dfaTables) for its minimal DFA.
+##
+##    order:       The component ids of the REs, in priority order.
+##
+##    states:      Per combined state, the sorted tuple of its live
+##                 (component id,state) pairs.  State 0 is the start state.
+##
+##    delta:       Per combined state, a dictionary mapping characters to
+##                 target states.
+##
+##    finals:      Per combined state, the ids of the components accepting
+##                 there.
+##
+##
+class IncrementalDFA(object):
+    "A scanner DFA that REs can be added to and removed from (see header)."
+    def __init__(this,regExpressions=None,engine="auto"):
+        this.engine = engine
+        this.components = {}
+        this.order = []
+        this.regExprs = []
+        this.sources = []
+        this.nextId = 0
+        this.minimal = None
+        if regExpressions:
+            if isinstance(regExpressions,basestring): regExpressions = regExpressions.split()
+            for regExpr in regExpressions:
+                if not this.addComponent(regExpr,len(this.order)):
+                    this.components,this.order,this.regExprs,this.sources = {},[],[],[]
+                    break
+        this.rebuild()
+
+    def addComponent(this,regExpr,index):
+        "Build the DFA for one RE and insert it at index in the list.  Returns its id."
+        from builder import buildDFA
+        dfa = buildDFA([regExpr],this.engine)
+        if dfa is None: return None
+        delta,accepting = dfaTables(dfa)
+        blockOf,blockCount = minimalBlocks(delta,accepting)
+        minDelta = [None] * blockCount
+        minAccepting = [None] * blockCount
+        for s,block in enumerate(blockOf):
+            if minDelta[block] is None:
+                minDelta[block] = dict((ch,blockOf[t]) for ch,t in delta[s].iteritems())
+                minAccepting[block] = accepting[s]
+        this.nextId += 1
+        this.components[this.nextId] = (minDelta,minAccepting)
+        this.order.insert(index,this.nextId)
+        if dfa.regExprs: this.regExprs.insert(index,dfa.regExprs[0])
+        else: this.regExprs.insert(index,regExpr)
+        this.sources.insert(index,regExpr)
+        return this.nextId
+
+    def newState(this,pairs,stateNumbers):
+        "Add a combined state with the given (component,state) pairs, returning its number."
+        stateNumbers[pairs] = len(this.states)
+        this.states.append(pairs)
+        this.delta.append({})
+        components = this.components
+        this.finals.append(tuple([c for c,q in pairs if components[c][1][q] is not None]))
+        return len(this.states) - 1
+
+    ##--------------------------------------------------------------------------
+    ##
+    ## rebuild: build the combined DFA from the components, by a subset-style
+    ## construction over tuples of live pairs.
+    ##
+    def rebuild(this):
+        components = this.components
+        this.states,this.delta,this.finals = [],[],[]
+        stateNumbers = {}
+        this.newState(tuple(sorted([(c,0) for c in this.order])),stateNumbers)
+        index = 0
+        while index < len(this.states):
+            moves = {}
+            for c,q in this.states[index]:
+                for ch,t in components[c][0][q].iteritems():
+                    moves.setdefault(ch,[]).append((c,t))
+            row = this.delta[index]
+            for ch,pairs in moves.iteritems():
+                pairs = tuple(pairs)
+                target = stateNumbers.get(pairs)
+                if target is None: target = this.newState(pairs,stateNumbers)
+                row[ch] = target
+            index += 1
+        this.stateCount = len(this.states)
+        this.minimal = None
+
+    ##--------------------------------------------------------------------------
+    ##
+    ## add: the product of the combined DFA with the new component.  A state
+    ## of the result is a pair (p,q) of an existing state (or -1, dead) and
+    ## a state of the component (or -1), so it is found by a dictionary
+    ## lookup on the pair, and its tuple is just p's with (c,q) added.
+    ##
+    def add(this,regExpr,index=None):
+        "Add an RE, at index in the list (default: at the end, lowest priority)."
+        if index is None: index = len(this.order)
+        c = this.addComponent(regExpr,index)
+        if c is None: return False
+        cDelta = this.components[c][0]
+        oldStates,oldDelta = this.states,this.delta
+        noMoves = {}
+        this.states,this.delta,this.finals = [],[],[]
+        stateNumbers = {}
+        pairNumbers = {(0,0): 0}
+        pending = [(0,0)]
+        this.newState(tuple(sorted(oldStates[0] + ((c,0),))),stateNumbers)
+        index = 0
+        while index < len(pending):
+            p,q = pending[index]
+            if p >= 0: pMoves = oldDelta[p]
+            else: pMoves = noMoves
+            if q >= 0: qMoves = cDelta[q]
+            else: qMoves = noMoves
+            row = this.delta[index]
+            for ch in set(pMoves) | set(qMoves):
+                pair = (pMoves.get(ch,-1),qMoves.get(ch,-1))
+                target = pairNumbers.get(pair)
+                if target is None:
+                    if pair[0] >= 0: pairs = oldStates[pair[0]]
+                    else: pairs = ()
+                    if pair[1] >= 0: pairs = tuple(sorted(pairs + ((c,pair[1]),)))
+                    target = pairNumbers[pair] = this.newState(pairs,stateNumbers)
+                    pending.append(pair)
+                row[ch] = target
+            index += 1
+        this.stateCount = len(this.states)
+        this.minimal = None
+        return True
+
+    ##--------------------------------------------------------------------------
+    ##
+    ## remove: drop the component's pairs from every state, merging the
+    ## states that become equal.  (Every state of the result is reachable.
+    ## The states left with no pairs, those reached only through the removed
+    ## RE, are dead, and the transitions to them are dropped.)
+    ##
+    def remove(this,regExpr):
+        "Remove an RE, given by its index or as a string (its first occurrence)."
+        if isinstance(regExpr,basestring):
+            if not regExpr in this.sources:
+                print "Error: RE '%s' is not in the DFA" % regExpr
+                return False
+            index = this.sources.index(regExpr)
+        else: index = regExpr
+        if not 0 <= index < len(this.order):
+            print "Error: no RE number %d in the DFA" % index
+            return False
+        c = this.order.pop(index)
+        del this.regExprs[index]
+        del this.sources[index]
+        oldStates,oldDelta = this.states,this.delta
+        this.states,this.delta,this.finals = [],[],[]
+        stateNumbers = {}
+        mapping = []            ## Old state -> new state (or -1, dead).
+        for pairs in oldStates:
+            pairs = tuple([pair for pair in pairs if pair[0] != c])
+            if not pairs: mapping.append(-1)
+            elif pairs in stateNumbers: mapping.append(stateNumbers[pairs])
+            else: mapping.append(this.newState(pairs,stateNumbers))
+        if mapping[0] < 0: this.newState((),stateNumbers)     ## No REs left.
+        done = set()
+        for s,row in enumerate(oldDelta):
+            target = mapping[s]
+            if target < 0 or target in done: continue
+            done.add(target)
+            this.delta[target] = dict((ch,mapping[t]) for ch,t in row.iteritems() if mapping[t] >= 0)
+        del this.components[c]
+        this.stateCount = len(this.states)
+        this.minimal = None
+        return True
+
+    ##--------------------------------------------------------------------------
+    ##
+    ## Accepting states, the minimal DFA and scanning.
+    ##
+    def accepting(this):
+        "Per combined state, the index in regExprs of the RE accepted, or None."
+        rank = dict((c,i) for i,c in enumerate(this.order))
+        return [min([rank[c] for c in finals]) if finals else None for finals in this.finals]
+
+    def dfa(this):
+        "Return the minimal DFA for the current REs."
+        if this.minimal is not None: return this.minimal
+        accepting = this.accepting()
+        blockOf,blockCount = minimalBlocks(this.delta,accepting)
+        dfaStates = [None] * blockCount
+        rows = [None] * blockCount
+        for s,block in enumerate(blockOf):
+            if dfaStates[block] is None:
+                dfaStates[block] = DFAState("")
+                dfaStates[block].stateSet = ProductState(this.states[s])
+                rows[block] = (this.delta[s],accepting[s])
+        ## Put the states in breadth-first order, as subset makes them.
+        order = [0]
+        seen = set(order)
+        index = 0
+        while index < len(order):
+            for ch in sorted(rows[order[index]][0]):
+                block = blockOf[rows[order[index]][0][ch]]
+                if not block in seen:
+                    seen.add(block)
+                    order.append(block)
+            index += 1
+        dfa = DFA()
+        for block in order:
+            row,accepts = rows[block]
+            for ch in sorted(row):
+                dfaStates[block].successors.append((ch,dfaStates[blockOf[row[ch]]],None))
+                dfa.alphabet.add(ch)
+            if accepts is not None:
+                dfa.finalStates.append(dfaStates[block])
+                dfa.regExprs.append(this.regExprs[accepts])
+        dfaStateList = [dfaStates[block] for block in order]
+        nameDFAStates(dfaStateList)
+        dfa.startState = dfaStateList[0]
+        dfa.stateCount = len(dfaStateList)
+        this.minimal = dfa
+        return dfa
+
+    def scan(this,string):
+        """Tokenise a string, exactly as the "scan" method of the DFA for the
+           current REs does.  Returns a list of (regExpr,matched-string) tuples."""
+        delta = this.delta
+        accepting = this.accepting()
+        matches = []
+        start = 0
+        while True:
+            state = 0
+            matched = None
+            end = start
+            i = start
+            while True:
+                if accepting[state] is not None: matched,end = accepting[state],i
+                if i >= len(string): break
+                state = delta[state].get(string[i])
+                if state is None: break
+                i += 1
+            if matched is None: break
+            matches.append((this.regExprs[matched],string[start:end]))
+            if end == start: break     ## Empty match.
+            start = end
+        return matches
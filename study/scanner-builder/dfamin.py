@@ -44,7 +44,7 @@
 ##
 
 from state import State,DFAState
-from dfa import DFA,StateSet, nextDFAStateName
+from dfa import DFA,StateSet, nextDFAStateName, trimDFA
 
 
 ##------------------------------------------------------------------------------
@@ -98,6 +98,8 @@ def minimiseDFA(dfa,verbose=False,reorder=False):
     ## Generate the new DFA by selecting one DFA state from each state set in the
     ## current partition (omitting the state set containing the "dead state").
     minDFA = buildMinDFA(dfa,partition)
+    ## Drop any states left that can't lead to acceptance (see trimDFA).
+    trimDFA(minDFA,verbose)
     ## May want to re-order the states in the new, minimised DFA.
     if reorder: reorderStates(minDFA)
     return minDFA
@@ -0,0 +1,265 @@
+##------------------------------------------------------------------------------
+##
+## dfapack.py -- Comb-vector ("row-displacement") packing of DFA transition
+##               tables, as used by lex and yacc.
+##
+## The dense state-by-character table of a scanner DFA is mostly empty, and
+## most of its rows are nearly copies of one another (think of the states
+## of an identifier RE, which all go to the same place on a letter or a
+## digit).  A packed table stores the same transitions in four arrays
+## (Aho, Lam, Sethi & Ullman, Compilers, 2nd ed., section 3.9.8):
+##
+##     next, check  -- The transitions of all the states, overlaid ("combed"
+##                     into one another) in a single pair of vectors.  The
+##                     transition of state s on character class c is stored
+##                     at index base[s]+c, and check[base[s]+c] == s marks
+##                     the entry as belonging to s.
+##
+##     base         -- Per state, the offset of its row in next and check.
+##
+##     default      -- Per state, a "template" state with a similar row, or
+##                     -1.  A state stores only the entries where its row
+##                     differs from its template's; any other transition is
+##                     the template's.  "No transition" is stored as a next
+##                     entry of -1 where the template has one.
+##
+## So a lookup is
+##
+##     while s >= 0:
+##         if check[base[s]+c] == s: return next[base[s]+c]
+##         s = default[s]
+##
+## Templates are only chosen from states which have no template themselves,
+## so a lookup takes at most two probes, and usually one.  The characters
+## are first grouped into classes with identical columns (as flex does), so
+## the rows are as short as possible.
+##
+## The arrays are kept as arrays of machine integers (module array), so a
+## packed DFA costs a few bytes per stored transition, rather than a Python
+## object per state and a tuple per transition.
+##
+## Class:
+##
+##          PackedDFA(dfa,maxChain=1)
+##
+##              Arguments:
+##
+##                  dfa - A DFA object (from subset, followposDFA, buildDFA,
+##                        minimiseDFA etc.).  It is not changed.
+##
+##                  maxChain - The longest chain of templates followed by a
+##                        lookup (0 turns templates off).
+##
+##              methods: nextState -- the transition from a state on a char.
+##                       scan      -- tokenise a string, exactly as DFA.scan.
+##                       report    -- print the sizes of the packed and dense
+##                                    tables.
+##                       output    -- print the packed arrays.
+##
+##              Also available as "pack", a method of DFA.
+##
+##
+from array import array
+
+
+class PackedDFA(object):
+    "A DFA whose transition table is packed into base/default/next/check vectors."
+    def __init__(this,dfa,maxChain=1):
+        ## Number the DFA states (breadth-first, from the start state) and
+        ## make a transition dictionary for each.
+        states = [dfa.startState]
+        number = {dfa.startState: 0}
+        index = 0
+        while index < len(states):
+            for successor in states[index].successors:
+                if not successor[1] in number:
+                    number[successor[1]] = len(states)
+                    states.append(successor[1])
+            index += 1
+        rows = [dict((successor[0],number[successor[1]]) for successor in state.successors)
+                for state in states]
+        this.stateNames = [state.name for state in states]
+        this.stateCount = len(states)
+        this.alphabet = sorted(set([ch for row in rows for ch in row]))
+        this.regExprs = list(dfa.regExprs)
+        this.accepting = [None] * len(states)   ## Per state, index of the RE accepted.
+        for i,finalState in enumerate(dfa.finalStates):
+            s = number.get(finalState)
+            if s is not None and this.accepting[s] is None: this.accepting[s] = i
+        this.makeClasses(rows)
+        rows = [dict((this.classOf[ch],target) for ch,target in row.iteritems())
+                for row in rows]
+        this.chooseDefaults(rows,maxChain)
+        this.pack()
+
+    ##--------------------------------------------------------------------------
+    ##
+    ## makeClasses: group the characters into classes with identical columns.
+    ## Sets classOf (character -> class) and classCount.
+    ##
+    def makeClasses(this,rows):
+        columns = {}
+        this.classOf = {}
+        for ch in this.alphabet:
+            column = tuple([row.get(ch,-1) for row in rows])
+            if not column in columns: columns[column] = len(columns)
+            this.classOf[ch] = columns[column]
+        this.classCount = len(columns)
+
+    ##--------------------------------------------------------------------------
+    ##
+    ## chooseDefaults: pick a template for each state, the one (among the
+    ## states with chains short enough) whose row differs from the state's
+    ## in the fewest entries, if that is fewer than the state's own entries.
+    ## Candidates are found through an index of the (class,target) pairs of
+    ## the template rows, so only states sharing some transition are looked
+    ## at.  Sets default, and entries (per state, the dictionary of entries
+    ## it must store).
+    ##
+    def chooseDefaults(this,rows,maxChain):
+        this.default = array('i',[-1] * len(rows))
+        this.entries = []
+        depth = [0] * len(rows)
+        sharing = {}        ## (class,target) -> the template states with that transition.
+        for s,row in enumerate(rows):
+            counts = {}
+            for pair in row.iteritems():
+                for t in sharing.get(pair,()): counts[t] = counts.get(t,0) + 1
+            best,bestCost = -1,len(row)
+            for t,shared in counts.iteritems():
+                cost = len(row) + len(rows[t]) - 2*shared
+                if cost < bestCost or (cost == bestCost and best >= 0 and t < best):
+                    best,bestCost = t,cost
+            if best >= 0:
+                template = rows[best]
+                entries = {}
+                for c in set(row) | set(template):
+                    if row.get(c,-1) != template.get(c,-1): entries[c] = row.get(c,-1)
+                this.default[s] = best
+                depth[s] = depth[best] + 1
+            else: entries = dict(row)
+            this.entries.append(entries)
+            if depth[s] < maxChain:
+                for pair in row.iteritems(): sharing.setdefault(pair,[]).append(s)
+
+    ##--------------------------------------------------------------------------
+    ##
+    ## pack: overlay the rows in next and check, first-fit, longest rows
+    ## first.  Every row is placed so that base[s]+c is in range for every
+    ## class c, so lookups never need a bounds test.
+    ##
+    def pack(this):
+        this.base = array('i',[0] * len(this.entries))
+        check = []
+        firstFree = 0       ## No free slot before this index.
+        order = sorted(range(len(this.entries)),key=lambda s: -len(this.entries[s]))
+        for s in order:
+            columns = sorted(this.entries[s])
+            if not columns: continue
+            while firstFree < len(check) and check[firstFree] != -1: firstFree += 1
+            base = firstFree - columns[0]
+            while True:
+                if base >= 0 and all([base+c >= len(check) or check[base+c] == -1 for c in columns]):
+                    break
+                base += 1
+            this.base[s] = base
+            if base + this.classCount > len(check):
+                check.extend([-1] * (base + this.classCount - len(check)))
+            for c in columns: check[base+c] = s
+        if len(check) < this.classCount: check.extend([-1] * (this.classCount - len(check)))
+        this.check = array('i',check)
+        this.next = array('i',[-1] * len(check))
+        for s,entries in enumerate(this.entries):
+            for c,target in entries.iteritems(): this.next[this.base[s]+c] = target
+        del this.entries
+
+    ##--------------------------------------------------------------------------
+    ##
+    ## Lookup and scanning.
+    ##
+    def nextState(this,state,ch):
+        "Return the state reached from state on character ch, or -1 if none."
+        c = this.classOf.get(ch)
+        if c is None: return -1
+        base,check,default = this.base,this.check,this.default
+        while state >= 0:
+            if check[base[state]+c] == state: return this.next[base[state]+c]
+            state = default[state]
+        return -1
+
+    def scan(this,string):
+        """Tokenise a string, exactly as the "scan" method of the original DFA
+           does.  Returns a list of (regExpr,matched-string) tuples."""
+        classOf,base,check,default,next = this.classOf,this.base,this.check,this.default,this.next
+        accepting = this.accepting
+        matches = []
+        start = 0
+        while True:
+            state = 0
+            matched = None
+            end = start
+            i = start
+            while True:
+                if accepting[state] is not None: matched,end = accepting[state],i
+                if i >= len(string): break
+                c = classOf.get(string[i])
+                if c is None: break
+                while state >= 0:
+                    if check[base[state]+c] == state:
+                        state = next[base[state]+c]
+                        break
+                    state = default[state]
+                if state < 0: break
+                i += 1
+            if matched is None: break
+            matches.append((this.regExprs[matched],string[start:end]))
+            if end == start: break     ## Empty match.
+            start = end
+        return matches
+
+    ##--------------------------------------------------------------------------
+    ##
+    ## Reporting.
+    ##
+    def report(this,stream=None):
+        "Print the sizes of the packed table and of the dense one it replaces."
+        if stream is None:
+            import sys
+            stream = sys.stdout
+        states = this.stateCount
+        dense = states * len(this.alphabet)
+        packed = 2*len(this.next) + 2*states
+        stream.write("Packed DFA: %d states, %d characters in %d classes\n" %
+                     (states,len(this.alphabet),this.classCount))
+        stream.write("Dense table:  %d entries\n" % dense)
+        stream.write("Packed table: %d entries (next/check %d, base/default %d each)\n" %
+                     (packed,len(this.next),states))
+        if dense > 0:
+            stream.write("Saving: %.0f%%\n" % (100.0 - 100.0*packed/dense))
+
+    def output(this,stream=None):
+        "Print the character classes and the packed arrays."
+        if stream is None:
+            import sys
+            stream = sys.stdout
+        from fa import symbolText, writeLines
+        lines = []
+        members = [[] for c in range(this.classCount)]
+        for ch in this.alphabet: members[this.classOf[ch]].append(symbolText(ch))
+        lines.append("Character classes:")
+        for c,chars in enumerate(members): lines.append("  %3d: %s" % (c," ".join(chars)))
+        lines.append("")
+        lines.append("  State | Name | Base | Default | Accepts")
+        lines.append("  ------+------+------+---------+--------")
+        for s in range(this.stateCount):
+            if this.accepting[s] is None: accepts = ""
+            else: accepts = '"%s"' % this.regExprs[this.accepting[s]]
+            lines.append("  %5d | %4s | %4d | %7d | %s" %
+                         (s,this.stateNames[s],this.base[s],this.default[s],accepts))
+        lines.append("")
+        lines.append("  Index | Next | Check")
+        lines.append("  ------+------+------")
+        for i in range(len(this.next)):
+            lines.append("  %5d | %4d | %5d" % (i,this.next[i],this.check[i]))
+        writeLines(lines,stream)
+        this.report(stream)
@@ -0,0 +1,165 @@
+##------------------------------------------------------------------------------
+##
+## dfasearch.py -- Unanchored, leftmost-longest search for the matches of a
+##                 DFA anywhere in a text.
+##
+## DFA.scan tokenises a string from its start, and stops at the first point
+## where nothing matches.  A search instead finds the leftmost point in the
+## text at which some RE matches, takes the longest match there (the RE
+## reported is the one the DFA accepts at the end of that match, as for
+## scan), then carries on searching from the end of the match.  Empty
+## matches are never reported.
+##
+## A search makes three passes over the text, each linear in its length:
+##
+##   1. A forward pass with a DFA for .*R (where R is the union of the REs),
+##      which is in an accepting state after every position at which some
+##      match *ends*.  If there are none, the search is over.  Otherwise
+##      nothing after the last end position needs to be looked at again.
+##
+##   2. A backward pass, from the last end position, with a DFA for the
+##      reversed REs followed by .*, which is in an accepting state at every
+##      position at which some match *starts*.
+##
+##   3. A forward pass taking, from each leftmost start in turn, the longest
+##      match with the original DFA.  Finding the longest match can mean
+##      reading past its end (until the DFA has no transition), and those
+##      characters may be read again by the next match.  To keep this pass
+##      linear, every (DFA state,position) pair found to lead to no further
+##      match is remembered, and a later match stops as soon as it reaches
+##      one of them (T. Reps, "Maximal-munch tokenization in linear time",
+##      TOPLAS 20(2), 1998).
+##
+## The .*R and reversed DFAs are built from the original DFA by the subset
+## construction, done lazily: the states (sets of states of the original
+## DFA) and transitions are only made as the text needs them, and are kept
+## for later searches.  So the cost is never more than a few set operations
+## per character, and usually just a dictionary lookup.
+##
+## Class:
+##
+##          DFASearcher(dfa)
+##
+##              methods: finditer -- generate (start,end,regExpr) for each
+##                                   leftmost-longest match in a text, in
+##                                   order, not overlapping.
+##                       findall  -- the same, as a list.
+##                       search   -- the first match, or None.
+##
+## Normally used through the "search" and "finditer" methods of DFA, which
+## keep a searcher with the DFA.
+##
+##
+
+class DFASearcher(object):
+    "Leftmost-longest unanchored search with a DFA (see header)."
+    def __init__(this,dfa):
+        ## Number the DFA states, and make a transition dictionary for each.
+        states = [dfa.startState]
+        number = {dfa.startState: 0}
+        index = 0
+        while index < len(states):
+            for successor in states[index].successors:
+                if not successor[1] in number:
+                    number[successor[1]] = len(states)
+                    states.append(successor[1])
+            index += 1
+        this.delta = [dict((successor[0],number[successor[1]]) for successor in state.successors)
+                      for state in states]
+        this.reverse = [{} for state in states]   ## reverse[q][ch]: states going to q on ch.
+        for q,row in enumerate(this.delta):
+            for ch,target in row.iteritems():
+                this.reverse[target].setdefault(ch,[]).append(q)
+        this.accepting = {}                       ## State number -> RE.
+        for finalState,regExpr in zip(dfa.finalStates,dfa.regExprs):
+            if finalState in number and not number[finalState] in this.accepting:
+                this.accepting[number[finalState]] = regExpr
+        this.finals = frozenset(this.accepting)
+        this.forwardCache = {}
+        this.backwardCache = {}
+
+    ## The lazy .*R DFA: from state set S on ch, go to {delta(q,ch) : q in S or
+    ## q is the start}.  It is in an accepting state if the set contains a
+    ## final state of the original DFA.
+    def forwardStep(this,stateSet,ch):
+        key = (stateSet,ch)
+        target = this.forwardCache.get(key)
+        if target is None:
+            delta = this.delta
+            target = set()
+            if ch in delta[0]: target.add(delta[0][ch])
+            for q in stateSet:
+                if ch in delta[q]: target.add(delta[q][ch])
+            target = this.forwardCache[key] = frozenset(target)
+        return target
+
+    ## The lazy reversed DFA: from state set S on ch (read backwards), go to
+    ## the states with a transition on ch into S or into a final state.  It
+    ## is in an accepting state if the set contains the start state.
+    def backwardStep(this,stateSet,ch):
+        key = (stateSet,ch)
+        target = this.backwardCache.get(key)
+        if target is None:
+            reverse = this.reverse
+            target = set()
+            for q in stateSet | this.finals:
+                target.update(reverse[q].get(ch,()))
+            target = this.backwardCache[key] = frozenset(target)
+        return target
+
+    def finditer(this,text):
+        "Generate (start,end,regExpr) for each leftmost-longest match in text."
+        if not this.finals: return
+
+        ## Pass 1: find the last position at which a match ends.
+        lastEnd = 0
+        stateSet = frozenset()
+        finals = this.finals
+        for i,ch in enumerate(text):
+            stateSet = this.forwardStep(stateSet,ch)
+            if stateSet & finals: lastEnd = i + 1
+        if lastEnd == 0: return
+
+        ## Pass 2: mark the positions at which matches start.
+        starts = [False] * lastEnd
+        stateSet = frozenset()
+        for i in xrange(lastEnd-1,-1,-1):
+            stateSet = this.backwardStep(stateSet,text[i])
+            if 0 in stateSet: starts[i] = True
+
+        ## Pass 3: the longest match from each leftmost start.
+        delta = this.delta
+        accepting = this.accepting
+        failed = set()          ## (state,position) pairs leading to no match.
+        pos = 0
+        while pos < lastEnd:
+            if not starts[pos]:
+                pos += 1
+                continue
+            state = 0
+            i = pos
+            matched = None
+            tried = []          ## Pairs visited since the last accepting state.
+            while i < lastEnd and not (state,i) in failed:
+                tried.append((state,i))
+                state = delta[state].get(text[i])
+                if state is None: break
+                i += 1
+                if state in accepting:
+                    matched,end = accepting[state],i
+                    tried = []
+            failed.update(tried)
+            if matched is None:     ## Can't happen: a match starts at every marked position.
+                pos += 1
+                continue
+            yield pos,end,matched
+            pos = end
+
+    def findall(this,text):
+        "Return a list of (start,end,regExpr) for each leftmost-longest match in text."
+        return list(this.finditer(text))
+
+    def search(this,text):
+        "Return (start,end,regExpr) for the leftmost-longest match in text, or None."
+        for match in this.finditer(text): return match
+        return None
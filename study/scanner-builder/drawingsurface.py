@@ -5,12 +5,49 @@
 ## in here.
 ##
 ## DrawingSurface: Simply an abstract base class for all device-driver drawing classes.
+##                 It also provides buffered output for the drivers that write files
+##                 (PostScript and SVG): lines are collected and written out in large
+##                 blocks, rather than "print"ed one at a time.
+##
+## Tkinter itself is only imported when a TkDrawing is created, so that the
+## PostScript driver (and any program importing this module but not drawing
+## on the screen) doesn't pay for loading Tk.
 ##
 import math
-from Tkinter import *
+import sys
+from Tkconstants import LAST, YES, BOTH
+from state import State
 
 class DrawingSurface(object):
-    pass
+    BLOCK = 1000    ## Number of output lines buffered before they are written.
+
+    def openOutput(this,outputFileName=None,stream=None):
+        "Start buffered output to the named file, or to stream (default stdout)."
+        this.lines = []
+        this.outputFile = None
+        if outputFileName and isinstance(outputFileName,str):
+            this.outputFile = open(outputFileName,"w")
+            this.stream = this.outputFile
+        elif stream: this.stream = stream
+        else: this.stream = sys.stdout
+
+    def emit(this,line):
+        "Add a line to the output."
+        this.lines.append(line)
+        if len(this.lines) >= DrawingSurface.BLOCK: this.flushOutput()
+
+    def flushOutput(this):
+        if this.lines:
+            this.stream.write("\n".join(this.lines))
+            this.stream.write("\n")
+            this.lines = []
+
+    def closeOutput(this):
+        "Write any buffered output, and close the output file (if one was opened)."
+        this.flushOutput()
+        if this.outputFile: this.outputFile.close()
+        else: this.stream.flush()
+
 
 ##-------------------------------------------------------------------
 ##
@@ -24,52 +61,186 @@ class DrawingSurface(object):
 ## The finite-automaton should be, for example, an NFA object (or
 ## an object created from an NFA subclass).
 ##
+## The drawing is not put onto the canvas directly.  Instead, the
+## automaton's drawing calls are recorded in a "display list", and the
+## items on the list are filed by position in a grid of cells, CELL
+## millimetres square.  Only the items in the cells that are currently in
+## view are put onto the canvas, and they are redrawn whenever the view
+## changes, so the canvas never holds more than a screenful of items, no
+## matter how big the automaton is.  The level of detail also depends on
+## the zoom: labels are left out when the text would be too small to read,
+## and arrowheads and the inner circles of final states when they would be
+## too small to see.  If more than MAX_ITEMS items are still in view, only
+## the states are drawn.
+##
+## The window is at most MAX_WIDTH x MAX_HEIGHT pixels.  Drag with the
+## mouse (button 1) to move around, and use the mouse wheel, or the "+"
+## and "-" keys, to zoom in and out ("0" goes back to the starting view).
+## The starting view is the top left of the automaton, at the original
+## scale of SCALE pixels per millimetre.
+##
 class TkDrawing(DrawingSurface):
     SCALE = 4
     OFFSET = 20
-    
+    MAX_WIDTH = 1200
+    MAX_HEIGHT = 800
+    CELL = 50.0          ## Size (in mm) of the cells of the display-list index.
+    LABEL_SCALE = 2.0    ## Smallest scale (pixels per mm) at which labels are drawn.
+    DETAIL_SCALE = 1.0   ## Smallest scale for arrowheads and final-state inner circles.
+    ZOOM = 1.25          ## Zoom factor per wheel click or key press.
+    MAX_ITEMS = 20000    ## Most items drawn with connections (see above).
+
     def __init__(this,automaton):
+        from Tkinter import Tk, Canvas
         this.automaton = automaton
+        this.items = []      ## The display list: (kind,bounding-box,arguments).
+        this.cells = {}      ## Map (column,row) -> list of indices into items.
+        this.extent = None   ## Lowest and highest (column,row) used in cells.
+        this.automaton.draw(this)
         this.root = Tk()
-        this.canvas = Canvas(width  = TkDrawing.SCALE*automaton.width + 2 * TkDrawing.OFFSET,
-                             height = TkDrawing.SCALE*automaton.height + 2 * TkDrawing.OFFSET,
+        this.canvas = Canvas(width  = min(TkDrawing.SCALE*automaton.width + 2 * TkDrawing.OFFSET,
+                                          TkDrawing.MAX_WIDTH),
+                             height = min(TkDrawing.SCALE*automaton.height + 2 * TkDrawing.OFFSET,
+                                          TkDrawing.MAX_HEIGHT),
                              bg='white', master=this.root)
         this.canvas.pack(expand=YES, fill=BOTH)
-        this.automaton.draw(this)
+        this.resetView()
+        this.redrawPending = False
+        this.canvas.bind("<Configure>", lambda event: this.requestRedraw())
+        this.canvas.bind("<ButtonPress-1>", this.startDrag)
+        this.canvas.bind("<B1-Motion>", this.drag)
+        this.canvas.bind("<MouseWheel>",
+                         lambda event: this.zoom(event.x,event.y,event.delta > 0))
+        this.canvas.bind("<Button-4>", lambda event: this.zoom(event.x,event.y,True))
+        this.canvas.bind("<Button-5>", lambda event: this.zoom(event.x,event.y,False))
+        this.root.bind("<Key-plus>", lambda event: this.zoom(None,None,True))
+        this.root.bind("<Key-equal>", lambda event: this.zoom(None,None,True))
+        this.root.bind("<Key-minus>", lambda event: this.zoom(None,None,False))
+        this.root.bind("<Key-0>", lambda event: (this.resetView(),this.requestRedraw()))
+        this.redraw()
         this.canvas.mainloop()
         ##this.root.destroy()
-        
+
+    ## The view: canvas position (px,py) shows automaton point
+    ## (viewX + (px - OFFSET) / scale, viewTop - (py - OFFSET) / scale).
+    def resetView(this):
+        this.scale = float(TkDrawing.SCALE)
+        this.viewX = 0.0
+        this.viewTop = float(this.automaton.height)
+
+    def toCanvas(this,x,y):
+        return ((x - this.viewX) * this.scale + TkDrawing.OFFSET,
+                (this.viewTop - y) * this.scale + TkDrawing.OFFSET)
+
+    def startDrag(this,event):
+        this.dragFrom = (event.x,event.y)
+
+    def drag(this,event):
+        this.viewX -= (event.x - this.dragFrom[0]) / this.scale
+        this.viewTop += (event.y - this.dragFrom[1]) / this.scale
+        this.dragFrom = (event.x,event.y)
+        this.requestRedraw()
+
+    def zoom(this,px,py,zoomIn):
+        "Zoom in or out, keeping the point under canvas position (px,py) still."
+        if px is None:
+            px = this.canvas.winfo_width() / 2.0
+            py = this.canvas.winfo_height() / 2.0
+        x = this.viewX + (px - TkDrawing.OFFSET) / this.scale
+        y = this.viewTop - (py - TkDrawing.OFFSET) / this.scale
+        if zoomIn: this.scale *= TkDrawing.ZOOM
+        else: this.scale /= TkDrawing.ZOOM
+        this.viewX = x - (px - TkDrawing.OFFSET) / this.scale
+        this.viewTop = y + (py - TkDrawing.OFFSET) / this.scale
+        this.requestRedraw()
+
+    def requestRedraw(this):
+        "Redraw when Tk is next idle (so a burst of events causes only one redraw)."
+        if not this.redrawPending:
+            this.redrawPending = True
+            this.root.after_idle(this.redraw)
+
+    def visibleItems(this):
+        "Return the indices of the display-list items in (or near) the current view."
+        width = max(this.canvas.winfo_width(),int(this.canvas["width"]))
+        height = max(this.canvas.winfo_height(),int(this.canvas["height"]))
+        left = this.viewX - TkDrawing.OFFSET / this.scale
+        right = this.viewX + width / this.scale
+        top = this.viewTop + TkDrawing.OFFSET / this.scale
+        bottom = this.viewTop - height / this.scale
+        visible = set()
+        if not this.extent: return []
+        (minColumn,minRow),(maxColumn,maxRow) = this.extent
+        for column in xrange(max(minColumn,int(math.floor(left / TkDrawing.CELL))),
+                             min(maxColumn,int(math.floor(right / TkDrawing.CELL))) + 1):
+            for row in xrange(max(minRow,int(math.floor(bottom / TkDrawing.CELL))),
+                              min(maxRow,int(math.floor(top / TkDrawing.CELL))) + 1):
+                cell = this.cells.get((column,row))
+                if cell: visible.update(cell)
+        return sorted(visible)
+
+    def redraw(this):
+        this.redrawPending = False
+        canvas = this.canvas
+        canvas.delete("all")
+        scale = this.scale
+        detailed = scale >= TkDrawing.DETAIL_SCALE
+        labelled = scale >= TkDrawing.LABEL_SCALE
+        if detailed: arrow = LAST
+        else: arrow = None
+        visible = this.visibleItems()
+        statesOnly = len(visible) > TkDrawing.MAX_ITEMS
+        for index in visible:
+            kind,box,args = this.items[index]
+            if statesOnly and kind != "circle": continue
+            if kind == "arrow":
+                x1,y1 = this.toCanvas(args[0],args[1])
+                x2,y2 = this.toCanvas(args[2],args[3])
+                canvas.create_line(x1, y1, x2, y2, arrow=arrow)
+            elif kind == "circle":
+                x,y,radius = args
+                if radius < State.RADIUS and not detailed: continue
+                cx,cy = this.toCanvas(x,y)
+                r = radius * scale
+                canvas.create_oval(cx-r, cy-r, cx+r, cy+r, fill='white')
+            elif kind == "text":
+                if not labelled: continue
+                x,y = this.toCanvas(args[0],args[1])
+                if args[3] == 'above': y -= 6 ## nudge y up a little for y-'above' drawing.
+                canvas.create_text(x, y, text=args[2])
+            else:   ## "curve"
+                points = []
+                for i in range(0,8,2): points.extend(this.toCanvas(args[i],args[i+1]))
+                canvas.create_line(*points, arrow=arrow, smooth=1)
+
+    ## The drawing methods called by the automaton just add to the display
+    ## list, filing each item in every cell its bounding box overlaps.
+    def record(this,kind,xs,ys,args):
+        box = (min(xs),min(ys),max(xs),max(ys))
+        index = len(this.items)
+        this.items.append((kind,box,args))
+        low = (int(math.floor(box[0] / TkDrawing.CELL)),int(math.floor(box[1] / TkDrawing.CELL)))
+        high = (int(math.floor(box[2] / TkDrawing.CELL)),int(math.floor(box[3] / TkDrawing.CELL)))
+        for column in xrange(low[0],high[0] + 1):
+            for row in xrange(low[1],high[1] + 1):
+                this.cells.setdefault((column,row),[]).append(index)
+        if this.extent:
+            low = (min(low[0],this.extent[0][0]),min(low[1],this.extent[0][1]))
+            high = (max(high[0],this.extent[1][0]),max(high[1],this.extent[1][1]))
+        this.extent = (low,high)
+
     def drawArrow(this, x1, y1, x2, y2):
-        x1 = x1 * TkDrawing.SCALE + TkDrawing.OFFSET
-        x2 = x2 * TkDrawing.SCALE + TkDrawing.OFFSET
-        y1 = (this.automaton.height - y1) * TkDrawing.SCALE + TkDrawing.OFFSET
-        y2 = (this.automaton.height - y2) * TkDrawing.SCALE + TkDrawing.OFFSET
-        this.canvas.create_line(x1, y1, x2, y2, arrow=LAST)
+        this.record("arrow",(x1,x2),(y1,y2),(x1,y1,x2,y2))
 
     def drawCircle(this, x, y, radius):
-        y = this.automaton.height - y
-        x1 = (x - radius) * TkDrawing.SCALE + TkDrawing.OFFSET
-        x2 = (x + radius) * TkDrawing.SCALE + TkDrawing.OFFSET
-        y1 = (y - radius) * TkDrawing.SCALE + TkDrawing.OFFSET
-        y2 = (y + radius) * TkDrawing.SCALE + TkDrawing.OFFSET
-        this.canvas.create_oval(x1, y1, x2, y2, fill='white')
+        this.record("circle",(x-radius,x+radius),(y-radius,y+radius),(x,y,radius))
 
     def drawText(this, x, y, string, pos=None):
-        x = x * TkDrawing.SCALE + TkDrawing.OFFSET
-        y = (this.automaton.height - y) * TkDrawing.SCALE + TkDrawing.OFFSET
-        if pos and pos == 'above': y -= 6 ## nudge y up a little for y-'above' drawing.
-        this.canvas.create_text(x, y, text=string)
+        this.record("text",(x-3,x+3),(y-2,y+3),(x,y,string,pos))
 
     def drawCurve(this, sx, sy, cp1x, cp1y, cp2x, cp2y, ex, ey):
-        sx   = sx * TkDrawing.SCALE + TkDrawing.OFFSET
-        cp1x = cp1x * TkDrawing.SCALE + TkDrawing.OFFSET
-        cp2x = cp2x * TkDrawing.SCALE + TkDrawing.OFFSET
-        ex   = ex * TkDrawing.SCALE + TkDrawing.OFFSET
-        sy   = (this.automaton.height - sy) * TkDrawing.SCALE + TkDrawing.OFFSET
-        cp1y = (this.automaton.height - cp1y) * TkDrawing.SCALE + TkDrawing.OFFSET
-        cp2y = (this.automaton.height - cp2y) * TkDrawing.SCALE + TkDrawing.OFFSET
-        ey   = (this.automaton.height - ey) * TkDrawing.SCALE + TkDrawing.OFFSET    
-        this.canvas.create_line(sx,sy,cp1x,cp1y,cp2x,cp2y,ex,ey, arrow=LAST, smooth=1)
+        this.record("curve",(sx,cp1x,cp2x,ex),(sy,cp1y,cp2y,ey),
+                    (sx,sy,cp1x,cp1y,cp2x,cp2y,ex,ey))
 
 
 
@@ -78,15 +249,22 @@ class TkDrawing(DrawingSurface):
 ## PostScript: a class that generates a PostScript representation of
 ##              finite-automaton graph.
 ##
-## Use: Simply create a PostScript object with an automaton and a 
+## Use: Simply create a PostScript object with an automaton and a
 ## filename as arguments:
 ##
 ## >>> PostScript(nfa3,"nfa3.ps")
 ##
+## or with no filename, to write to standard output (or to the file
+## object passed as argument "stream").
+##
 ## The generated PostScript can be converted to pdf using "ps2pdf".
 ## It contains a CropBox, so that the final pdf is (noramlly)
 ## correctly clipped.
 ##
+## The drawing operations (arrows, circles, labels and arrowheads) are
+## defined once, as PostScript procedures in the prolog, and the font is
+## selected there too, so each item drawn is a single short line of output.
+##
 ## N.B., it may be necessary to specify a large paper
 ## size to ps2pdf, otherwise, if the width of the graph is wider
 ## than 210mm (the default A4 paper width built in to ghostscript),
@@ -100,71 +278,71 @@ class TkDrawing(DrawingSurface):
 ##
 ## (where "nfagraph.eps" is the file containing PostScript code
 ## generated by this routine).
-##        
+##
 
 class PostScript(DrawingSurface):
     SCALE = 72.0 / 25.4   ## Postscript points to millimeters scaling.
     OFFSET = 10.0         ## Put a 10-pt border around the drawing.
     R2D = 180.0 / math.pi
-    
-    def __init__(this,automaton,outputFileName=None):
+
+    ## Procedures:  x y angle length ar  -- arrow from (x,y), rotated by angle.
+    ##              x y r ci             -- white-filled circle.
+    ##              (s) x y dy lb        -- string centred on x, nudged by dy.
+    ##              x y hu / x y hd      -- arrowhead (up/down) at (x,y).
+    PROLOG = """/ar { gsave 4 -2 roll translate exch rotate dup 3 sub
+       newpath 0 0 moveto 0 lineto stroke 0 translate
+       newpath 0 0 moveto -7.5 3 rlineto 3 -3 rlineto -3 -3 rlineto
+       closepath fill grestore } bind def
+/ci { 3 copy 1 setgray newpath 0 360 arc fill
+       0 setgray newpath 0 360 arc stroke } bind def
+/lb { 3 1 roll moveto exch dup stringwidth pop 2 div neg 3 -1 roll rmoveto show } bind def
+/hu { newpath moveto 3 7.5 rlineto -3 -3 rlineto -3 3 rlineto closepath fill } bind def
+/hd { newpath moveto 3 -7.5 rlineto -3 3 rlineto -3 -3 rlineto closepath fill } bind def
+/Times-Roman findfont 12 scalefont setfont"""
+
+    def __init__(this,automaton,outputFileName=None,stream=None):
         this.automaton = automaton
-        old_outputstream = sys.stdout
         try:
-            if outputFileName and isinstance(outputFileName,str):
-                print "Attempting to open file", outputFileName
-                new_outputstream = open(outputFileName, "w")
-                print new_outputstream
-                sys.stdout = new_outputstream
+            this.openOutput(outputFileName,stream)
             this.outputPreamble()
             this.automaton.draw(this)
-            if outputFileName:
-                sys.stdout = old_outputstream
-                new_outputstream.close()
-        except IOError:
-            print "Output problem", IOError
-            sys.stdout = old_outputstream
+            this.closeOutput()
+        except IOError, e:
+            print "Output problem", e
 
     def outputPreamble(this):
-        print ("%!EPSF-3.0")
+        this.emit("%!EPSF-3.0")
         w = PostScript.SCALE * this.automaton.width + 2 * PostScript.OFFSET
         h = PostScript.SCALE * this.automaton.height  + 2 * PostScript.OFFSET
-        print ("%sBoundingBox: 0 0 %d %d" % ("%%",w,h))
-        print ("%sCropBox: 0 0 %d %d" % ("%%",w,h))
-        print ("%sDocumentFonts: Times-Roman" % "%%")
-        print ("%sEndComments" % "%%")
-        print ("[ /CropBox [ 0 0 %d %d ] /PAGES pdfmark" % (w,h)) 
+        this.emit("%sBoundingBox: 0 0 %d %d" % ("%%",w,h))
+        this.emit("%sCropBox: 0 0 %d %d" % ("%%",w,h))
+        this.emit("%sDocumentFonts: Times-Roman" % "%%")
+        this.emit("%sEndComments" % "%%")
+        this.emit("[ /CropBox [ 0 0 %d %d ] /PAGES pdfmark" % (w,h))
+        this.emit(PostScript.PROLOG)
 
     def drawArrow(this, x1, y1, x2, y2):
         x = x1 * PostScript.SCALE + PostScript.OFFSET
         y = y1 * PostScript.SCALE + PostScript.OFFSET
         length = math.sqrt((y2-y1)**2+(x2-x1)**2) * PostScript.SCALE
         angle = PostScript.R2D * math.atan2(y2-y1, x2-x1)
-        print ("gsave %f %f translate %f rotate" % (x,y,angle))
-        print ("newpath 0 0 moveto %f 0 lineto stroke" % (length-3))
-        print ("%f 0 translate" % length )
-        print ("newpath 0 0 moveto -7.5 3 rlineto 3 -3 rlineto -3 -3 rlineto")
-        print ("closepath fill grestore")
-        
+        this.emit("%.2f %.2f %.2f %.2f ar" % (x,y,angle,length))
+
     def drawCircle(this, x, y, radius):
         x = x * PostScript.SCALE + PostScript.OFFSET
         y = y * PostScript.SCALE + PostScript.OFFSET
         radius *= PostScript.SCALE
-        print ("1 setgray")
-        print ("newpath %f %f %f 0 360 arc fill" % (x,y,radius))
-        print ("0 setgray")
-        print ("newpath %f %f %f 0 360 arc stroke" % (x,y,radius))
+        this.emit("%.2f %.2f %.2f ci" % (x,y,radius))
 
     def drawText(this, x, y, string, pos = None):
         x = x * PostScript.SCALE + PostScript.OFFSET
         y = y * PostScript.SCALE + PostScript.OFFSET
-        print ("/Times-Roman findfont 12 scalefont setfont")
-        print ("newpath %f %f moveto" % (x,y))
         if pos and pos == 'above':  ## nudge y up a little for x-centred, y-'above' drawing
             y_adjust = 4
         else:   ## otherwise, nudge y down for both x and y centred drawing
-            y_adjust = -4        
-        print ("(%s) dup stringwidth pop 2 div neg %d rmoveto show" % (string, y_adjust))
+            y_adjust = -4
+        string = str(string).replace("\\","\\\\").replace("(","\\(").replace(")","\\)")
+        this.emit("(%s) %.2f %.2f %d lb" % (string,x,y,y_adjust))
 
     def drawCurve(this, sx, sy, cp1x, cp1y, cp2x, cp2y, ex, ey):
         sx   = sx   * PostScript.SCALE + PostScript.OFFSET
@@ -177,11 +355,93 @@ class PostScript(DrawingSurface):
         ey   = ey   * PostScript.SCALE + PostScript.OFFSET
         midx = (cp1x + cp2x) / 2.0
         midy = (cp1y + cp2y) / 2.0
-        print ("newpath %f %f moveto %f %f %f %f %f %f curveto" %\
-               (sx,sy,cp1x,cp1y,cp1x,cp1y,midx,midy))
-        print ("%f %f %f %f %f %f curveto stroke" % (cp2x,cp2y,cp2x,cp2y,ex,ey))
-        print ("newpath %f %f moveto" % (ex,ey))
-        if cp2y > ey:  
-            print ("3 7.5 rlineto -3 -3 rlineto -3 3 rlineto closepath fill")
-        else:
-            print ("3 -7.5 rlineto -3 3 rlineto -3 -3 rlineto closepath fill")
+        if cp2y > ey: head = "hu"
+        else: head = "hd"
+        this.emit("newpath %.2f %.2f moveto %.2f %.2f %.2f %.2f %.2f %.2f curveto "
+                  "%.2f %.2f %.2f %.2f %.2f %.2f curveto stroke %.2f %.2f %s" %
+                  (sx,sy,cp1x,cp1y,cp1x,cp1y,midx,midy,cp2x,cp2y,cp2x,cp2y,ex,ey,ex,ey,head))
+
+
+##-------------------------------------------------------------------
+##
+## SVG: a class that generates an SVG representation of a finite-automaton
+##      graph, suitable for viewing in a web browser (which copes with far
+##      bigger drawings than a Tk canvas).
+##
+## Use: as for PostScript,
+##
+## >>> SVG(nfa3,"nfa3.svg")
+##
+## or with no filename, to write to standard output (or to the file
+## object passed as argument "stream").
+##
+## The output is written as it is generated, in large blocks.  All the
+## styling (line widths, fill colours, the font, the arrowhead marker) is
+## defined once, in a <defs> section at the top, and each item drawn refers
+## to it by class, so each is a single short element.
+##
+class SVG(DrawingSurface):
+    SCALE = 4             ## Pixels per millimetre, as for TkDrawing.
+    OFFSET = 20
+
+    DEFS = """<defs>
+<marker id="head" viewBox="0 0 10 6" refX="10" refY="3" markerWidth="10" markerHeight="6" markerUnits="userSpaceOnUse" orient="auto">
+<path d="M0,0 L10,3 L0,6 L3,3 Z"/>
+</marker>
+<style type="text/css"><![CDATA[
+.e { fill: none; stroke: black; stroke-width: 1; marker-end: url(#head); }
+.s { fill: white; stroke: black; stroke-width: 1; }
+.l { font-family: Times, serif; font-size: 12px; text-anchor: middle; }
+.a { dominant-baseline: auto; }
+.c { dominant-baseline: central; }
+]]></style>
+</defs>"""
+
+    def __init__(this,automaton,outputFileName=None,stream=None):
+        this.automaton = automaton
+        try:
+            this.openOutput(outputFileName,stream)
+            w = SVG.SCALE * this.automaton.width + 2 * SVG.OFFSET
+            h = SVG.SCALE * this.automaton.height + 2 * SVG.OFFSET
+            this.emit('<?xml version="1.0" encoding="UTF-8"?>')
+            this.emit('<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" '
+                      'viewBox="0 0 %d %d">' % (w,h,w,h))
+            this.emit(SVG.DEFS)
+            this.automaton.draw(this)
+            this.emit("</svg>")
+            this.closeOutput()
+        except IOError, e:
+            print "Output problem", e
+
+    def point(this,x,y):
+        return (x * SVG.SCALE + SVG.OFFSET,
+                (this.automaton.height - y) * SVG.SCALE + SVG.OFFSET)
+
+    def drawArrow(this, x1, y1, x2, y2):
+        this.emit('<path class="e" d="M%.1f,%.1f L%.1f,%.1f"/>' %
+                  (this.point(x1,y1) + this.point(x2,y2)))
+
+    def drawCircle(this, x, y, radius):
+        this.emit('<circle class="s" cx="%.1f" cy="%.1f" r="%.1f"/>' %
+                  (this.point(x,y) + (radius * SVG.SCALE,)))
+
+    def drawText(this, x, y, string, pos=None):
+        x,y = this.point(x,y)
+        if pos and pos == 'above':
+            y -= 4
+            style = "l a"
+        else: style = "l c"
+        string = str(string).replace("&","&amp;").replace("<","&lt;").replace(">","&gt;")
+        this.emit('<text class="%s" x="%.1f" y="%.1f">%s</text>' % (style,x,y,string))
+
+    def drawCurve(this, sx, sy, cp1x, cp1y, cp2x, cp2y, ex, ey):
+        sx,sy = this.point(sx,sy)
+        cp1x,cp1y = this.point(cp1x,cp1y)
+        cp2x,cp2y = this.point(cp2x,cp2y)
+        ex,ey = this.point(ex,ey)
+        midx = (cp1x + cp2x) / 2.0
+        midy = (cp1y + cp2y) / 2.0
+        this.emit('<path class="e" d="M%.1f,%.1f C%.1f,%.1f %.1f,%.1f %.1f,%.1f '
+                  'C%.1f,%.1f %.1f,%.1f %.1f,%.1f"/>' %
+                  (sx,sy,cp1x,cp1y,cp1x,cp1y,midx,midy,cp2x,cp2y,cp2x,cp2y,ex,ey))
+
@@ -45,7 +45,9 @@
 ##     listStates:   Return a list of States in this automaton.
 ##
 ##     output_plain: Generate a plain representation of this automaton on
-##                   standard output.  The grammar for the representation is
+##                   standard output (or on the file object passed as the
+##                   optional "stream" parameter, as for all the output_
+##                   methods).  The grammar for the representation is
 ##
 ##                   <plain-output>         :== <title-line>
 ##                                              <state-count-line>
@@ -64,16 +66,26 @@
 ##                   <transition>           :== "    (" <char> ") --> " <name>
 ##                   <integer>              :== unsigned integer
 ##                   <name>                 :== a printable string
-##                   <char>                 :== "eps" | a single character
+##                   <char>                 :== "eps" | a single character |
+##                                              "\x" two hex digits
+##
+##                   A character that is not printable ASCII, or is "\",
+##                   is written as "\xNN" (see plainSymbol), so that bytes
+##                   such as newline (in a negated class, say) don't break
+##                   the format's lines.
 ##
 ##     output_dot:   Generate a representation of the automaton in the Graphviz
-##                   graph-description language.  Outputs to sys.stdout.
+##                   graph-description language.  Outputs to sys.stdout by
+##                   default.
 ##
 ##     output_table: Generate a tabular-representation of the automaton. Takes a
 ##                   single optional parameter "latex", if False (the default)
 ##                   this method just generates a plain-text table, if True, it
 ##                   generates a table in LaTeX source form.
 ##
+## The output methods assemble their output as a list of lines and write it
+## to the stream in one go, and each makes a single pass over the states and
+## transitions of the automaton, so their running time is linear in its size.
 ##
 ##
 ## Support methods (don't call these directly from the user level):
@@ -100,6 +112,7 @@
 ##     re2tex:       Converts a regular-expression string to TeX-format.
 ##
 ## 
+import sys
 from state import State
 from connector import *
 
@@ -122,6 +135,7 @@ class FA(object):
     def listStates(this):
         "Return a list of all the unique states in this automaton."
         stateList = [this.startState]
+        seen = set(stateList)
         index = 0
         namesAreIntegers = True
         namesArePrefixedIntegers = True
@@ -133,31 +147,34 @@ class FA(object):
                 namesArePrefixedIntegers = state.name[1:].isdigit()
             for successor in state.successors: 
                 nextState = successor[1]  ## Field 1 of the successor tuple is the next State object.
-                if not nextState in stateList: stateList.append(nextState)
+                if not nextState in seen:
+                    seen.add(nextState)
+                    stateList.append(nextState)
         ## Sort the list of states by name (if it is longer than 1).
         if len(stateList) > 1:
             if namesAreIntegers: 
-                stateList.sort(lambda s1,s2: int(s1.name) - int(s2.name))
+                stateList.sort(key=lambda s: int(s.name))
             elif namesArePrefixedIntegers:
-                stateList.sort(lambda s1,s2: int(s1.name[1:]) - int(s2.name[1:]))
+                stateList.sort(key=lambda s: int(s.name[1:]))
             else:
-                stateList.sort(lambda s1,s2: cmp(s1.name,s2.name))
+                stateList.sort(key=lambda s: s.name)
         return stateList
 
 
-    def output_plain(this,title,nfa_type=None):
+    def output_plain(this,title,nfa_type=None,stream=None):
         "Print out the automaton in plain textual format."
-        print title              ## "title" should be "NFA" or "DFA" 
-        print "States:", this.stateCount
-        print "Start state:", this.startState.name
-        if nfa_type: print nfa_type ## Should be "Thompson NFA", "Non-Thompson NFA" for an NFA.
+        lines = [str(title),     ## "title" should be "NFA" or "DFA" 
+                 "States: %s" % this.stateCount,
+                 "Start state: %s" % this.startState.name]
+        if nfa_type: lines.append(nfa_type) ## Should be "Thompson NFA", "Non-Thompson NFA" for an NFA.
         for i in range(len(this.finalStates)):
-            print "  Accepting state: %2s  '%s'" % (this.finalStates[i].name,this.regExprs[i])
+            lines.append("  Accepting state: %2s  '%s'" % (this.finalStates[i].name,this.regExprs[i]))
         for state in this.listStates():
             if len(state.successors) > 0:
-                print "State", state.name
+                lines.append("State %s" % state.name)
                 for transition in state.successors:
-                    print "    (%s) --> %s" % (transition[0],transition[1].name)
+                    lines.append("    (%s) --> %s" % (plainSymbol(transition[0]),transition[1].name))
+        writeLines(lines,stream)
 
 
     ##
@@ -176,42 +193,44 @@ class FA(object):
     ## alternative, this sometimes works well.  "circo" is another option, but it
     ## doesn't do a good job of laying out the arcs.
     ##
-    def output_dot(this,title):
+    def output_dot(this,title,stream=None):
         """Print out the automaton in the format of the GraphViz graph language, in a.
            form intended for processing by the dot, twopi or circo programs."""
-        print "digraph", title, "{"
-        print "    rankdir=LR"
-        print "    node [shape = doublecircle];",
-        for finalState in this.finalStates: print finalState.name,
-        print ";\n    node [shape = circle];"
+        lines = ["digraph %s {" % title,
+                 "    rankdir=LR",
+                 "    node [shape = doublecircle];%s ;" %
+                 "".join([" %s" % finalState.name for finalState in this.finalStates]),
+                 "    node [shape = circle];"]
         for state in this.listStates():
             if len(state.successors) > 0:
-                found = set([])  ## Target states from current one seen so far.
-                for i in range(len(state.successors)):
-                    transition = state.successors[i]
-                    if not transition[1].name in found:  ## If new, issue dot arc command.
-                        found.add(transition[1].name)
-                        s = "    %s -> %s" % (state.name,transition[1].name)
-                        if transition[0] != FA.EPS:
-                            s += ' [ label = "%s' % transition[0]
-                            ## Check over remaining transitions to see if any coalescing
-                            ## can happen here.
-                            for j in range(i+1,len(state.successors)):
-                                t2 = state.successors[j]
-                                if t2[1].name == transition[1].name:  s += '|%s' % t2[0]
-                            s += '" ];'
-                        else: s += ";"
-                        print s
-        print "}"
+                ## Group the transition characters by target state name in a single
+                ## pass, keeping the targets in order of their first appearance.
+                targets = []
+                labels = {}
+                for transition in state.successors:
+                    targetName = transition[1].name
+                    if targetName in labels: labels[targetName].append(transition[0])
+                    else:
+                        labels[targetName] = [transition[0]]
+                        targets.append(targetName)
+                for targetName in targets:
+                    chars = labels[targetName]
+                    if chars[0] != FA.EPS:
+                        lines.append('    %s -> %s [ label = "%s" ];' %
+                                     (state.name,targetName,"|".join(chars)))
+                    else:
+                        lines.append("    %s -> %s;" % (state.name,targetName))
+        lines.append("}")
+        writeLines(lines,stream)
 
 
-    def output_table(this,latex=False):
+    def output_table(this,latex=False,stream=None):
         """Output the automaton in tabular format, if latex is True, output LaTeX code,
            otherwise just plain text. if showREcolumn is True, display a column at the
            right-hand-edge with the regular expressions recognised by the automaton."""
         (row_labels,table,col_labels) = this.__format_table__()
-        if latex:  this.__output_tex_formatted_table__(row_labels,table,col_labels)
-        else:      this.__output_plain_formatted_table__(row_labels,table,col_labels)
+        if latex:  this.__output_tex_formatted_table__(row_labels,table,col_labels,stream)
+        else:      this.__output_plain_formatted_table__(row_labels,table,col_labels,stream)
 
     ##
     ## "__format_table__" generates a 2-d table (a list of lists) representing the next 
@@ -259,29 +278,28 @@ class FA(object):
         stateList = this.listStates()
         table = []  ## Table will be a row-column structure (a list of lists) holding targets on state/alpha.
         row_labels = [ str(state.name) for state in stateList ] ## State numbers as strings, one per row.
+        showREs = this.showREcolumn()
+        finalREs = {}                   ## Map each accepting state to its (first) associated RE.
+        for i,finalState in enumerate(this.finalStates):
+            if not finalState in finalREs: finalREs[finalState] = this.regExprs[i]
         ## Iterate over all the states in the NFA to build the 2-d table structure.
         for state in stateList:
+            targets = {}                ## Group the targets of this state by transition char in a
+            for succ in state.successors:                     ## single pass over its successors.
+                if succ[0] in targets: targets[succ[0]].append(succ[1].name)
+                else: targets[succ[0]] = [succ[1].name]
             row = []                    ## Current row being built, for this row:
             for alpha in alphaList:     ## Iterate over all the possible transiton chars (i.e., the alphabet).
-                slist = []              ## slist will be a list of targets on this state/alpha combination.
-                for succ in state.successors: ## We have to look at the successors list to see if there is a
-                    if succ[0] == alpha: slist.append(succ[1].name) ## transition out on state/alpha.
-                slist.sort()            ## Sort the target list for pretty-looking results.
-                s = "" ; first = True   ## Now convert it to a comma-separated string.
-                for target in slist:
-                    if first: s += str(target); first = False
-                    else: s += ", %s" % target
-                row.append(s)           ## Put the string in the table indexed by state and alpha.
-            if this.showREcolumn():     ## If this is an OuterChoice NFA or a DFA we have to add the RE
-                isFinal = False         ## associated with this state if it is an accepting state.
-                for i,finalState in enumerate(this.finalStates):
-                    if state == finalState:
-                        row.append(this.regExprs[i])
-                        isFinal = True
-                        break
-                if not isFinal: row.append("")
+                slist = targets.get(alpha)  ## slist is the list of targets on this state/alpha combination.
+                if slist:
+                    slist.sort()        ## Sort the target list for pretty-looking results, and
+                    row.append(", ".join([str(target) for target in slist])) ## convert to a string.
+                else:
+                    row.append("")
+            if showREs:                 ## If this is an OuterChoice NFA or a DFA we have to add the RE
+                row.append(finalREs.get(state,""))  ## associated with this state if it is accepting.
             table.append(row)           ## Add the assembled row (all columns for this state) to the table.
-        return (row_labels,table,alphaList)
+        return (row_labels,table,[symbolText(alpha) for alpha in alphaList])
 
 
     def showREcolumn(this):
@@ -293,7 +311,7 @@ class FA(object):
         return True
 
 
-    def __output_plain_formatted_table__(this,row_labels,table,col_labels):
+    def __output_plain_formatted_table__(this,row_labels,table,col_labels,stream=None):
         ## First calculate the minimum required width for each table column.
         col_labels = [''] + col_labels
         col_widths = [len(s) for s in col_labels]  ## Initial widths from widths of column headers.
@@ -304,34 +322,35 @@ class FA(object):
         header = "      "                                 ## Generate a string for the column
         for i,label in enumerate(col_labels):             ## headers and print it.
             header += label.rjust(col_widths[i]+1) + ' |'
-        print header
         linesep = "      "                                        ## Linesep is a divided between
         for widths in col_widths: linesep += (widths+2)*'-' + '+' ## the table header and body.
-        print linesep
+        lines = [header,linesep]
+        showREs = this.showREcolumn()
         for i,row in enumerate(table):             ## Now do the main body of the table
             line = "      "
             row = [row_labels[i]] + row            ## Prepend state name as first column.
             for j in range(len(col_widths)):
                 line += row[j].rjust(col_widths[j]+1) + ' |'
-            if this.showREcolumn() and row[-1] != '':  ## If this is a DFA or OuterChoice NFA
-                line += ' "%s"' % row[-1]              ## may need to add the RE.
-            print line
-        print linesep
+            if showREs and row[-1] != '':          ## If this is a DFA or OuterChoice NFA
+                line += ' "%s"' % row[-1]          ## may need to add the RE.
+            lines.append(line)
+        lines.append(linesep)
+        writeLines(lines,stream)
         
 
-    def __output_tex_formatted_table__(this,row_labels,table,col_labels):
+    def __output_tex_formatted_table__(this,row_labels,table,col_labels,stream=None):
         ## Output header for a complete LaTeX2e document.
-        print "\\documentclass[12pt,a4paper]{article}"
-        print "\\usepackage{times}"
-        print "\\begin{document}"
-        print "\\thispagestyle{empty}"
-        print "\\begin{center}"
+        lines = ["\\documentclass[12pt,a4paper]{article}",
+                 "\\usepackage{times}",
+                 "\\begin{document}",
+                 "\\thispagestyle{empty}",
+                 "\\begin{center}"]
         ## Generate and output the TeX table format instructions.
         formatInstrs="\\begin{tabular}{r|"
         for i in range(len(col_labels)): formatInstrs += "|c"
         formatInstrs += "|l}"
         lineSep = "\cline{1-%d}" % (1+len(col_labels))
-        print formatInstrs
+        lines.append(formatInstrs)
         ## Convert the formatting of the column headers to TeX style.
         for i in range(len(col_labels)):
             if col_labels[i] == FA.EPS: col_labels[i] = "$\epsilon$"
@@ -347,19 +366,21 @@ class FA(object):
         header = ""
         for i,label in enumerate(col_labels): header += label.rjust(col_widths[i]+1) + ' &'
         header += " \\\\ " + lineSep
-        print header
+        lines.append(header)
+        showREs = this.showREcolumn()
         for i,row in enumerate(table):             ## Now do the main body of the table
             line = ""
             row = [row_labels[i]] + row            ## Prepend state name as first column.
             for j in range(len(col_widths)):
                 line += row[j].rjust(col_widths[j]+1) + ' &'
-            if this.showREcolumn() and row[-1] != '':          ## If this is a DFA or OuterChoice NFA
+            if showREs and row[-1] != '':                      ## If this is a DFA or OuterChoice NFA
                 line += " %s" % this.re2tex(row[-1])           ## may need to add the RE.
             line += " \\rule{0pt}{2.4ex}\\\\ %s" % lineSep     ## Note the 2.4ex struct, needed to
-            print line                                         ## get decent separation between rows.
-        print "\\end{tabular}"
-        print "\\end{center}"
-        print "\\end{document}"
+            lines.append(line)                                 ## get decent separation between rows.
+        lines.extend(["\\end{tabular}",
+                      "\\end{center}",
+                      "\\end{document}"])
+        writeLines(lines,stream)
 
 
     def __repr__(this):
@@ -389,6 +410,40 @@ class FA(object):
         ## 3.  Replace all *'s with superscripted TeX \ast markers.
         return re.replace('*','^\\ast ')
 
+
+##------------------------------------------------------------------------------
+##
+## symbolText: a transition symbol as shown in table headings.  Single bytes
+## that aren't printable ASCII (e.g. the bytes of UTF-8 sequences, from the
+## character classes of retree.py) are shown as \xNN.
+##
+def symbolText(symbol):
+    if len(symbol) == 1 and not ' ' <= symbol <= '~': return "\\x%02X" % ord(symbol)
+    return symbol
+
+
+##------------------------------------------------------------------------------
+##
+## plainSymbol: a transition symbol as written in the plain format (see
+## output_plain).  As symbolText, but "\\" is escaped too, so that readPlain
+## (in nfa2dfa.py) can tell "\xNN" from the characters themselves.
+##
+def plainSymbol(symbol):
+    if len(symbol) == 1 and (symbol == '\\' or not ' ' <= symbol <= '~'):
+        return "\\x%02X" % ord(symbol)
+    return symbol
+
+
+##------------------------------------------------------------------------------
+##
+## writeLines: write a list of output lines to a stream (standard output if
+## stream is None) in bulk, rather than a line at a time.
+##
+def writeLines(lines,stream=None):
+    if stream is None: stream = sys.stdout
+    stream.write("\n".join(lines))
+    stream.write("\n")
+
 ##-----------------------------------------------------------------------------
 ##  End of class RE
 ##-----------------------------------------------------------------------------
@@ -0,0 +1,284 @@
+##------------------------------------------------------------------------------
+##
+## fabin.py -- A compact, versioned binary interchange format for NFAs and
+##             DFAs.
+##
+## The plain format written by FA.output_plain (and read by parsePlain in
+## nfa2dfa.py) is meant for humans, and is both large and slow to parse for
+## big automata.  This format is meant for programs: it is written with a
+## handful of "struct" and "array" calls, and loaded the same way, without
+## any tokenising.  It can optionally be loaded from a memory-mapped file,
+## in which case only the parts of the file being decoded are copied into
+## Python strings.
+##
+## Layout.  All integers are little-endian and unsigned, and 32 bits wide
+## unless noted otherwise.
+##
+##     header:       magic "FAB\0" (4 bytes), version (16 bits), kind (8 bits,
+##                   one of the KIND_ characters below), flags (8 bits).
+##     counts:       stateCount, startState, symbolCount, acceptCount,
+##                   transitionCount, nameBytes.
+##     symbols:      symbolCount entries, each a 16-bit length followed by
+##                   that many bytes of UTF-8.  "eps" is the epsilon symbol,
+##                   exactly as in the plain format.
+##     names:        nameBytes bytes of state names, separated by NULs.
+##                   Omitted (nameBytes is 0 and FLAG_NUMBERED is set) if
+##                   the states are named 0, 1, 2 ... in index order.
+##     accepting:    acceptCount entries, each an accepting state index
+##                   followed by its RE as a length and that many bytes of
+##                   UTF-8, in the order of the automaton's finalStates list.
+##     offsets:      stateCount+1 entries.  The transitions out of state i
+##                   are entries offsets[i] to offsets[i+1]-1 of the two
+##                   arrays that follow.
+##     symbolIndex:  transitionCount entries, indices into the symbol table.
+##     targets:      transitionCount entries, target state indices.
+##
+## Functions:
+##
+##          writeBinary(fa,stream)  -- Write an NFA or DFA to a (binary) file
+##                                     object.
+##          dumps(fa)               -- Return an NFA or DFA as a string in the
+##                                     binary format.
+##
+##          readBinary(stream,useMmap=False)
+##                                  -- Read an NFA or DFA from a file object,
+##                                     memory-mapping it if useMmap is True
+##                                     and the file allows it.
+##          loads(data)             -- Rebuild an NFA or DFA from a string.
+##          loadBinary(fileName,useMmap=True)
+##                                  -- Read an NFA or DFA from a named file.
+##
+##          binaryStream(stream)    -- Put a standard stream (e.g., stdin or
+##                                     stdout) into binary mode, needed on
+##                                     Windows only.
+##
+## The reading functions return an NFA, ThompsonNFA or DFA object, built from
+## State or DFAState objects just like those generated by parsePlain.  As with
+## parsePlain, a badly-formed input is reported on standard output and None is
+## returned.
+##
+import struct
+import sys
+from array import array
+from fa import FA
+from nfa import NFA, ThompsonNFA
+from dfa import DFA
+from state import State,DFAState
+
+MAGIC   = "FAB\0"
+VERSION = 1
+
+KIND_NFA          = 'N'
+KIND_THOMPSON_NFA = 'T'
+KIND_DFA          = 'D'
+
+FLAG_NUMBERED = 0x01     ## States are named by their index, no name table.
+
+HEADER = struct.Struct("<4sHcB")
+COUNTS = struct.Struct("<6I")
+UINT16 = struct.Struct("<H")
+UINT32 = struct.Struct("<I")
+
+## Find an array typecode for unsigned 32-bit integers on this platform.
+if array('I').itemsize == 4: UINT32_ARRAY = 'I'
+else: UINT32_ARRAY = 'L'
+
+
+class FormatError(Exception):
+    "Raised internally when a binary automaton is badly formed."
+    pass
+
+
+##------------------------------------------------------------------------------
+##
+## Writing.
+##
+##
+def dumps(fa):
+    "Return the argument automaton (NFA or DFA) as a binary-format string."
+    if isinstance(fa,DFA): kind = KIND_DFA
+    elif isinstance(fa,ThompsonNFA): kind = KIND_THOMPSON_NFA
+    else: kind = KIND_NFA
+    stateList = fa.listStates()
+    stateIndex = dict((state,i) for i,state in enumerate(stateList))
+
+    symbols = sorted(fa.alphabet)
+    symbolIndex = dict((symbol,i) for i,symbol in enumerate(symbols))
+    offsets = array(UINT32_ARRAY,[0])
+    symbolIndices = array(UINT32_ARRAY)
+    targets = array(UINT32_ARRAY)
+    for state in stateList:
+        for successor in state.successors:
+            symbol = successor[0]
+            if not symbol in symbolIndex:  ## Alphabet may not be complete.
+                symbolIndex[symbol] = len(symbols)
+                symbols.append(symbol)
+            symbolIndices.append(symbolIndex[symbol])
+            targets.append(stateIndex[successor[1]])
+        offsets.append(len(targets))
+
+    flags = 0
+    names = ""
+    if all(str(state.name) == str(i) for i,state in enumerate(stateList)):
+        flags |= FLAG_NUMBERED
+    else:
+        names = "\0".join(encodeText(state.name) for state in stateList)
+
+    parts = [HEADER.pack(MAGIC,VERSION,kind,flags),
+             COUNTS.pack(len(stateList),stateIndex[fa.startState],len(symbols),
+                         len(fa.finalStates),len(targets),len(names))]
+    for symbol in symbols:
+        symbol = encodeText(symbol)
+        parts.append(UINT16.pack(len(symbol)))
+        parts.append(symbol)
+    parts.append(names)
+    for finalState,regExpr in zip(fa.finalStates,fa.regExprs):
+        regExpr = encodeText(regExpr)
+        parts.append(UINT32.pack(stateIndex[finalState]))
+        parts.append(UINT32.pack(len(regExpr)))
+        parts.append(regExpr)
+    for packed in (offsets,symbolIndices,targets):
+        if sys.byteorder == 'big': packed.byteswap()
+        parts.append(packed.tostring())
+    return "".join(parts)
+
+
+def writeBinary(fa,stream):
+    "Write the argument automaton (NFA or DFA) to stream in binary format."
+    stream.write(dumps(fa))
+
+
+def encodeText(text):
+    "Convert a state name, symbol or RE to a UTF-8 byte string."
+    if isinstance(text,unicode): return text.encode("utf-8")
+    return str(text)
+
+
+##------------------------------------------------------------------------------
+##
+## Reading.
+##
+##
+def loads(data):
+    """Rebuild an NFA or DFA from a binary-format string (or any other object
+       supporting the buffer interface and slicing, e.g., an mmap)."""
+    try:
+        return decode(data)
+    except (FormatError,struct.error), e:
+        print "Format Error:", e
+        return None
+
+
+def readBinary(stream,useMmap=False):
+    """Read a binary-format NFA or DFA from a file object.  If useMmap is
+       True, try to memory-map the file rather than reading it into a
+       string (falling back to reading it if the file can't be mapped,
+       e.g., if it is a pipe)."""
+    if useMmap:
+        import mmap
+        try:
+            data = mmap.mmap(stream.fileno(),0,access=mmap.ACCESS_READ)
+        except (AttributeError,ValueError,EnvironmentError,mmap.error):
+            data = None
+        if data is not None:
+            try: return loads(data)
+            finally: data.close()
+    return loads(stream.read())
+
+
+def loadBinary(fileName,useMmap=True):
+    "Read a binary-format NFA or DFA from the named file."
+    stream = open(fileName,"rb")
+    try: return readBinary(stream,useMmap)
+    finally: stream.close()
+
+
+def decode(data):
+    "Decode a binary-format automaton, raising FormatError on bad input."
+    if len(data) < HEADER.size + COUNTS.size: raise FormatError, "file too short"
+    magic,version,kind,flags = HEADER.unpack_from(data,0)
+    if magic != MAGIC: raise FormatError, "not a binary automaton file"
+    if version != VERSION:
+        raise FormatError, ("unsupported format version %d (expected %d)" % (version,VERSION))
+    if kind == KIND_DFA: fa = DFA() ; newState = DFAState
+    elif kind == KIND_THOMPSON_NFA: fa = ThompsonNFA() ; newState = State
+    elif kind == KIND_NFA: fa = NFA() ; newState = State
+    else: raise FormatError, ("unknown automaton kind '%s'" % kind)
+    offset = HEADER.size
+    stateCount,startIndex,symbolCount,acceptCount,transitionCount,nameBytes = \
+        COUNTS.unpack_from(data,offset)
+    offset += COUNTS.size
+
+    symbols = []
+    for i in xrange(symbolCount):
+        (length,) = UINT16.unpack_from(data,offset) ; offset += UINT16.size
+        symbols.append(decodeText(data[offset:offset+length])) ; offset += length
+
+    if flags & FLAG_NUMBERED:
+        names = [str(i) for i in xrange(stateCount)]
+    else:
+        names = [decodeText(name) for name in data[offset:offset+nameBytes].split("\0")]
+        offset += nameBytes
+        if len(names) != stateCount: raise FormatError, "state name table is the wrong size"
+    if kind == KIND_DFA: states = [newState(name) for name in names]
+    else: states = [newState(name,(-1,-1),list()) for name in names]
+    if not startIndex < stateCount: raise FormatError, "start state out of range"
+
+    for i in xrange(acceptCount):
+        stateNo,length = struct.unpack_from("<2I",data,offset) ; offset += 8
+        if not stateNo < stateCount: raise FormatError, "accepting state out of range"
+        fa.finalStates.append(states[stateNo])
+        fa.regExprs.append(decodeText(data[offset:offset+length])) ; offset += length
+
+    offsets = unpackArray(data,offset,stateCount+1) ; offset += 4 * (stateCount+1)
+    symbolIndices = unpackArray(data,offset,transitionCount) ; offset += 4 * transitionCount
+    targets = unpackArray(data,offset,transitionCount)
+    if offsets[-1] != transitionCount: raise FormatError, "transition table is inconsistent"
+    for i in xrange(stateCount):
+        if offsets[i] > offsets[i+1]: raise FormatError, "transition table is inconsistent"
+    if transitionCount > 0:
+        if not max(symbolIndices) < symbolCount: raise FormatError, "transition symbol out of range"
+        if not max(targets) < stateCount: raise FormatError, "transition target out of range"
+    for i,state in enumerate(states):
+        successors = state.successors
+        for j in xrange(offsets[i],offsets[i+1]):
+            successors.append((symbols[symbolIndices[j]],states[targets[j]],None))
+
+    fa.startState = states[startIndex]
+    fa.stateCount = stateCount
+    fa.alphabet = set(symbols)
+    if kind == KIND_DFA: fa.alphabet.discard(FA.EPS)
+    else: fa.rePrecedence = 0
+    return fa
+
+
+def unpackArray(data,offset,count):
+    "Unpack count 32-bit unsigned integers from data starting at offset."
+    packed = array(UINT32_ARRAY)
+    raw = data[offset:offset+4*count]
+    if len(raw) != 4*count: raise FormatError, "file truncated"
+    packed.fromstring(raw)
+    if sys.byteorder == 'big': packed.byteswap()
+    return packed
+
+
+def decodeText(text):
+    """Convert UTF-8 bytes back to a string.  The bytes are kept as they are
+       (not decoded to unicode): symbols may be single bytes of a UTF-8
+       sequence (see utf8.py), and REs are byte strings too."""
+    return str(text)
+
+
+##------------------------------------------------------------------------------
+##
+## binaryStream: on Windows, standard input and output are opened in text
+## mode, which mangles binary data.  Switch the argument stream to binary
+## mode.  (A no-op everywhere else.)
+##
+##
+def binaryStream(stream):
+    "Put a standard stream into binary mode (needed on Windows only)."
+    if sys.platform == "win32":
+        import os, msvcrt
+        msvcrt.setmode(stream.fileno(),os.O_BINARY)
+    return stream
@@ -0,0 +1,212 @@
+##------------------------------------------------------------------------------
+##
+## followpos.py -- Direct construction of a DFA from regular expressions,
+##                 bypassing the NFA.
+##
+## This is the "followpos" (or position) construction of Aho, Compilers,
+## 2nd ed., section 3.9.5.  Each character in an RE is a "position" (as is
+## each single-byte character class, see retree.py, which is a position
+## matching any of its bytes), and the DFA states are sets of positions
+## rather than sets of NFA states.  No
+## epsilon states are ever built, so this is typically much faster (and
+## needs far less memory) than going RE -> Thompson NFA -> subset.
+##
+## Several REs are handled together, as with parseREs/OuterChoiceNFA: the
+## RE list r1 r2 ... rN is augmented to (r1#1)|(r2#2)|...|(rN#N), where each
+## end-marker #i is a position of its own.  A DFA state containing end-marker
+## #i accepts ri, and as with the NFA route, if more than one end-marker is
+## present the earliest RE in the list has priority.
+##
+## Function:
+##
+##          followposDFA(regExpressions,verbose=False)
+##
+##              Arguments:
+##
+##                  regExpressions - As for parseREs: either a string
+##                            containing a number of (space-separated) REs,
+##                            or a list of strings, each holding one RE.
+##
+##                  verbose - A boolean.  If True, print the positions,
+##                            their followpos sets and a record of the
+##                            construction of the DFA.
+##
+##              Returns: a DFA object (or None if there is a syntax error
+##                       in an RE).  The DFA can be minimised with
+##                       minimiseDFA and used with DFAScanner (and the
+##                       "scan" method of DFA) just like one built by
+##                       subset.  The "stateSet" of each DFAState is the
+##                       PositionSet from which it was built.
+##
+## The position analysis itself is available separately, as class Positions,
+## for other position-based constructions.
+##
+##
+from retree import parseTrees, Char, CharClass, Alt, Concat, Star, EPSILON
+from dfa import DFA, nameDFAStates
+from state import DFAState
+
+
+##------------------------------------------------------------------------------
+##
+## Positions: the position analysis of a list of RE syntax trees.  Positions
+## are numbered from 1, in left-to-right order through the REs.
+##
+## Fields are:
+##
+##    symbols:    A list, indexed by position, of the characters each position
+##                matches, held as a tuple.  End-markers match nothing and have
+##                an empty tuple here.
+##
+##    follow:     A list, indexed by position, of followpos sets.
+##
+##    first:      The set of positions that can begin a match of any of the
+##                REs (i.e., firstpos of the augmented RE).
+##
+##    accepts:    A dictionary mapping each end-marker position to the index
+##                (in the argument list) of the RE it terminates.
+##
+##    alphabet:   The set of all characters used by the REs.
+##
+##    regExprs:   The REs, as strings (formatted as by nfa.py, so that the DFA
+##                reports the same REs as a subset-built one would).
+##
+##
+class Positions(object):
+    "The firstpos/followpos analysis of a list of RE syntax trees."
+    def __init__(this,trees):
+        this.symbols = [()]     ## Position 0 is unused.
+        this.follow = [None]
+        this.first = set()
+        this.accepts = {}
+        this.alphabet = set()
+        this.regExprs = [tree.toString() for tree in trees]
+        for i,tree in enumerate(trees):
+            nullable,first,last = this.analyse(tree)
+            endMarker = this.newPosition(())
+            this.accepts[endMarker] = i
+            for p in last: this.follow[p].add(endMarker)
+            this.first |= first
+            if nullable: this.first.add(endMarker)
+
+    def newPosition(this,symbols):
+        "Allocate a new position, matching the characters in symbols."
+        this.symbols.append(symbols)
+        this.follow.append(set())
+        return len(this.symbols) - 1
+
+    def analyse(this,tree):
+        """Return (nullable,firstpos,lastpos) for a syntax tree, allocating its
+           positions and adding to their followpos sets along the way."""
+        if isinstance(tree,Char):
+            this.alphabet.add(tree.ch)
+            p = this.newPosition((tree.ch,))
+            return False,set([p]),set([p])
+        if isinstance(tree,CharClass) and tree.chars is not None:
+            this.alphabet.update(tree.chars)
+            p = this.newPosition(tuple(sorted(tree.chars)))
+            return False,set([p]),set([p])
+        if tree is EPSILON: return True,set(),set()
+        if isinstance(tree,Star):
+            nullable,first,last = this.analyse(tree.item)
+            for p in last: this.follow[p] |= first
+            return True,first,last
+        if isinstance(tree,Alt):
+            nullable,first,last = False,set(),set()
+            for item in tree.items:
+                n,f,l = this.analyse(item)
+                nullable = nullable or n
+                first |= f
+                last |= l
+            return nullable,first,last
+        assert isinstance(tree,Concat)
+        nullable,first,last = this.analyse(tree.items[0])
+        for item in tree.items[1:]:
+            n,f,l = this.analyse(item)
+            for p in last: this.follow[p] |= f
+            if nullable: first = first | f
+            if n: last = last | l
+            else: last = l
+            nullable = nullable and n
+        return nullable,first,last
+
+    def show(this):
+        "Print out the positions and their followpos sets."
+        print "Position | Char | followpos"
+        print "---------+------+----------------------------"
+        for p in range(1,len(this.symbols)):
+            if p in this.accepts: ch = "#%d" % (this.accepts[p]+1)
+            else: ch = "'%s'" % "".join(this.symbols[p])
+            print "%8d | %4s | %s" % (p,ch,PositionSet(this.follow[p]))
+
+
+##------------------------------------------------------------------------------
+##
+## PositionSet is a (frozen) set of positions, used as the "stateSet" of the
+## DFA states built by followposDFA.  It prints like an NFA StateSet.
+##
+##
+class PositionSet(frozenset):
+    def __str__(this):
+        return this.toString()
+
+    def toString(this,laTeX=False):
+        s = ", ".join([str(p) for p in sorted(this)])
+        if laTeX: return "\\{%s\\}" % s
+        return "{%s}" % s
+
+
+##------------------------------------------------------------------------------
+##
+## followposDFA: build a DFA directly from a list of REs (see header).
+##
+##
+def followposDFA(regExpressions,verbose=False):
+    "Build a DFA for a list of REs using the followpos construction."
+    trees = parseTrees(regExpressions)
+    if trees is None: return None
+    positions = Positions(trees)
+    if verbose: positions.show()
+    symbols = positions.symbols
+    follow = positions.follow
+    accepts = positions.accepts
+    sortedAlphabet = sorted(positions.alphabet)
+
+    dfa = DFA()
+    dfa.alphabet = set(positions.alphabet)
+    startSet = PositionSet(positions.first)
+    dfaStateList = [DFAState("")]     ## States are named once they are all built.
+    dfaStateList[0].stateSet = startSet
+    dfaStates = {startSet: dfaStateList[0]}
+    index = 0
+    while index < len(dfaStateList):
+        aDFAState = dfaStateList[index] ; index += 1
+        moves = {}           ## Union of followpos, by character, for the positions in this state.
+        accepting = None     ## Index of the highest-priority RE accepted by this state.
+        for p in aDFAState.stateSet:
+            if p in accepts:
+                if accepting is None or accepts[p] < accepting: accepting = accepts[p]
+            for ch in symbols[p]:
+                if ch in moves: moves[ch] |= follow[p]
+                else: moves[ch] = set(follow[p])
+        if accepting is not None:
+            dfa.finalStates.append(aDFAState)
+            dfa.regExprs.append(positions.regExprs[accepting])
+        for ch in sortedAlphabet:
+            if ch in moves:
+                targetSet = PositionSet(moves[ch])
+                targetDFAState = dfaStates.get(targetSet)
+                if targetDFAState is None:
+                    targetDFAState = DFAState("")
+                    targetDFAState.stateSet = targetSet
+                    dfaStates[targetSet] = targetDFAState
+                    dfaStateList.append(targetDFAState)
+                aDFAState.successors.append((ch,targetDFAState,None))
+
+    nameDFAStates(dfaStateList)
+    if verbose:
+        for aDFAState in dfaStateList:
+            print "DFA state %s = %s" % (aDFAState.name,aDFAState.stateSet)
+    dfa.startState = dfaStateList[0]
+    dfa.stateCount = len(dfaStateList)
+    return dfa
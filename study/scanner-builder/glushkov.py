@@ -0,0 +1,225 @@
+##------------------------------------------------------------------------------
+##
+## glushkov.py -- The Glushkov (position) NFA for a list of regular
+##                expressions, and a bit-parallel simulation of it.
+##
+## The Thompson NFAs built by re2nfa.py have about two states per RE
+## operator, most of them joined by epsilon transitions, so every step of a
+## simulation (or of subset) needs an epsilon closure.  The Glushkov NFA has
+## exactly one state per character in the REs (a "position", see followpos.py)
+## plus a start state, and no epsilon transitions at all: there is a
+## transition on c from state p to position q if q matches c and q is in
+## followpos(p) (for the start state, if q is in firstpos).
+##
+## Several REs are handled together, as with parseREs.  A position is accepting
+## if it can end a match of the RE it belongs to, and the start state is
+## accepting if any of the REs matches the empty string.  The finalStates list
+## is ordered by RE, so that subset (and the scanners) give the earliest RE
+## in the list priority, as for OuterChoiceNFA.
+##
+## Functions:
+##
+##          glushkovNFA(regExpressions)
+##                  -- Build the Glushkov NFA for a list of REs (given as for
+##                     parseREs).  Returns an NFA object, usable with subset,
+##                     output_plain etc., or None on a syntax error.
+##
+##          glushkovMatcher(regExpressions)
+##                  -- Build a BitParallelMatcher for a list of REs (or None
+##                     on a syntax error).
+##
+## Class:
+##
+##          BitParallelMatcher
+##                  -- Simulates a Glushkov NFA holding the set of active
+##                     states as the bits of a single (Python) integer.  One
+##                     step of the simulation is a few table lookups and an
+##                     "and" with a precomputed mask for the input character,
+##                     with no epsilon closure and no determinisation.  This
+##                     is fast for REs with up to a few hundred positions;
+##                     the cost of a step grows with the number of positions
+##                     divided by 8.
+##
+##              methods: scan  -- as DFA.scan, returns a list of
+##                                (matching-re,matching-substring) tuples.
+##                       match -- returns the (highest priority) RE matching
+##                                the whole of a string, or None.
+##                       longestMatch
+##                             -- the longest match starting at a given index.
+##
+##
+from retree import parseTrees
+from followpos import Positions
+from nfa import NFA
+from state import State
+
+
+##------------------------------------------------------------------------------
+##
+## glushkovStates: number the states of the Glushkov automaton for a Positions
+## object.  State 0 is the start state, states 1, 2, ... are the character
+## positions, in order (end-markers are not states).  Returns a list, indexed
+## by state number, of
+##
+##     (symbols,followStates,acceptedRE)
+##
+## where symbols is the tuple of characters the state's position matches,
+## followStates the sorted list of states that can follow it, and acceptedRE
+## the index of the highest-priority RE accepted in the state (or None).
+##
+##
+def glushkovStates(positions):
+    "Number the states of the Glushkov automaton for a position analysis."
+    stateOf = {}
+    for p in range(1,len(positions.symbols)):
+        if positions.symbols[p]: stateOf[p] = len(stateOf) + 1
+    states = []
+    for p,follow in [(0,positions.first)] + \
+                    [(p,positions.follow[p]) for p in sorted(stateOf)]:
+        followStates = sorted([stateOf[q] for q in follow if q in stateOf])
+        accepted = [positions.accepts[q] for q in follow if q in positions.accepts]
+        if accepted: acceptedRE = min(accepted)
+        else: acceptedRE = None
+        states.append((positions.symbols[p],followStates,acceptedRE))
+    return states
+
+
+##------------------------------------------------------------------------------
+##
+## glushkovNFA: build the Glushkov NFA for a list of REs (see header).
+##
+##
+def glushkovNFA(regExpressions):
+    "Build an epsilon-free (Glushkov) NFA for a list of REs."
+    trees = parseTrees(regExpressions)
+    if trees is None: return None
+    positions = Positions(trees)
+    glushkov = glushkovStates(positions)
+
+    nfa = NFA()
+    nfa.alphabet = set(positions.alphabet)
+    states = [State(i,(-1,-1),list()) for i in range(len(glushkov))]
+    finals = []
+    for state,(symbols,followStates,acceptedRE) in zip(states,glushkov):
+        for target in followStates:
+            for ch in glushkov[target][0]:
+                state.successors.append((ch,states[target],None))
+        if acceptedRE is not None: finals.append((acceptedRE,state))
+    finals.sort(key=lambda final: final[0])   ## Stable: keeps state order within an RE.
+    nfa.finalStates = [state for acceptedRE,state in finals]
+    nfa.regExprs = [positions.regExprs[acceptedRE] for acceptedRE,state in finals]
+    nfa.startState = states[0]
+    nfa.stateCount = len(states)
+    nfa.rePrecedence = 0
+    return nfa
+
+
+##------------------------------------------------------------------------------
+##
+## BitParallelMatcher (see header).  Bit i of a state-set integer is set if
+## Glushkov state i is active.  Fields are:
+##
+##    masks:        A dictionary mapping each character to the set of states
+##                  whose position matches that character.
+##
+##    followTables: A list of tables, one per group of 8 states.  Entry b of
+##                  table k is the union of the follow sets of the states
+##                  8k+i for each bit i set in b.  The follow set of a whole
+##                  state set is got by looking up its bits 8 at a time.
+##
+##    acceptMasks:  A list, indexed by RE, of the states accepting that RE
+##                  (with the start state only in the mask for the
+##                  highest-priority RE it accepts).
+##
+##    acceptAny:    The union of the acceptMasks.
+##
+##    regExprs:     The REs, as strings formatted as for the NFAs of nfa.py.
+##
+##
+class BitParallelMatcher(object):
+    "Simulate a Glushkov NFA with bit-parallel state sets."
+    def __init__(this,positions):
+        glushkov = glushkovStates(positions)
+        this.regExprs = list(positions.regExprs)
+        this.masks = {}
+        this.acceptMasks = [0] * len(this.regExprs)
+        follows = []
+        for i,(symbols,followStates,acceptedRE) in enumerate(glushkov):
+            for ch in symbols: this.masks[ch] = this.masks.get(ch,0) | (1 << i)
+            if acceptedRE is not None: this.acceptMasks[acceptedRE] |= 1 << i
+            follow = 0
+            for target in followStates: follow |= 1 << target
+            follows.append(follow)
+        this.acceptAny = 0
+        for mask in this.acceptMasks: this.acceptAny |= mask
+        this.followTables = []
+        for base in range(0,len(follows),8):
+            table = [0] * 256
+            for b in range(1,256):
+                low = b & -b                   ## Lowest set bit of b.
+                i = base + low.bit_length() - 1
+                if i < len(follows): table[b] = table[b ^ low] | follows[i]
+                else: table[b] = table[b ^ low]
+            this.followTables.append(table)
+
+    def step(this,active,ch):
+        "Return the state set reached from state set active on character ch."
+        mask = this.masks.get(ch,0)
+        if not mask: return 0
+        follow = 0
+        for table in this.followTables:
+            if not active: break
+            follow |= table[active & 0xff]
+            active >>= 8
+        return follow & mask
+
+    def accepted(this,active):
+        "Return the index of the highest-priority RE accepted by a state set, or None."
+        if active & this.acceptAny:
+            for i,mask in enumerate(this.acceptMasks):
+                if active & mask: return i
+        return None
+
+    def longestMatch(this,string,start=0):
+        """Return (reIndex,end) for the longest match of any RE starting at
+           string[start], or (None,start) if there is none."""
+        active = 1
+        matched = this.accepted(active)
+        end = start
+        i = start
+        while active and i < len(string):
+            active = this.step(active,string[i])
+            i += 1
+            if active & this.acceptAny: matched,end = this.accepted(active),i
+        if matched is None: return None,start
+        return matched,end
+
+    def match(this,string):
+        "Return the RE matching the whole of string (highest priority first), or None."
+        active = 1
+        for ch in string:
+            active = this.step(active,ch)
+            if not active: return None
+        accepted = this.accepted(active)
+        if accepted is None: return None
+        return this.regExprs[accepted]
+
+    def scan(this,string):
+        """Return a list of all the matches found when scanning string, as
+           (matching-re,matching-substring) tuples, exactly as DFA.scan."""
+        matches = []
+        start = 0
+        while True:
+            matched,end = this.longestMatch(string,start)
+            if matched is None: break
+            matches.append((this.regExprs[matched],string[start:end]))
+            if end == start: break
+            start = end
+        return matches
+
+
+def glushkovMatcher(regExpressions):
+    "Build a bit-parallel matcher for a list of REs."
+    trees = parseTrees(regExpressions)
+    if trees is None: return None
+    return BitParallelMatcher(Positions(trees))
@@ -0,0 +1,84 @@
+##------------------------------------------------------------------------------
+##
+## lineindex.py -- Line and column numbers for positions in a text.
+##
+## The scanners here report tokens as strings (DFA.scan) or as (start,end)
+## index spans (DFA.finditer, AhoCorasick.finditer ...).  Turning an index
+## into a line and column by counting the newlines before it costs time
+## proportional to the index, so doing it for every token of a big file is
+## quadratic.  A LineIndex is built with a single pass over the text, by
+## str.find (which does the searching in C), and holds the offset of the
+## start of every line in an array of machine integers.  Then:
+##
+##     - any position is found by binary search (bisect) in the array, in
+##       O(log n) time for a text of n lines;
+##
+##     - positions taken in increasing order (as tokens are, when scanning)
+##       are found in amortised O(1) time: the line of the last position
+##       looked up is remembered, and the search starts there.
+##
+## Lines and columns are numbered from 1.  A newline character belongs to
+## the line it ends.  Columns count characters of the string indexed, so for
+## UTF-8 text (as scanned by automata with character classes) they count
+## bytes.
+##
+## Class:
+##
+##          LineIndex(text)
+##
+##              methods: position -- (line,column) for an index into text.
+##                       span     -- ((line,column),(line,column)) for a
+##                                   (start,end) span, the end being the
+##                                   position just after the last character.
+##                       line     -- the text of a line (without its
+##                                   newline), given its number.
+##
+##              field:   lineCount -- the number of lines.
+##
+## See also the "positions" option of DFA.scan (dfa.py).
+##
+##
+from array import array
+from bisect import bisect_right
+
+
+class LineIndex(object):
+    "An index of the line starts of a text, for finding line and column numbers."
+    def __init__(this,text):
+        this.text = text
+        starts = array('l',[0])
+        find = text.find
+        i = find('\n')
+        while i >= 0:
+            starts.append(i+1)
+            i = find('\n',i+1)
+        this.starts = starts
+        this.lineCount = len(starts)
+        this.lastLine = 0       ## Line (numbered from 0) of the last position found.
+
+    def position(this,index):
+        "Return the (line,column) of text[index], both numbered from 1."
+        starts = this.starts
+        line = this.lastLine
+        if starts[line] <= index:
+            ## Sequential access: the same line as last time, or the next.
+            if line+1 == len(starts) or index < starts[line+1]:
+                return line+1,index-starts[line]+1
+            if line+2 == len(starts) or index < starts[line+2]:
+                this.lastLine = line+1
+                return line+2,index-starts[line+1]+1
+            line = bisect_right(starts,index,line+2) - 1
+        else:
+            line = bisect_right(starts,index,0,line) - 1
+        this.lastLine = line
+        return line+1,index-starts[line]+1
+
+    def span(this,start,end):
+        "Return the (line,column) positions of the start and end of text[start:end]."
+        return this.position(start),this.position(end)
+
+    def line(this,number):
+        "Return the text of a line (numbered from 1), without its newline."
+        start = this.starts[number-1]
+        if number < len(this.starts): return this.text[start:this.starts[number]-1]
+        return this.text[start:]
@@ -0,0 +1,288 @@
+#!/usr/bin/python
+##------------------------------------------------------------------------------
+##
+## memreport.py -- Memory footprint reports for NFAs and DFAs, and for the
+##                 phases of the RE -> NFA -> DFA pipeline.
+##
+## Two kinds of measurement are made:
+##
+##   - Retained memory, by object-graph measurement: the automaton left by a
+##     phase is walked from its start state, and the size (sys.getsizeof) of
+##     every object it keeps alive is added to one of these components, each
+##     object being counted once only:
+##
+##         states       -- State/DFAState objects, their attribute
+##                         dictionaries, names and positions.
+##         successors   -- The successor lists and (char,target,connector)
+##                         tuples.
+##         connectors   -- Connector objects (drawing geometry: points,
+##                         labels).
+##         state sets   -- The "stateSet" of each DFA state (the NFA states
+##                         it was made from, or the like).
+##         provenance   -- NFA states (with their successors and
+##                         connectors) kept alive only because the stateSets
+##                         of a DFA refer to them.
+##         alphabet     -- The alphabet set and its symbols.
+##         accepting    -- The finalStates and regExprs lists and the REs.
+##
+##   - Allocation during each phase: with tracemalloc (where the Python
+##     running this has it), the memory allocated and still held at the end
+##     of the phase, and the peak during it; otherwise the growth of the
+##     process's peak resident set size (resource.getrusage), which shows a
+##     phase's transient peak only if it is higher than any before it.
+##
+## Use:
+##
+##     From the command-line:
+##
+##       $ ./memreport.py [<option(s)>] <re1> [<re2> ... <reN>]
+##       $ ./scanbuild.py memreport [<option(s)>] <re1> [<re2> ... <reN>]
+##
+##     where <option(s)> are any of
+##
+##       -h or -help  Help
+##       -factor      Build the NFA with shared literal prefixes
+##                    (parseREs(...,factor=True)).
+##       -opt         Optimise the NFA (see nfaopt.py) before "subset".
+##       -min         Also minimise the DFA.
+##
+##     The phases (parseREs, optimiseNFA, subset, minimiseDFA) are run in
+##     turn, and a report printed for each.
+##
+## Functions:
+##
+##          measureFA(fa)
+##                  -- Return the retained-memory breakdown of an NFA or DFA,
+##                     as a list of (component,objects,bytes) tuples.
+##
+##          showFA(fa,stream=None)
+##                  -- Print the breakdown.
+##
+##          profilePipeline(regExpressions,factor=False,optimise=False,
+##                          minimise=False,stream=None)
+##                  -- Run and report the phases for a list of REs (as for
+##                     parseREs), returning the last automaton built (or
+##                     None if there is an error in an RE).
+##
+##
+import sys
+import time
+
+COMPONENTS = ("states","successors","connectors","state sets","provenance",
+              "alphabet","accepting")
+
+
+##------------------------------------------------------------------------------
+##
+## FootprintMeasure: the object-graph walk.  Fields are "seen", the ids of
+## the objects counted so far, and "totals", mapping each component to a
+## list [objects,bytes].
+##
+##
+class FootprintMeasure(object):
+    "Measures the memory retained by automata, component by component."
+    def __init__(this):
+        this.seen = set()
+        this.totals = dict((component,[0,0]) for component in COMPONENTS)
+
+    def add(this,component,obj,count=0):
+        "Count an object (unless already counted) against a component."
+        if obj is None or id(obj) in this.seen: return False
+        this.seen.add(id(obj))
+        this.totals[component][0] += count
+        this.totals[component][1] += sys.getsizeof(obj)
+        return True
+
+    def addState(this,state,component="states",pending=None):
+        """Count a state, its successors and their connectors.  The stateSets
+           of DFA states are counted, and the NFA states in them added to
+           pending (if given)."""
+        if not this.add(component,state,1): return
+        this.add(component,state.__dict__)
+        this.add(component,state.name)
+        this.add(component,state.position)
+        if component == "states": successors,connectors = "successors","connectors"
+        else: successors = connectors = component
+        this.add(successors,state.successors)
+        for successor in state.successors:
+            this.add(successors,successor,1)
+            if len(successor) > 2: this.addConnector(successor[2],connectors)
+        stateSet = getattr(state,"stateSet",None)
+        if stateSet is not None and this.add("state sets",stateSet,1):
+            if pending is not None and isinstance(stateSet,(set,frozenset)):
+                pending.extend(stateSet)
+
+    def addConnector(this,connector,component):
+        "Count a connector and its geometry."
+        if not this.add(component,connector,1): return
+        attributes = getattr(connector,"__dict__",None)
+        if attributes is not None:
+            this.add(component,attributes)
+            for value in attributes.itervalues():
+                if isinstance(value,(tuple,str,unicode)): this.add(component,value)
+
+    def addFA(this,fa):
+        "Count everything retained by an NFA or DFA."
+        pending = []
+        for state in fa.listStates(): this.addState(state,"states",pending)
+        ## NFA states reached through the stateSets, and everything they lead to.
+        while pending:
+            state = pending.pop()
+            if not id(state) in this.seen:
+                this.addState(state,"provenance")
+                pending.extend([successor[1] for successor in state.successors])
+        this.add("alphabet",fa.alphabet,len(fa.alphabet))
+        for symbol in fa.alphabet: this.add("alphabet",symbol)
+        this.add("accepting",fa.finalStates,len(fa.finalStates))
+        this.add("accepting",fa.regExprs)
+        for regExpr in fa.regExprs: this.add("accepting",regExpr)
+
+    def breakdown(this):
+        "Return the totals as a list of (component,objects,bytes) tuples."
+        return [(component,this.totals[component][0],this.totals[component][1])
+                for component in COMPONENTS]
+
+
+def measureFA(fa):
+    "Return the memory retained by an automaton, as (component,objects,bytes) tuples."
+    measure = FootprintMeasure()
+    measure.addFA(fa)
+    return measure.breakdown()
+
+
+def showFA(fa,stream=None):
+    "Print the retained-memory breakdown of an automaton."
+    if stream is None: stream = sys.stdout
+    breakdown = measureFA(fa)
+    total = sum([size for component,count,size in breakdown])
+    stream.write("    Component    | Objects |      Bytes |     %\n")
+    stream.write("    -------------+---------+------------+------\n")
+    for component,count,size in breakdown:
+        stream.write("    %-12s | %7d | %10d | %5.1f\n" %
+                     (component,count,size,100.0*size/max(total,1)))
+    stream.write("    -------------+---------+------------+------\n")
+    stream.write("    total        |         | %10d |\n" % total)
+
+
+##------------------------------------------------------------------------------
+##
+## Allocation tracking: tracemalloc if there is one, otherwise peak RSS.
+##
+##
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+def peakRSS():
+    "Return the peak resident set size of this process, in bytes."
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin": return peak     ## Bytes on OS X, kilobytes elsewhere.
+    return peak * 1024
+
+
+class PhaseTracker(object):
+    "Times a pipeline phase and tracks the memory allocated during it."
+    def __enter__(this):
+        if tracemalloc is not None:
+            if not tracemalloc.is_tracing(): tracemalloc.start()
+            if hasattr(tracemalloc,"reset_peak"): tracemalloc.reset_peak()
+            this.startTraced = tracemalloc.get_traced_memory()[0]
+        else: this.startPeak = peakRSS()
+        this.startTime = time.time()
+        return this
+
+    def __exit__(this,*exception):
+        this.seconds = time.time() - this.startTime
+        if tracemalloc is not None:
+            traced,peak = tracemalloc.get_traced_memory()
+            this.held,this.peak = traced - this.startTraced,peak - this.startTraced
+        else:
+            this.held,this.peak = None,peakRSS() - this.startPeak
+        return False
+
+    def describe(this):
+        "Return a line describing the phase's time and memory."
+        if this.held is not None:
+            return "%.1f ms, %d KB allocated and held, %d KB peak" % \
+                   (1000*this.seconds,this.held/1024,this.peak/1024)
+        return "%.1f ms, peak RSS grew by %d KB" % (1000*this.seconds,this.peak/1024)
+
+
+##------------------------------------------------------------------------------
+##
+## profilePipeline (see header).
+##
+##
+def profilePipeline(regExpressions,factor=False,optimise=False,minimise=False,stream=None):
+    "Run the RE -> NFA -> DFA phases, reporting the memory each uses and leaves."
+    from re2nfa import parseREs
+    from dfa import subset
+    from dfamin import minimiseDFA
+    if stream is None: stream = sys.stdout
+    if tracemalloc is None: method = "peak RSS (no tracemalloc)"
+    else: method = "tracemalloc"
+    stream.write("Memory report, allocation measured by %s\n" % method)
+
+    def phase(name,build,argument):
+        with PhaseTracker() as tracker:
+            result = build(argument)
+        if result is None: return None
+        stream.write("\n%s: %s\n" % (name,tracker.describe()))
+        stream.write("  Retained by the result (%s, %d states):\n" %
+                     (result.__class__.__name__,len(result.listStates())))
+        showFA(result,stream)
+        return result
+
+    fa = phase("parseREs",lambda res: parseREs(res,factor),regExpressions)
+    if fa is None: return None
+    if optimise:
+        from nfaopt import optimiseNFA
+        fa = phase("optimiseNFA",optimiseNFA,fa)
+    fa = phase("subset",lambda nfa: subset(nfa,verbose=False),fa)
+    if minimise: fa = phase("minimiseDFA",minimiseDFA,fa)
+    return fa
+
+
+##------------------------------------------------------------------------------
+##
+## Command-line handling.
+##
+##
+def processArgs(argList):
+    argList = list(argList)
+    flags = {}
+    for option in ("-factor","-opt","-min"):
+        flags[option] = option in argList
+        if flags[option]: argList.remove(option)
+    if len(argList) == 0 or argList[0].startswith("-"):
+        if len(argList) > 0 and not argList[0].startswith("-h"):
+            print "Unknown option: %s" % argList[0]
+        print_help_text()
+        return
+    profilePipeline(argList,flags["-factor"],flags["-opt"],flags["-min"])
+
+
+def print_help_text():
+    print """    Use:
+
+         From the command-line
+
+           $ ./memreport.py [<option(s)>] <re1> [<re2> ... <reN>]
+
+         Build a DFA for the REs, reporting for each phase the time
+         taken, the memory allocated, and the memory retained by the
+         automaton built, broken down by component.
+
+         where <option(s)> are any of
+
+           -h        Help
+           -factor   Share the literal prefixes of the REs in the NFA.
+           -opt      Optimise the NFA before the subset construction.
+           -min      Also minimise the DFA.
+    """
+
+
+if __name__ == "__main__":
+    processArgs(sys.argv[1:])
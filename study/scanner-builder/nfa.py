@@ -2,8 +2,9 @@
 ##
 ## Class NFA represents a nondeterministic finite automaton.
 ##
-## NFA itself is an abstract class.  Its subclasses, PrimitiveNFA, ChoiceNFA,
-## CompositeNFA, ClosureNFA and OuterChoiceNFA do the work of generating NFAs.
+## NFA itself is an abstract class.  Its subclasses, PrimitiveNFA, ClassNFA,
+## ChoiceNFA, CompositeNFA, ClosureNFA, OuterChoiceNFA and FactoredChoiceNFA
+## do the work of generating NFAs.
 ## NFA inherits some of its functionality from base class FA.
 ##
 ##
@@ -73,45 +74,45 @@
 ##
 ##    >>> nfa=parseREs('abb (a|b)*abb')
 ##    >>> nfa.scan('abb')
-##    Initial set of states (before any input read): [0, 1, 5, 6, 7, 8, 9]
+##    Initial set of states (before any input read): [0, 1, 5, 6, 7]
 ##    (No current accepting state)
 ##
-##    Reading 'a' moves automaton to state set [2, 6, 7, 8, 9, 10, 11, 14]
+##    Reading 'a' moves automaton to state set [2, 6, 7, 8, 9]
 ##    (No current accepting state)
 ##
-##    Reading 'b' moves automaton to state set [3, 6, 7, 8, 9, 12, 13, 14]
+##    Reading 'b' moves automaton to state set [3, 6, 7, 8, 10]
 ##    (No current accepting state)
 ##
-##    Reading 'b' moves automaton to state set [4, 6, 7, 8, 9, 12, 14, 15]
-##    (Current accepting state(s) = [4, 15])
+##    Reading 'b' moves automaton to state set [4, 6, 7, 8, 11]
+##    (Current accepting state(s) = [4, 11])
 ##
 ##    All input read: scanner halted
-##    Final set of automaton states: [4, 6, 7, 8, 9, 12, 14, 15]
-##    Accepting states are: [4, 15]
+##    Final set of automaton states: [4, 6, 7, 8, 11]
+##    Accepting states are: [4, 11]
 ##    Machine accepts on state 4
 ##    All input accepted
 ##    >>> nfa.scan('abbaa')
-##    Initial set of states (before any input read): [0, 1, 5, 6, 7, 8, 9]
+##    Initial set of states (before any input read): [0, 1, 5, 6, 7]
 ##    (No current accepting state)
 ##
-##    Reading 'a' moves automaton to state set [2, 6, 7, 8, 9, 10, 11, 14]
+##    Reading 'a' moves automaton to state set [2, 6, 7, 8, 9]
 ##    (No current accepting state)
 ##
-##    Reading 'b' moves automaton to state set [3, 6, 7, 8, 9, 12, 13, 14]
+##    Reading 'b' moves automaton to state set [3, 6, 7, 8, 10]
 ##    (No current accepting state)
 ##
-##    Reading 'b' moves automaton to state set [4, 6, 7, 8, 9, 12, 14, 15]
-##    (Current accepting state(s) = [4, 15])
+##    Reading 'b' moves automaton to state set [4, 6, 7, 8, 11]
+##    (Current accepting state(s) = [4, 11])
 ##
-##    Reading 'a' moves automaton to state set [6, 7, 8, 9, 10, 11, 14]
-##    (Current accepting state(s) = [4, 15]) , N.B., unchanged
+##    Reading 'a' moves automaton to state set [6, 7, 8, 9]
+##    (Current accepting state(s) = [4, 11]) , N.B., unchanged
 ##
-##    Reading 'a' moves automaton to state set [6, 7, 8, 9, 10, 11, 14]
-##    (Current accepting state(s) = [4, 15]) , N.B., unchanged
+##    Reading 'a' moves automaton to state set [6, 7, 8, 9]
+##    (Current accepting state(s) = [4, 11]) , N.B., unchanged
 ##
 ##    All input read: scanner halted
-##    Final set of automaton states: [6, 7, 8, 9, 10, 11, 14]
-##    Accepting states are: [4, 15]
+##    Final set of automaton states: [6, 7, 8, 9]
+##    Accepting states are: [4, 11]
 ##    Machine accepts on state 4
 ##    Accepting state is not in the final set of NFA states => some input ignored
 ##
@@ -179,15 +180,15 @@ class NFA(FA):
 
     ## Include output_dot method which supplies a default title
     ## to the superclass method output_dot(title).
-    def output_dot(this):
-        FA.output_dot(this,"NFA")
+    def output_dot(this,stream=None):
+        FA.output_dot(this,"NFA",stream)
 
     ## Also include output_plain method supplying a default title and NFA
     ## type to the superclass (FA) method output_plain(title,fa_type).  Note
     ## that an NFA is assumed to be non-Thompson unless derived from a
     ## ThomsponNFA subclass, so reports nfa_type as "Non-Thompson" by default.
-    def output_plain(this):
-        FA.output_plain(this,"NFA","Non-Thompson NFA")
+    def output_plain(this,stream=None):
+        FA.output_plain(this,"NFA","Non-Thompson NFA",stream)
 
 
     ##-----------------------------------------------------------------------------------
@@ -285,15 +286,17 @@ class NFA(FA):
 
     ##
     ##  getAccepting takes a list of NFA states (State objects) and returns a list
-    ##  of all the States in the input that are accepting ones.  Does this by
-    ##  checking that a state has no successors (length of its "successors" field
-    ##  is zero).
+    ##  of all the States in the input that are accepting ones, i.e., are in the
+    ##  NFA's finalStates list.  (In the NFAs built by re2nfa these are exactly
+    ##  the states with no successors, but in an epsilon-free NFA, such as those
+    ##  built by glushkov.py, accepting states may have successors.)
     ##
     def getAccepting(this, statelist):
         "Return a list of the accepting states in statelist."
+        finalStates = set(this.finalStates)
         accepting = []
         for s in statelist:
-            if len(s.successors) == 0:  accepting.append(s)
+            if s in finalStates:  accepting.append(s)
         return accepting
 
 
@@ -307,7 +310,10 @@ class NFA(FA):
 ## generated from Thompson NFAs.
 ##
 ## A version of "output_plain" is also provided to invoke the RE version with
-## appropriate parameters.
+## appropriate parameters.  An NFA with class edges (a ClassNFA, for a
+## character class, or for single characters merged into one by
+## simplification, see retree.py) is labelled "Non-Thompson NFA" instead:
+## in a Thompson NFA no state has more than one non-epsilon transition.
 ##
 
 class ThompsonNFA(NFA):
@@ -319,8 +325,16 @@ class ThompsonNFA(NFA):
            associated with accepting states."""
         return False
 
-    def output_plain(this):
-        FA.output_plain(this,"NFA","Thompson NFA")
+    def output_plain(this,stream=None):
+        if this.hasClassEdges(): FA.output_plain(this,"NFA","Non-Thompson NFA",stream)
+        else: FA.output_plain(this,"NFA","Thompson NFA",stream)
+
+    def hasClassEdges(this):
+        """True if any state has more than one non-epsilon transition (on any
+           characters, whether the same or different)."""
+        for state in this.listStates():
+            if len([succ for succ in state.successors if succ[0] != FA.EPS]) > 1: return True
+        return False
 
 
 ##------------------------------------------------------------------------------
@@ -350,6 +364,39 @@ class PrimitiveNFA(ThompsonNFA):
         this.regExprs = [ch]
         this.rePrecedence = 30  ## RE precedence for formatting operations (highest).
 
+##------------------------------------------------------------------------------
+##
+## This represents an NFA with 2 states and a transition on each of a set of
+## characters (a character class of single bytes, see retree.py).  It is
+## drawn as one arrow, labelled with the class as written.
+##
+##                      [a-z]
+##                   0 -------> 1
+##
+## The result is a 2-state Thompson NFA.  This accepts exactly what a ChoiceNFA
+## of PrimitiveNFAs for the characters would, but is much smaller (a class
+## of 64 bytes would otherwise take 254 states and 252 epsilon transitions).
+##
+## Use:   nfa=ClassNFA('abc','[a-c]')   ## Create a recogniser NFA for [a-c].
+##
+
+class ClassNFA(ThompsonNFA):
+    "Represents a class NFA (two states, a transition on each character in 'chars')."
+    def __init__(this,chars,label):
+        this.startState = State(0,(5,5),None)
+        this.finalStates = [State(1,(25,5),[])]
+        chars = sorted(chars)
+        drawn = Straight(this.startState,this.finalStates[0],label)
+        hidden = Parallel()
+        this.startState.successors = [(ch,this.finalStates[0],hidden) for ch in chars]
+        this.startState.successors[0] = (chars[0],this.finalStates[0],drawn)
+        this.width = 30
+        this.height = 10
+        this.alphabet = set(chars)
+        this.stateCount = 2
+        this.regExprs = [label]
+        this.rePrecedence = 30  ## RE precedence for formatting operations (highest).
+
 ##------------------------------------------------------------------------------
 ##
 ## This represents an NFA that allows a choice between two smaller NFAs.
@@ -553,6 +600,104 @@ class OuterChoiceNFA(NFA):
         this.alphabet.add(FA.EPS)
 
 
+##------------------------------------------------------------------------------
+##
+## This represents an "outer choice" NFA, as OuterChoiceNFA, in which the
+## literal prefixes shared by the REs are factored out into a trie.
+##
+## An OuterChoiceNFA for a big keyword set ("get", "getAll", "set", "is",
+## ...) is a fan of thousands of separate chains, all in the start state's
+## epsilon closure, and the subset construction has to merge them all over
+## again on every character.  Here each RE is given as a literal prefix
+## (a string, possibly empty) and a Thompson NFA for the rest (None if the
+## RE is just the literal).  The prefixes share a trie of states, with no
+## epsilon transitions, so e.g. the keywords
+##
+##     get  getAll  set
+##
+## become
+##
+##          g     e     t
+##       0 --> 1 --> 2 --> 3                 (accepts "get")
+##       |           |  t      A     l     l
+##       |           +---> 4 --> 5 --> 6 --> 7   (accepts "getAll")
+##       |  s     e     t
+##       +---> 8 --> 9 --> 10                (accepts "set")
+##
+## The last character of each prefix leads to a state of the RE's own, the
+## start state of its Thompson NFA, or, for a literal RE, its own final
+## state, so each RE keeps its own final state, and its priority, exactly
+## as in an OuterChoiceNFA.  (The same character may lead from a trie node
+## to several such states: this is an NFA.)  An RE with no literal prefix
+## is joined to the start state by an epsilon transition.
+##
+## States are numbered branch by branch, in the order of the REs, so the
+## first RE still has the lowest-numbered final state.
+##
+## Use:   nfa=FactoredChoiceNFA([("get",None,"get"),
+##                               ("se",ClosureNFA(PrimitiveNFA('t')),"set*")])
+##
+##        where each branch is a (prefix,nfa,regExpr) triple.  See also
+##        parseREs(...,factor=True) in re2nfa.py, which splits the REs.
+##
+## N.B. Once created, the branch NFAs are modified and no longer useful.
+##
+class FactoredChoiceNFA(NFA):
+    "An 'Outer Choice' NFA with the literal prefixes of its REs shared in a trie."
+    def __init__(this,branches):
+        assert isinstance(branches,list)
+        height = 0
+        heights = len(branches)*[0]
+        width = 0
+        for i in range(len(branches)-1,-1,-1):
+            prefix,nfa,regExpr = branches[i]
+            assert (nfa is None and len(prefix) > 0) or isinstance(nfa,ThompsonNFA)
+            heights[i] = height
+            if nfa is None:
+                height += 20
+                width = max(width,20*len(prefix))
+            else:
+                height += (nfa.height + 10)
+                width = max(width,20*max(len(prefix),1) + nfa.width)
+        this.height = height - 10
+        this.width = width + 10
+        this.startState = State(0,(5,(height-10)/2),[])
+        this.finalStates = []
+        this.regExprs = []
+        this.alphabet = set([])
+        trie = {}           ## (state,character) -> trie state.
+        statenum = 1
+        for (i,(prefix,nfa,regExpr)) in enumerate(branches):
+            if nfa is None: y = heights[i] + 5
+            else:
+                nfa.repositionStates(20*max(len(prefix),1),heights[i])
+                y = nfa.startState.position[1]
+            state = this.startState
+            for depth,ch in enumerate(prefix[:-1]):
+                child = trie.get((state,ch))
+                if child is None:
+                    child = State(statenum,(25+20*depth,y),[]) ; statenum += 1
+                    trie[(state,ch)] = child
+                    state.successors.append((ch,child,Straight(state,child,ch)))
+                state = child
+            if nfa is None:
+                target = State(statenum,(5+20*len(prefix),y),[]) ; statenum += 1
+                this.finalStates.append(target)
+            else:
+                statenum = nfa.renumber(statenum)
+                target = nfa.startState
+                this.finalStates.append(nfa.finalStates[0])
+                this.alphabet.update(nfa.alphabet)
+            if len(prefix) > 0:
+                state.successors.append((prefix[-1],target,Straight(state,target,prefix[-1])))
+            else:
+                state.successors.append((NFA.EPS,target,Straight(state,target)))
+                this.alphabet.add(FA.EPS)
+            this.alphabet.update(prefix)
+            this.regExprs.append(regExpr)
+        this.stateCount = statenum
+
+
 ##------------------------------------------------------------------------------
 ##
 ## End of NFA and subclass definitions.
@@ -18,10 +18,28 @@
 ##       -scan        If parameter <string> is supplied on the
 ##                    command line, scan it according to the DFA built
 ##                    from the NFA description on stdin.
+##       -bin         Output the DFA in the binary interchange format
+##                    (see fabin.py) to standard output.
+##       -pack        Output the DFA's transition table packed into
+##                    comb vectors (see dfapack.py), with its size
+##                    against the dense table.
 ##       -min         This is an "option-modifier", it may be
 ##                    supplied with one of the other options
 ##                    (or by itself) to specify that the resulting
 ##                    DFA should be minimised.
+##       -binin       Also an "option-modifier", specifying that the
+##                    NFA on stdin is in the binary format written by
+##                    "re2nfa.py -bin", rather than the plain format.
+##       -opt         Also an "option-modifier", specifying that the
+##                    NFA should be optimised (epsilon transitions
+##                    removed, useless states dropped, see nfaopt.py)
+##                    before the subset algorithm is applied.
+##       -profile     Also an "option-modifier": report on standard
+##                    error the time, states, edges and throughput of
+##                    each phase (read, optimise, subset, minimise,
+##                    output), see phaseprof.py.  With "-profile=<file>",
+##                    each phase is also run under cProfile, and the
+##                    statistics of the slowest written to <file>.
 ##
 ##     In the absence of a command-line option (or if only "-min" is
 ##     specified), a verbose record of the operation of the subset
@@ -38,8 +56,9 @@
 ##
 ##
 ##     If this script is invoked interactively (in an Idle session,
-##     for example), use direct calls to "parsePlain" to convert
-##     textual representations of NFAs to NFA objects, then use
+##     for example), use direct calls to "parsePlain" (or "readPlain"
+##     for a file) to convert textual representations of NFAs to NFA
+##     objects, then use
 ##     "subset" (see dfa.py) to convert to a DFA, and the "scan"
 ##     method of DFA to scan strings according to the generated
 ##     DFA.  Most documentation can be found in "dfa.py", this
@@ -52,47 +71,124 @@ from nfa import NFA, ThompsonNFA
 from state import State,DFAState
 from dfa import DFA, subset, DFAScanner
 from dfamin import minimiseDFA
+from phaseprof import profileOption, NullProfiler
+from StringIO import StringIO
 import os
+import re
 
 
 def processArgs(argList):
+    profiler = profileOption(argList,"nfa2dfa")
     if "-min" in argList:
         minimise = True
         argList.remove("-min")
     else:
         minimise = False
+    if "-binin" in argList:
+        binaryInput = True
+        argList.remove("-binin")
+    else:
+        binaryInput = False
+    if "-opt" in argList:
+        optimise = True
+        argList.remove("-opt")
+    else:
+        optimise = False
     if len(argList) > 0 and argList[0][0] == '-': option = argList[0]
     else: option = "-plain"
 
-    nfa = None
-    if option.startswith("-h"): print_help_text()
-    else:
-        nfaString = sys.stdin.read()
-        nfa = parsePlain(nfaString)
-        if nfa == None: return
-        if   option == "-plain":
-            dfa = subset(nfa, verbose=True)
-            print "\nDFA construction complete. DFA is\n"
-            dfa.output_table()
-            if minimise:
-                print "\nDFA state minimisation requested.\n"
-                dfa = minimiseDFA(dfa,verbose=True,reorder=False)
-                print "\nMinimised DFA is\n"
-                dfa.output_table()
-        else:
-            dfa = subset(nfa, verbose=False)
-            if minimise: dfa = minimiseDFA(dfa,verbose=False,reorder=True)
-            if   option == "-tab":     dfa.output_table()
-            elif option == "-ttab":    dfa.output_table(latex=True)
-            elif option == "-dot":     dfa.output_dot("DFA")
-            elif option == "-scan":
-                if len(argList) > 1:   dfa.scan(argList[1],verbose=True)
-                else:
-                    print "No string to scan"
-                    print_help_text()
+    if option.startswith("-h"):
+        print_help_text()
+        return
+    with profiler.phase("read") as phase:
+        if binaryInput:
+            from fabin import readBinary, binaryStream
+            nfa = readBinary(binaryStream(sys.stdin),useMmap=True)
+        else: nfa = readPlain(sys.stdin)
+        phase.result(nfa)
+    if nfa == None: return
+    if len(argList) > 1: scanString = argList[1]
+    else: scanString = None
+    if not convertNFA(nfa,option,minimise,optimise,scanString,profiler):
+        print_help_text()
+    profiler.report()
+
+
+def convertNFA(nfa,option="-plain",minimise=False,optimise=False,scanString=None,
+               profiler=None):
+    """Build the DFA for an NFA (optimising the NFA and minimising the DFA if
+       asked to), and output it as a command-line option says.  Returns
+       False if the option is not known, or -scan has no string."""
+    if profiler is None: profiler = NullProfiler()
+    if option != "-plain":
+        dfa = nfaToDFA(nfa,optimise,minimise,profiler)
+        return outputDFA(dfa,option,scanString,profiler)
+    if optimise:
+        from nfaopt import optimiseNFA
+        with profiler.phase("optimise") as phase:
+            nfa = optimiseNFA(nfa,verbose=True)
+            phase.result(nfa)
+    with profiler.phase("subset") as phase:
+        dfa = subset(nfa, verbose=True)
+        phase.result(dfa)
+    print "\nDFA construction complete. DFA is\n"
+    dfa.output_table()
+    if minimise:
+        print "\nDFA state minimisation requested.\n"
+        with profiler.phase("minimise",dfa.stateCount) as phase:
+            dfa = minimiseDFA(dfa,verbose=True,reorder=False)
+            phase.result(dfa)
+        print "\nMinimised DFA is\n"
+        dfa.output_table()
+    return True
+
+
+def nfaToDFA(nfa,optimise=False,minimise=False,profiler=None):
+    """Build the DFA for an NFA quietly, optimising the NFA and minimising the
+       DFA (with its states renamed in order) if asked to."""
+    if profiler is None: profiler = NullProfiler()
+    if optimise:
+        from nfaopt import optimiseNFA
+        with profiler.phase("optimise") as phase:
+            nfa = optimiseNFA(nfa,verbose=False)
+            phase.result(nfa)
+    with profiler.phase("subset") as phase:
+        dfa = subset(nfa, verbose=False)
+        phase.result(dfa)
+    if minimise:
+        with profiler.phase("minimise",dfa.stateCount) as phase:
+            dfa = minimiseDFA(dfa,verbose=False,reorder=True)
+            phase.result(dfa)
+    return dfa
+
+
+def outputDFA(dfa,option,scanString=None,profiler=None):
+    """Output a DFA in the format given by a command-line option (other than
+       -plain), or scan a string with it (-scan).  Returns False if the
+       option is not known, or -scan has no string."""
+    if profiler is None: profiler = NullProfiler()
+    with profiler.phase("output") as phase:
+        known = True
+        if   option == "-tab":     dfa.output_table()
+        elif option == "-ttab":    dfa.output_table(latex=True)
+        elif option == "-dot":     dfa.output_dot("DFA")
+        elif option == "-bin":
+            from fabin import writeBinary, binaryStream
+            writeBinary(dfa,binaryStream(sys.stdout))
+        elif option == "-pack":    dfa.pack().output()
+        elif option == "-scan":
+            if scanString is not None:
+                dfa.scan(scanString,verbose=True)
+                phase.setWork(len(scanString),"chars")
             else:
-                print "Unknown option: %s" % option
-                print_help_text()
+                print "No string to scan"
+                known = False
+        else:
+            print "Unknown option: %s" % option
+            known = False
+        sys.stdout.flush()
+        phase.result(dfa)
+    return known
 
 
 def print_help_text():
@@ -108,6 +204,9 @@ def print_help_text():
            -tab      Output table representing the DFA.
            -ttab     Output the table in LaTeX format.
            -dot      Output the DFA in GraphViz dot format.
+           -bin      Output the DFA in binary format (see fabin.py).
+           -pack     Output the DFA's table packed into comb vectors
+                     (see dfapack.py).
            -scan     If parameter <string> is supplied on the
                      command line, scan it according to the DFA built
                      from the NFA description on stdin.
@@ -115,6 +214,15 @@ def print_help_text():
                      supplied with one of the other options
                      (or by itself) to specify that the resulting
                      DFA should be minimised.
+           -binin    Also an "option-modifier", the NFA on stdin is
+                     in the binary format written by "re2nfa -bin".
+           -opt      Also an "option-modifier", remove epsilon
+                     transitions and useless states from the NFA
+                     before building the DFA.
+           -profile  Also an "option-modifier": report the time,
+                     states, edges and throughput of each phase on
+                     stderr.  "-profile=<file>" also writes cProfile
+                     statistics of the slowest phase to <file>.
 
          In the absence of a command-line option (or if only "-min" is
          specified), a verbose record of the operation of the subset
@@ -123,146 +231,155 @@ def print_help_text():
 
          A textual description of the NFA to be converted is expected
          on stdin.  This should be in the "plain" output format
-         generated by "re2nfa".
+         generated by "re2nfa" (or in binary format, with "-binin").
     """
 
 
 ##------------------------------------------------------------------------------
 ##            
-## "parsePlain" is a parser for a plain-format NFA held as a multi-line string 
-## passed in as parameter "plainNFA"
+## "readPlain" is a parser for a plain-format NFA read from a file object (or
+## any other iterable of lines) passed in as parameter "stream".  The input is
+## processed a line at a time, with each line matched as a whole against one
+## of the precompiled patterns below, so the NFA's states and transitions are
+## built as the text is read, without buffering the whole description first.
+## Syntax errors are reported with the number of the offending line.
+##
+## "parsePlain" is a convenience wrapper around "readPlain" for a plain-format
+## NFA held as a multi-line string passed in as parameter "plainNFA".
 ##
+TITLE_LINE       = re.compile(r"NFA$")
+STATE_COUNT_LINE = re.compile(r"States:\s*(\d+)$")
+START_STATE_LINE = re.compile(r"Start state:\s*(\S+)$")
+NFA_TYPE_LINE    = re.compile(r"(Thompson|Non-Thompson) NFA$")
+ACCEPTING_LINE   = re.compile(r"Accepting state:\s*(\S+)\s+'(.*)'$")
+STATE_LINE       = re.compile(r"State\s+(\S+)$")
+TRANSITION_LINE  = re.compile(r"\((.*)\)\s*-->\s*(\S+)$")
+ESCAPED_CHAR     = re.compile(r"\\x[0-9A-Fa-f]{2}$")   ## See plainSymbol in fa.py.
+
+
 def parsePlain(plainNFA):
     """Parse a plain-format NFA description from a multi-line string
        and generate an NFA object from it, either a ThomsponNFA or
        a plain NFA (for non-Thompson machines)."""
-    scanner = PlainScanner(plainNFA)
+    return readPlain(StringIO(plainNFA))
+
+
+def readPlain(stream):
+    """Parse a plain-format NFA description from a file object and
+       generate an NFA object from it, either a ThomsponNFA or a plain
+       NFA (for non-Thompson machines)."""
     try:
-        accept("NFA",scanner)
-        stateCount = parseStateCount(scanner)
-        stateList = []
-        stateNameMap = {}
-        for i in range(stateCount):              ## Create a list of states with names from
-            state = State(str(i),(-1,-1),list()) ## 0 up, dummy positions and no links.
-            stateList.append(state)
-            stateNameMap[str(i)] = state
-            
-        startStateName = parseStartState(scanner)
-
-        nfa, nfaType = parseNFAtype(scanner)
-    
-        nfa.startState = stateNameMap[startStateName]
-        nfa.stateCount = stateCount
-        nfa.alphabet = set([])
-    
-        nfa.width = 0           ## These fields are not defined for an NFA read from a simple
-        nfa.height = 0          ## textual description.
-        nfa.rePrecedence = 0
-
-        acceptingStateName,regExpr = parseAcceptingState(scanner)
-        nfa.finalStates.append(stateNameMap[acceptingStateName])
-        nfa.regExprs.append(regExpr)
-        if nfaType == "Non-Thompson":
-            while scanner.currentToken == "Accepting":
-                acceptingStateName,regExpr = parseAcceptingState(scanner)
-                nfa.finalStates.append(stateNameMap[acceptingStateName])
-                nfa.regExprs.append(regExpr)
-
-        while scanner.currentToken == "State":
-            parseStateTransitions(scanner,nfa,stateNameMap)
-            
+        nfa = buildPlainNFA(enumerate(stream,1))
     except SyntaxError, e:
         print "Syntax Error:", e
         nfa = None
-        stateList = []
     return nfa
 
 
-def accept(expected,scanner):
-    if scanner.currentToken == expected: scanner.nextToken()
-    else:
-        raise SyntaxError, ("'%s' expected, got '%s'" %\
-                            (expected,scanner.currentToken))
-
-def parseStateCount(scanner):
-    accept("States:",scanner)
-    return int(scanner.getToken())
-
-def parseStartState(scanner):
-    accept("Start",scanner)
-    accept("state:",scanner)
-    return scanner.getToken()
-    
-
-def parseNFAtype(scanner):
-    nfaType = scanner.getToken()
-    accept("NFA",scanner)
+def buildPlainNFA(lines):
+    "Build an NFA from an iterator over (line-number,line) pairs."
+    lineno,m = expectLine(lines,TITLE_LINE,"'NFA'")
+    lineno,m = expectLine(lines,STATE_COUNT_LINE,"'States:'")
+    stateCount = int(m.group(1))
+    stateNameMap = {}
+    for i in xrange(stateCount):                ## Create the states with names from 0
+        name = str(i)                           ## up, dummy positions and no links.
+        stateNameMap[name] = State(name,(-1,-1),list())
+
+    lineno,m = expectLine(lines,START_STATE_LINE,"'Start state:'")
+    startState = lookupState(stateNameMap,m.group(1),lineno)
+
+    lineno,m = expectLine(lines,NFA_TYPE_LINE,"'Thompson NFA' or 'Non-Thompson NFA'")
+    nfaType = m.group(1)
     if nfaType == "Thompson": nfa = ThompsonNFA()
-    elif nfaType == "Non-Thompson": nfa = NFA()
-    else:
-        raise SyntaxError, ("Unknown NFA type: '%s'" % nfaType)
-    return nfa, nfaType
-
-def parseAcceptingState(scanner):
-    accept("Accepting",scanner)
-    accept("state:",scanner)
-    stateName = scanner.getToken()
-    regExpr = scanner.getToken()
-    return stateName,regExpr
-
-def parseStateTransitions(scanner,nfa,stateNameMap):
-    accept("State",scanner)
-    sourceState = stateNameMap[scanner.getToken()]
-    while len(scanner.currentToken) > 0 and scanner.currentToken[0] == '(':
-        transitionChar = scanner.getToken().strip("()")
-        nfa.alphabet.add(transitionChar)
-        accept("-->",scanner)
-        targetState = stateNameMap[scanner.getToken()]
-        sourceState.successors.append((transitionChar,targetState,None))
-
-
-class PlainScanner(object):
-    def __init__(self,charbuffer):
-        self.index = 0
-        self.charbuffer = charbuffer
-        self.nextToken()
-
-    def nextToken(self):
-        self.currentToken = ""
-        ch = ""
-        while self.index < len(self.charbuffer):
-            ch = self.charbuffer[self.index]
-            if not ch in " \t\n\r": break
-            self.index += 1
-        if ch == "'":
-            self.index += 1
-            while self.index < len(self.charbuffer):
-                ch = self.charbuffer[self.index]
-                if ch in "\n\r": break
-                self.index +=1
-                if ch == "'": break
-                self.currentToken += ch
-        elif ch == '(':
-            self.currentToken += ch
-            self.index += 1
-            while self.index < len(self.charbuffer):
-                ch = self.charbuffer[self.index]
-                if ch in "\n\r": break
-                self.index +=1
-                self.currentToken += ch
-                if ch == ")": break
-        else:
-            while self.index < len(self.charbuffer):
-                ch = self.charbuffer[self.index]
-                ## print "token", self.currentToken, self.index, ch
-                if ch in " \t\r\n": break
-                self.currentToken += ch
-                self.index += 1
-
-    def getToken(self):
-        s = self.currentToken
-        self.nextToken()
-        return s
+    else: nfa = NFA()
+    nfa.startState = startState
+    nfa.stateCount = stateCount
+    nfa.alphabet = set([])
+    nfa.width = 0           ## These fields are not defined for an NFA read from a simple
+    nfa.height = 0          ## textual description.
+    nfa.rePrecedence = 0
+
+    lineno,m = expectLine(lines,ACCEPTING_LINE,"'Accepting state:'")
+    nfa.finalStates.append(lookupState(stateNameMap,m.group(1),lineno))
+    nfa.regExprs.append(m.group(2))
+
+    ## The rest of the description is a sequence of "State" lines, each followed
+    ## by that state's transitions (non-Thompson NFAs may also have further
+    ## "Accepting state" lines before the first "State" line).
+    alphabet = nfa.alphabet
+    successors = None
+    for lineno,line in lines:
+        text = line.strip()
+        if not text: continue
+        m = TRANSITION_LINE.match(text)
+        if m:
+            if successors is None:
+                raise SyntaxError, ("line %d: transition outside a 'State' block" % lineno)
+            transitionChar = m.group(1)
+            if ESCAPED_CHAR.match(transitionChar): transitionChar = chr(int(transitionChar[2:],16))
+            alphabet.add(transitionChar)
+            successors.append((transitionChar,lookupState(stateNameMap,m.group(2),lineno),None))
+            continue
+        m = STATE_LINE.match(text)
+        if m:
+            successors = lookupState(stateNameMap,m.group(1),lineno).successors
+            continue
+        m = ACCEPTING_LINE.match(text)
+        if m and successors is None:
+            if nfaType == "Thompson":
+                raise SyntaxError, ("line %d: a Thompson NFA has only one accepting state" % lineno)
+            nfa.finalStates.append(lookupState(stateNameMap,m.group(1),lineno))
+            nfa.regExprs.append(m.group(2))
+            continue
+        raise SyntaxError, ("line %d: 'State' or transition expected, got '%s'" % (lineno,text))
+    return nfa
+
+
+def expectLine(lines,pattern,expected):
+    "Return the next non-blank line and its match against pattern, or fail."
+    for lineno,line in lines:
+        text = line.strip()
+        if text:
+            m = pattern.match(text)
+            if not m:
+                raise SyntaxError, ("line %d: %s expected, got '%s'" % (lineno,expected,text))
+            return lineno,m
+    raise SyntaxError, ("end of input: %s expected" % expected)
+
+
+def lookupState(stateNameMap,name,lineno):
+    "Return the State called name, or fail if there isn't one."
+    try:
+        return stateNameMap[name]
+    except KeyError:
+        raise SyntaxError, ("line %d: unknown state '%s'" % (lineno,name))
+
+##------------------------------------------------------------------------------
+##
+## checkPlainRoundTrip: a regression check that NFAs written in the plain
+## format read back unchanged, for REs whose classes have bytes (newline,
+## "\\", the bytes of UTF-8 sequences) that must be escaped.  Prints each RE
+## whose NFA doesn't survive the trip and returns their number.
+##
+PLAIN_CHECK_RES = ["[^a]", "x[\\n ]y", "[\\\\(-)]*", "[\\u0400-\\u04FF]"]
+
+def checkPlainRoundTrip(regExpressions=PLAIN_CHECK_RES):
+    "Check that the plain format round-trips the NFA of each RE (see above)."
+    from re2nfa import parseRE
+    failures = 0
+    for regExpr in regExpressions:
+        written = StringIO()
+        parseRE(regExpr).output_plain(written)
+        reread = StringIO()
+        try:
+            readPlain(StringIO(written.getvalue())).output_plain(reread)
+        except SyntaxError, e:
+            print "%s: %s" % (regExpr,e)
+        if reread.getvalue() != written.getvalue():
+            print "%s: NFA changed by writing and reading it" % regExpr
+            failures += 1
+    return failures
 
 
 
@@ -0,0 +1,219 @@
+##------------------------------------------------------------------------------
+##
+## nfaopt.py -- An optimisation pass for arbitrary NFAs: epsilon elimination,
+##              merging of epsilon-equivalent states, and removal of useless
+##              states.
+##
+## The NFAs built by re2nfa (and any others read by nfa2dfa) are mostly
+## epsilon transitions, and subset, DFAScanner and NFA.scan spend most of
+## their time computing epsilon closures.  optimiseNFA builds an equivalent
+## NFA with no epsilon transitions at all:
+##
+##     1. States that can reach each other by epsilon transitions alone (a
+##        strongly-connected component of the epsilon graph, e.g., the loop
+##        of a Kleene closure) are equivalent, and are merged into a single
+##        state.
+##
+##     2. Each merged state takes over the non-epsilon transitions of every
+##        state in its epsilon closure, and accepts if any of them accepts.
+##        Its epsilon transitions are then dropped.
+##
+##     3. States that can't be reached from the start state, and states from
+##        which no accepting state can be reached ("dead" states), are
+##        removed, together with the transitions into them.
+##
+## Per-RE accepting semantics are kept: a new state accepts the RE of the
+## *first* of the original accepting states in its closure (in the order of
+## the original finalStates list, which is the priority order used by subset
+## and the scanners), and the new finalStates list is sorted into the same
+## priority order.  So subset gives a DFA that scans exactly as before (it
+## is usually smaller, too, as no DFA state is ever built twice for the same
+## set of "real" states).
+##
+## Function:
+##
+##          optimiseNFA(nfa,verbose=False)
+##
+##              Arguments:
+##
+##                  nfa - An NFA object (Thompson or otherwise, e.g., from
+##                        parseREs, parsePlain or readBinary).  It is not
+##                        changed.
+##
+##                  verbose - A boolean.  If True, print a summary of the
+##                        reduction.
+##
+##              Returns: a new NFA object, with states named 0, 1, 2, ... in
+##                       breadth-first order from the start state.
+##
+##
+from fa import FA
+from nfa import NFA
+from state import State
+
+
+##------------------------------------------------------------------------------
+##
+## epsilonComponents: find the strongly-connected components of the epsilon
+## graph of a list of states (Tarjan's algorithm, written iteratively so as
+## not to hit Python's recursion limit on big NFAs).  Returns a list of
+## components (each a list of states) in reverse topological order: every
+## component comes after all those it has epsilon transitions into.
+##
+##
+def epsilonComponents(states):
+    "Return the strongly-connected components of the epsilon graph."
+    index = {}
+    lowLink = {}
+    onStack = set()
+    stack = []
+    components = []
+    for root in states:
+        if root in index: continue
+        work = [(root,iter(epsilonTargets(root)))]
+        index[root] = lowLink[root] = len(index)
+        stack.append(root) ; onStack.add(root)
+        while work:
+            state,targets = work[-1]
+            for target in targets:
+                if not target in index:
+                    index[target] = lowLink[target] = len(index)
+                    stack.append(target) ; onStack.add(target)
+                    work.append((target,iter(epsilonTargets(target))))
+                    break
+                elif target in onStack:
+                    lowLink[state] = min(lowLink[state],index[target])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowLink[parent] = min(lowLink[parent],lowLink[state])
+                if lowLink[state] == index[state]:
+                    component = []
+                    while True:
+                        member = stack.pop() ; onStack.discard(member)
+                        component.append(member)
+                        if member is state: break
+                    components.append(component)
+    return components
+
+
+def epsilonTargets(state):
+    "Return the targets of the epsilon transitions out of a state."
+    return [successor[1] for successor in state.successors if successor[0] == FA.EPS]
+
+
+def reachableStates(startState):
+    "Return a list of all the states reachable from startState, in breadth-first order."
+    found = [startState]
+    seen = set(found)
+    index = 0
+    while index < len(found):
+        for successor in found[index].successors:
+            if not successor[1] in seen:
+                seen.add(successor[1])
+                found.append(successor[1])
+        index += 1
+    return found
+
+
+##------------------------------------------------------------------------------
+##
+## optimiseNFA (see header).
+##
+##
+def optimiseNFA(nfa,verbose=False):
+    "Return an equivalent NFA with no epsilon transitions and no useless states."
+    states = reachableStates(nfa.startState)
+    priority = {}
+    for i,finalState in enumerate(nfa.finalStates):
+        if not finalState in priority: priority[finalState] = i
+
+    ## 1. Merge the epsilon components, and find the epsilon closure of each
+    ## (as a set of component numbers).  Components come children-first, so
+    ## each closure can be built from those already complete.
+    components = epsilonComponents(states)
+    componentOf = {}
+    for c,component in enumerate(components):
+        for state in component: componentOf[state] = c
+    closures = []
+    for c,component in enumerate(components):
+        closure = set([c])
+        for state in component:
+            for target in epsilonTargets(state):
+                if componentOf[target] != c: closure |= closures[componentOf[target]]
+        closures.append(closure)
+
+    ## 2. The transitions and acceptance of each merged state.
+    moves = []        ## Per component, a set of (char,target-component).
+    accepts = []      ## Per component, the priority of the RE accepted (or None).
+    for c,component in enumerate(components):
+        localMoves = set()
+        best = None
+        for state in component:
+            if state in priority and (best is None or priority[state] < best):
+                best = priority[state]
+            for successor in state.successors:
+                if successor[0] != FA.EPS:
+                    localMoves.add((successor[0],componentOf[successor[1]]))
+        moves.append(localMoves)
+        accepts.append(best)
+    closedMoves = []
+    closedAccepts = []
+    for c,closure in enumerate(closures):
+        allMoves = set()
+        best = None
+        for d in closure:
+            allMoves |= moves[d]
+            if accepts[d] is not None and (best is None or accepts[d] < best):
+                best = accepts[d]
+        closedMoves.append(allMoves)
+        closedAccepts.append(best)
+
+    ## 3. Keep only the useful states: those reachable from the start (over
+    ## the new transitions) that can also reach an accepting state.  The
+    ## start state is always kept.
+    start = componentOf[nfa.startState]
+    reachable = [start]
+    seen = set(reachable)
+    index = 0
+    while index < len(reachable):
+        for ch,target in sorted(closedMoves[reachable[index]]):
+            if not target in seen:
+                seen.add(target)
+                reachable.append(target)
+        index += 1
+    predecessors = dict((c,set()) for c in reachable)
+    for c in reachable:
+        for ch,target in closedMoves[c]: predecessors[target].add(c)
+    live = set([c for c in reachable if closedAccepts[c] is not None])
+    queue = list(live)
+    while queue:
+        for c in predecessors[queue.pop()]:
+            if not c in live:
+                live.add(c)
+                queue.append(c)
+    kept = [c for c in reachable if c in live or c == start]
+
+    ## Build the new NFA, naming states in breadth-first order.
+    newStates = dict((c,State(i,(-1,-1),list())) for i,c in enumerate(kept))
+    newNFA = NFA()
+    finals = []
+    for c in kept:
+        newState = newStates[c]
+        for ch,target in sorted(closedMoves[c]):
+            if target in live: newState.successors.append((ch,newStates[target],None))
+        if closedAccepts[c] is not None: finals.append((closedAccepts[c],newState))
+    finals.sort(key=lambda final: final[0])
+    newNFA.finalStates = [newState for best,newState in finals]
+    newNFA.regExprs = [nfa.regExprs[best] for best,newState in finals]
+    newNFA.startState = newStates[start]
+    newNFA.stateCount = len(kept)
+    newNFA.alphabet = set(nfa.alphabet)
+    newNFA.alphabet.discard(FA.EPS)
+    newNFA.rePrecedence = 0
+    if verbose:
+        epsCount = sum([len(epsilonTargets(state)) for state in states])
+        print "NFA optimised: %d states (%d epsilon transitions) reduced to %d states." % \
+              (len(states),epsCount,len(kept))
+    return newNFA
@@ -0,0 +1,302 @@
+#!/usr/bin/python
+##------------------------------------------------------------------------------
+##
+## phaseprof.py -- Per-phase profiling of the RE -> NFA -> DFA pipeline (the
+##                 "-profile" option of re2nfa and nfa2dfa).
+##
+## A PhaseProfiler times each phase of a run (parsing, Thompson
+## construction, reading an NFA, optimisation, subset construction,
+## minimisation, output ...), and records for it the number of states and
+## edges (transitions) of the automaton it produced, and its throughput: the
+## amount of work done (RE characters parsed, states built ...) per second.
+## Optionally each phase is also run under cProfile, and the statistics of
+## the slowest phase dumped to a file, for pstats or any other viewer.
+##
+## The report is written to standard error (so that a profiled re2nfa can
+## still be piped into nfa2dfa), in a fixed format, one line per phase:
+##
+##     # phaseprof nfa2dfa
+##     # phase          seconds   states    edges       work unit          rate/s
+##     read            0.012000      240      313       5731 bytes       477583.3
+##     subset          0.034000       17       60         17 states         500.0
+##     ...
+##     total           0.051000
+##
+## Lines starting with '#' are comments.  Saved reports can be compared,
+## phase by phase, with compareReports (or from the command-line, below).
+##
+## Use:
+##
+##     From the command-line, to compare two saved reports:
+##
+##       $ ./phaseprof.py <old-report> <new-report>
+##
+##     e.g.,
+##
+##       $ ./nfa2dfa.py -tab -min -profile <nfa.txt >/dev/null 2>old.prof
+##         ... (change something) ...
+##       $ ./nfa2dfa.py -tab -min -profile <nfa.txt >/dev/null 2>new.prof
+##       $ ./phaseprof.py old.prof new.prof
+##
+## Functions:
+##
+##          countEdges(fa)
+##                  -- Return (states,edges) for an NFA or DFA.
+##
+##          readReport(stream)
+##                  -- Read a saved report, returning a list of
+##                     (phase,seconds) pairs.
+##
+##          compareReports(old,new,stream=None)
+##                  -- Print the time of each phase in two reports (as read
+##                     by readReport), and the ratio new/old.
+##
+## Classes:
+##
+##          PhaseProfiler(title="",dumpFile=None)
+##
+##              methods: phase  -- phase(name,work=None,unit="states"),
+##                                 a context manager timing one phase.
+##                       report -- write the report (to stderr by default),
+##                                 and dump the cProfile statistics of the
+##                                 slowest phase if dumpFile was given.
+##
+##              field:   phases -- the Phase objects, in the order run.
+##
+##          Phase
+##
+##              methods: result -- result(fa), record the automaton the
+##                                 phase produced (its states and edges are
+##                                 counted after the phase's time is taken).
+##                       setWork -- setWork(work,unit), the amount of work
+##                                 done, if not known until the phase ends.
+##
+##              fields:  name, seconds, states, edges, work, unit, profile.
+##
+##          NullProfiler
+##
+##              The same methods as PhaseProfiler, doing nothing: used when
+##              profiling is off.
+##
+## Used as a library:
+##
+##     profiler = PhaseProfiler("mytool")
+##     with profiler.phase("parse",len(text),"chars"):
+##         trees = parseTrees(text)
+##     with profiler.phase("subset") as phase:
+##         dfa = subset(nfa,verbose=False)
+##         phase.result(dfa)                ## Work is the DFA's states.
+##     profiler.report()
+##
+##
+import sys
+import time
+
+
+def countEdges(fa):
+    "Return the number of states and of edges (transitions) of an automaton."
+    states = fa.listStates()
+    return len(states),sum([len(state.successors) for state in states])
+
+
+##------------------------------------------------------------------------------
+##
+## Phase (see header).  The time of a phase when profiled includes cProfile's
+## overhead, so compare profiled runs only with profiled runs.
+##
+##
+class Phase(object):
+    "One timed phase of a PhaseProfiler."
+    def __init__(this,name,work=None,unit="states",profile=None):
+        this.name = name
+        this.work = work
+        this.unit = unit
+        this.profile = profile
+        this.seconds = None
+        this.states = this.edges = None
+        this.fa = None
+
+    def result(this,fa):
+        "Record the automaton built by the phase."
+        this.fa = fa
+        if this.seconds is not None: this.count()
+
+    def setWork(this,work,unit=None):
+        "Record the amount of work done by the phase."
+        this.work = work
+        if unit is not None: this.unit = unit
+
+    def count(this):
+        if this.fa is None: return
+        this.states,this.edges = countEdges(this.fa)
+        if this.work is None: this.work = this.states
+        this.fa = None      ## Don't keep the automaton alive in the report.
+
+    def __enter__(this):
+        if this.profile is not None: this.profile.enable()
+        this.startTime = time.time()
+        return this
+
+    def __exit__(this,*exception):
+        this.seconds = time.time() - this.startTime
+        if this.profile is not None: this.profile.disable()
+        this.count()
+        return False
+
+    def describe(this):
+        "Return the line of the report for this phase."
+        def column(value,width):
+            if value is None: return "%*s" % (width,"-")
+            return "%*d" % (width,value)
+        if this.work is None: unit,rate = "-","%14s" % "-"
+        else: unit,rate = this.unit,"%14.1f" % (this.work/max(this.seconds,1e-9))
+        return "%-14s %9.6f %s %s %s %-8s %s" % \
+               (this.name,this.seconds,column(this.states,8),column(this.edges,8),
+                column(this.work,10),unit,rate)
+
+
+##------------------------------------------------------------------------------
+##
+## PhaseProfiler (see header).
+##
+##
+class PhaseProfiler(object):
+    "Times the phases of a run, with an optional cProfile dump of the slowest."
+    def __init__(this,title="",dumpFile=None):
+        this.title = title
+        this.dumpFile = dumpFile
+        this.phases = []
+
+    def phase(this,name,work=None,unit="states"):
+        "Return a context manager timing a phase of the run."
+        profile = None
+        if this.dumpFile is not None:
+            import cProfile
+            profile = cProfile.Profile()
+        phase = Phase(name,work,unit,profile)
+        this.phases.append(phase)
+        return phase
+
+    def report(this,stream=None):
+        "Write the report, and dump the profile of the slowest phase if asked to."
+        if stream is None: stream = sys.stderr
+        phases = [phase for phase in this.phases if phase.seconds is not None]
+        stream.write("# phaseprof %s\n" % this.title)
+        stream.write("# %-12s %9s %8s %8s %10s %-8s %14s\n" %
+                     ("phase","seconds","states","edges","work","unit","rate/s"))
+        for phase in phases: stream.write(phase.describe() + "\n")
+        stream.write("%-14s %9.6f\n" % ("total",sum([phase.seconds for phase in phases])))
+        if this.dumpFile is not None and phases:
+            slowest = max(phases,key=lambda phase: phase.seconds)
+            slowest.profile.dump_stats(this.dumpFile)
+            stream.write("# cProfile statistics of phase '%s' written to %s\n" %
+                         (slowest.name,this.dumpFile))
+
+
+##------------------------------------------------------------------------------
+##
+## NullProfiler: stands in for a PhaseProfiler when profiling is off, so that
+## the same code runs either way, without timing, counting or a report.
+##
+##
+class NullPhase(object):
+    "A phase that isn't timed."
+    def result(this,fa): pass
+    def setWork(this,work,unit=None): pass
+    def __enter__(this): return this
+    def __exit__(this,*exception): return False
+
+class NullProfiler(object):
+    "A PhaseProfiler that does nothing."
+    def phase(this,name,work=None,unit="states"): return NullPhase()
+    def report(this,stream=None): pass
+
+
+##------------------------------------------------------------------------------
+##
+## Reading and comparing saved reports.  Phases with the same name (e.g.,
+## "read" in a report of re2nfa and nfa2dfa concatenated) are added together.
+##
+##
+def readReport(stream):
+    "Read a saved report, returning its (phase,seconds) pairs in order."
+    times = []
+    index = {}
+    for line in stream:
+        fields = line.split()
+        if len(fields) < 2 or fields[0].startswith('#'): continue
+        try: seconds = float(fields[1])
+        except ValueError: continue
+        if fields[0] in index: times[index[fields[0]]][1] += seconds
+        else:
+            index[fields[0]] = len(times)
+            times.append([fields[0],seconds])
+    return [(phase,seconds) for phase,seconds in times]
+
+
+def compareReports(old,new,stream=None):
+    "Print the phase times of two reports side by side, with their ratio."
+    if stream is None: stream = sys.stdout
+    oldTimes,newTimes = dict(old),dict(new)
+    names = [phase for phase,seconds in old]
+    names += [phase for phase,seconds in new if not phase in oldTimes]
+    stream.write("%-14s %10s %10s %8s\n" % ("phase","old","new","new/old"))
+    for name in names:
+        oldSeconds,newSeconds = oldTimes.get(name),newTimes.get(name)
+        if oldSeconds is None or newSeconds is None:
+            stream.write("%-14s %10s %10s %8s\n" %
+                         (name,oldSeconds is None and "-" or "%.6f" % oldSeconds,
+                          newSeconds is None and "-" or "%.6f" % newSeconds,"-"))
+        else:
+            stream.write("%-14s %10.6f %10.6f %8.2f\n" %
+                         (name,oldSeconds,newSeconds,newSeconds/max(oldSeconds,1e-9)))
+
+
+##------------------------------------------------------------------------------
+##
+## Command-line handling: the "-profile" option of re2nfa and nfa2dfa, and
+## comparing reports.
+##
+##
+def profileOption(argList,title):
+    """Remove a "-profile" or "-profile=<file>" option from an argument list,
+       returning a PhaseProfiler (dumping to <file>), or a NullProfiler if
+       there was no such option."""
+    for arg in argList:
+        if arg == "-profile" or arg.startswith("-profile="):
+            argList.remove(arg)
+            return PhaseProfiler(title,arg[len("-profile="):] or None)
+    return NullProfiler()
+
+
+def processArgs(argList):
+    if len(argList) != 2 or argList[0].startswith("-h"):
+        print_help_text()
+        return
+    reports = []
+    for name in argList:
+        stream = open(name)
+        try: reports.append(readReport(stream))
+        finally: stream.close()
+    compareReports(reports[0],reports[1])
+
+
+def print_help_text():
+    print """    Use:
+
+         From the command-line
+
+           $ ./phaseprof.py <old-report> <new-report>
+
+         Compare, phase by phase, two reports written (to stderr) by
+         the "-profile" option of re2nfa or nfa2dfa.
+
+         "-profile" may be given to re2nfa or nfa2dfa with any of their
+         other options; "-profile=<file>" also runs each phase under
+         cProfile, and writes the statistics of the slowest phase to
+         <file> (read them with pstats).
+    """
+
+
+if __name__ == "__main__":
+    processArgs(sys.argv[1:])
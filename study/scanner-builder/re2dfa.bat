@@ -0,0 +1,2 @@
+@echo off
+python re2dfa.py %*
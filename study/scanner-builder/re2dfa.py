@@ -0,0 +1,245 @@
+#!/usr/bin/python
+##------------------------------------------------------------------------------
+##
+## re2dfa.py  -- Regular expression to DFA converter, in one process.
+##
+## This does the work of
+##
+##       $ ./re2nfa.py <re1> ... <reN> | ./nfa2dfa.py [<option(s)>]
+##
+## without the pipe: the NFA built from the REs is handed straight to the
+## subset construction, rather than being written out as text, read in by a
+## second Python process and parsed again (readPlain).  The output is the
+## same as that of the pipeline.
+##
+## Use:
+##
+##     From the command-line:
+##
+##       $ ./re2dfa.py [<option(s)>] <re1> [<re2> ... <reN>]
+##       $ ./scanbuild.py re2dfa [<option(s)>] <re1> [<re2> ... <reN>]
+##
+##     where <option(s)> come before the REs, and are one of the output
+##     options of nfa2dfa
+##
+##       -h or -help  Help
+##       -tab         Output table representing the DFA.
+##       -ttab        Output the table in LaTeX format.
+##       -dot         Output a Dot description of the DFA.
+##       -bin         Output the DFA in the binary interchange format
+##                    (see fabin.py) to standard output.
+##       -pack        Output the DFA's transition table packed into
+##                    comb vectors (see dfapack.py).
+##       -scan <string>
+##                    Scan <string> according to the DFA.
+##
+##     with any of the "option-modifiers"
+##
+##       -min         Minimise the DFA.
+##       -opt         Optimise the NFA (see nfaopt.py) before the subset
+##                    construction.
+##       -factor      Share the literal prefixes of the REs in the NFA
+##                    (as "re2nfa.py -factor").
+##       -engine <e>  Build the DFA with another construction engine (see
+##                    builder.py): subset (the default), factored,
+##                    glushkov, followpos, derivative, keywords or auto.
+##       -profile     Report the time, states, edges and throughput of
+##                    each phase on standard error (see phaseprof.py);
+##                    "-profile=<file>" also writes cProfile statistics
+##                    of the slowest phase to <file>.
+##
+##     In the absence of an output option, a verbose record of the
+##     operation of the subset algorithm is output to stdout, as by
+##     nfa2dfa.  The engines that don't build an NFA (glushkov,
+##     followpos, derivative, keywords, auto) output the DFA's table
+##     instead, and don't take "-opt" or "-factor".
+##
+## Functions:
+##
+##          processArgs(argList) -- Handle a command-line.
+##          parseOptions(argList)
+##                  -- Parse a command-line, returning an Options object
+##                     (fields option, scanString, minimise, optimise,
+##                     factor, engine, profiler and regExprs), or None.
+##          compileDFA(options)
+##                  -- Build (and minimise) the DFA the options ask for.
+##          run(options,cache=None)
+##                  -- Build and output the DFA, taking it from (and
+##                     adding it to) a cache of DFAs if one is given (see
+##                     compileserver.py).
+##
+##
+import sys
+from phaseprof import profileOption
+
+NFA_ENGINES = ("subset","factored")
+
+
+##------------------------------------------------------------------------------
+##
+## Options: a parsed command-line.  Fields are "option" (the output option,
+## "-plain" if none), "scanString", "minimise", "optimise", "factor",
+## "engine", "profiler" (see phaseprof.py) and "regExprs".
+##
+##
+class Options(object):
+    "The options and REs of an re2dfa command-line."
+    def __init__(this):
+        this.option,this.scanString = "-plain",None
+        this.minimise = this.optimise = this.factor = False
+        this.engine = "subset"
+        this.profiler = None
+        this.regExprs = []
+
+
+def parseOptions(argList):
+    """Parse an re2dfa command-line, returning an Options object, or None if
+       there is nothing to do (help was asked for, or an error reported)."""
+    argList = list(argList)
+    options = Options()
+    options.profiler = profileOption(argList,"re2dfa")
+    try:
+        while len(argList) > 0 and argList[0].startswith('-'):
+            arg = argList.pop(0)
+            if arg.startswith("-h"):
+                print_help_text()
+                return None
+            elif arg == "-min":     options.minimise = True
+            elif arg == "-opt":     options.optimise = True
+            elif arg == "-factor":  options.factor = True
+            elif arg == "-engine":  options.engine = argList.pop(0)
+            elif arg == "-scan":    options.option,options.scanString = arg,argList.pop(0)
+            else:                   options.option = arg
+    except IndexError:
+        print "Missing argument for option %s" % arg
+        print_help_text()
+        return None
+    if len(argList) == 0:
+        print "No REs given"
+        print_help_text()
+        return None
+    options.regExprs = argList
+
+    from builder import ENGINES
+    if not options.engine in ENGINES:
+        print "Unknown DFA construction engine '%s' (known engines are %s)." % \
+              (options.engine,", ".join(sorted(ENGINES)))
+        return None
+    if options.engine == "factored": options.factor = True
+    if not options.engine in NFA_ENGINES and (options.optimise or options.factor):
+        print "The -opt and -factor options need an NFA engine (%s)." % \
+              " or ".join(NFA_ENGINES)
+        return None
+    return options
+
+
+def compileNFA(options):
+    "Parse the REs and build their NFA (None if there is a syntax error)."
+    from retree import parseTrees
+    from re2nfa import commandLineNFA
+    profiler = options.profiler
+    with profiler.phase("parse",sum(map(len,options.regExprs)),"chars"):
+        trees = parseTrees(options.regExprs)
+    if trees is None: return None
+    with profiler.phase("thompson") as phase:
+        nfa = commandLineNFA(trees,options.factor)
+        phase.result(nfa)
+    return nfa
+
+
+def compileDFA(options):
+    "Build (and minimise, if asked) the DFA for the REs, None if there is an error."
+    from nfa2dfa import nfaToDFA
+    profiler = options.profiler
+    if options.engine in NFA_ENGINES:
+        nfa = compileNFA(options)
+        if nfa is None: return None
+        return nfaToDFA(nfa,options.optimise,options.minimise,profiler)
+    from builder import ENGINES
+    from dfamin import minimiseDFA
+    with profiler.phase(options.engine) as phase:
+        dfa = ENGINES[options.engine](options.regExprs)
+        phase.result(dfa)
+    if dfa is not None and options.minimise:
+        with profiler.phase("minimise",dfa.stateCount) as phase:
+            dfa = minimiseDFA(dfa,verbose=False,reorder=True)
+            phase.result(dfa)
+    return dfa
+
+
+def run(options,cache=None):
+    """Build the DFA and output it, as the options say.  cache, if given, is
+       an object with methods get(key) and put(key,dfa) (see DFACache in
+       compileserver.py), holding DFAs built before."""
+    from nfa2dfa import convertNFA, outputDFA
+    option = options.option
+    if option == "-plain" and options.engine in NFA_ENGINES:
+        ## The record of the subset construction: nothing to cache.
+        nfa = compileNFA(options)
+        if nfa is None: return
+        known = convertNFA(nfa,option,options.minimise,options.optimise,None,options.profiler)
+    else:
+        key = (options.engine,options.factor,options.optimise,options.minimise,
+               tuple(options.regExprs))
+        dfa = None
+        if cache is not None: dfa = cache.get(key)
+        if dfa is None:
+            dfa = compileDFA(options)
+            if dfa is None: return
+            if cache is not None: cache.put(key,dfa)
+        if option == "-plain": option = "-tab"
+        known = outputDFA(dfa,option,options.scanString,options.profiler)
+    if not known: print_help_text()
+    options.profiler.report()
+
+
+def processArgs(argList):
+    options = parseOptions(argList)
+    if options is not None: run(options)
+
+
+def print_help_text():
+    print """    Use:
+
+         From the command-line
+
+           $ ./re2dfa.py [<option(s)>] <re1> [<re2> ... <reN>]
+
+         Build the DFA for the REs in a single process, as
+         "re2nfa.py <re(s)> | nfa2dfa.py <option(s)>" does.
+
+         where <option(s)> (before the REs) are one of
+
+           -h        Help
+           -tab      Output table representing the DFA.
+           -ttab     Output the table in LaTeX format.
+           -dot      Output the DFA in GraphViz dot format.
+           -bin      Output the DFA in binary format (see fabin.py).
+           -pack     Output the DFA's table packed into comb vectors
+                     (see dfapack.py).
+           -scan <string>
+                     Scan <string> according to the DFA.
+
+         and any of the "option-modifiers"
+
+           -min      Minimise the DFA.
+           -opt      Remove epsilon transitions and useless states from
+                     the NFA before building the DFA.
+           -factor   Share the literal prefixes of the REs in the NFA.
+           -engine <e>
+                     DFA construction engine: subset (the default),
+                     factored, glushkov, followpos, derivative,
+                     keywords or auto.
+           -profile  Report the time, states, edges and throughput of
+                     each phase on stderr.  "-profile=<file>" also
+                     writes cProfile statistics of the slowest phase to
+                     <file>.
+
+         In the absence of an output option, a verbose record of the
+         operation of the subset algorithm is output to stdout (or,
+         for engines other than subset and factored, the DFA's table).
+    """
+
+
+if __name__ == "__main__":
+    processArgs(sys.argv[1:])
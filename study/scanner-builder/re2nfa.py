@@ -16,13 +16,29 @@
 ##       -ttab        Output the table in LaTeX format.
 ##       -graph       Display the NFA graphically using Tkinter.
 ##       -psgraph     Output the NFA as PostScript to standard output.
+##       -svg         Output the NFA as SVG to standard output.
 ##       -dot         Output a Dot description of the NFA.
+##       -bin         Output the NFA in the binary interchange format
+##                    (see fabin.py) to standard output.
+##       -factor      An "option-modifier", which may be given with any
+##                    of the above: share the literal prefixes of the
+##                    REs in a trie at the front of the NFA (see
+##                    FactoredChoiceNFA in nfa.py), rather than joining
+##                    a separate NFA per RE to the start state.
+##       -profile     Also an "option-modifier": report on standard
+##                    error the time, states, edges and throughput of
+##                    each phase (parse, thompson, output), see
+##                    phaseprof.py.  With "-profile=<file>", each phase
+##                    is also run under cProfile, and the statistics of
+##                    the slowest written to <file>.
 ##
 ##     In the absence of a command-line option, a simple textual
 ##     representation of the NFA is output to stdout.
 ##
 ## N.B.  If a single regular-expression is entered on the command-line,
-## a Thompson NFA is generated.  If more than one RE is specified, a
+## a Thompson NFA is generated (for the RE as simplified, see simplifyTree
+## in retree.py, so that alternatives of single characters become one
+## class edge, and the NFA is then labelled "Non-Thompson NFA").  If more than one RE is specified, a
 ## non-Thompson NFA is generated, consisting of N Thompson NFAs (one
 ## for each RE on the command-line) joined by an N-way multi-branch initial
 ## state.  The property of this NFA is that it will have multiple final
@@ -38,34 +54,65 @@
 ##
 ##
 ## To use this code in an interactive Python session, see
-## "parseREs / parseRE" below, and "TkDrawing", "Postscript" etc.
+## "parseREs / parseRE" below, and "TkDrawing", "Postscript" etc. (in
+## drawingsurface.py).
 ##
+## The drawing code (and Tkinter) and the binary format are only imported
+## when an option needing them is given, so the text modes start quickly.
 ##
 ## 
+import sys
 from nfa import *
-from drawingsurface import *
+from retree import *
+from phaseprof import profileOption
 
 def processArgs(argList):
-    if argList[0][0] == '-': option = argList.pop(0)
+    profiler = profileOption(argList,"re2nfa")
+    if "-factor" in argList:
+        factor = True
+        argList.remove("-factor")
+    else:
+        factor = False
+    if len(argList) > 0 and argList[0].startswith('-'): option = argList.pop(0)
     else: option = "-plain"
 
-    nfa = None
-    if option.startswith("-h") or len(argList) == 0: print_help_text()
+    if option.startswith("-h") or len(argList) == 0:
+        print_help_text()
+        return
+    with profiler.phase("parse",sum(map(len,argList)),"chars"):
+        trees = parseTrees(argList)
+    if trees is not None:
+        with profiler.phase("thompson") as phase:
+            nfa = commandLineNFA(trees,factor)
+            phase.result(nfa)
+        with profiler.phase("output") as phase:
+            outputNFA(nfa,option)
+            sys.stdout.flush()
+            phase.result(nfa)
+    profiler.report()
+
+
+def outputNFA(nfa,option):
+    "Output an NFA in the format given by a command-line option."
+    if   option == "-tab":     nfa.output_table()
+    elif option == "-ttab":    nfa.output_table(latex=True)
+    elif option == "-graph":
+        from drawingsurface import TkDrawing
+        TkDrawing(nfa)
+    elif option == "-psgraph":
+        from drawingsurface import PostScript
+        PostScript(nfa)
+    elif option == "-svg":
+        from drawingsurface import SVG
+        SVG(nfa)
+    elif option == "-dot":     nfa.output_dot()
+    elif option == "-plain":   nfa.output_plain()
+    elif option == "-bin":
+        from fabin import writeBinary, binaryStream
+        writeBinary(nfa,binaryStream(sys.stdout))
     else:
-        if len(argList) == 1:
-            nfa = parseRE(argList[0])
-        else:
-            nfa = parseREs(argList)
-        if   option == "-tab":     nfa.output_table()
-        elif option == "-ttab":    nfa.output_table(latex=True)
-        elif option == "-graph":   TkDrawing(nfa)
-        elif option == "-psgraph": PostScript(nfa)
-        elif option == "-dot":     nfa.output_dot()
-        elif option == "-plain":   nfa.output_plain()
-        else:
-            print "Unknown option: %s" % option
-            print_help_text()
-    ##return nfa
+        print "Unknown option: %s" % option
+        print_help_text()
 
 
 def print_help_text():
@@ -82,8 +129,18 @@ def print_help_text():
            -ttab     Output the table in LaTeX format.
            -graph    Display the NFA graphically using Tkinter.
            -psgraph  Output the NFA as PostScript to standard output.
+           -svg      Output the NFA as SVG to standard output.
            -dot      Output a Dot description of the NFA.
            -plain    Output a plain-text description of the NFA (default).
+           -bin      Output the NFA in binary format (for nfa2dfa -binin).
+           -factor   An "option-modifier", it may be given with any of
+                     the other options: share the literal prefixes of
+                     the REs in a trie (much smaller NFAs for big
+                     keyword sets).
+           -profile  Also an "option-modifier": report the time,
+                     states, edges and throughput of each phase on
+                     stderr.  "-profile=<file>" also writes cProfile
+                     statistics of the slowest phase to <file>.
 
          In the absence of a command-line option, a simple textual
          representation of the NFA is output to stdout.
@@ -91,10 +148,15 @@ def print_help_text():
     
 ##------------------------------------------------------------------------------
 ##
-## The Regular-Expression parser.  Parses strings representing simple
+## The Regular-Expression to NFA converter.  Parses strings representing simple
 ## regular expressions (i.e., those containing *only* alternation,
-## concatenation and Kleene-closure operators) and returns NFA objects
-## representing them (as NFA graphs).
+## concatenation and Kleene-closure operators, and character classes) and
+## returns NFA objects representing them (as NFA graphs).  The parsing itself is done by the
+## recursive-descent parser in retree.py, which builds a syntax tree for
+## each RE; the tree is simplified (by "simplifyTree" in retree.py: r|r = r,
+## (r*)* = r*, a|b|c = [a-c], ab|ac = a(b|c) and so on), and "treeToNFA"
+## then applies Thompson's construction to the simplified tree.  The NFA
+## still reports each RE as it was written.
 ##
 ## There are two main interfaces:
 ##
@@ -106,109 +168,94 @@ def print_help_text():
 ##                   to represent them.  This option is useful where
 ##                   the REs are in separate strings, as when reading
 ##                   the command-line via sys.argv, for example.
+##                   With factor=True, it returns a FactoredChoiceNFA
+##                   instead, in which the literal prefixes of the REs
+##                   share a trie (see "literalPrefix" below).
 ##
 ##      parseRE    - This accepts a string containing a *single*
 ##                   RE and returns a ThompsonNFA object to
 ##                   represent it.
 ##
-## The other routines in the parser are not designed to be called
-## directly by the user.  They implement a recursive-descent parser
-## for REs.  The EBNF grammar is:
-##
-##      <OptionsRE>   :== <ConcatRE> { '|' <ConcatRE> }
-##      <ConcatRE>    :== <ClosureRE> { <ClosureRE> }
-##      <ClosureRE>   :== <PrimitiveRE> { '*' }
-##      <PrimitiveRE> :== "(" <OptionsRE> ")" | CHAR
+## "treesToNFA" is the second half of parseREs, building the NFA from
+## syntax trees already parsed (by parseTrees, see retree.py).
 ##
-## Note that the grammar collapses multiple Kleene closure operators
-## in a row into a single such operator (i.e., a** and a*** etc. parse
-## as a*).  This is because a* == a** == a*** etc.
+## See retree.py for the grammar of the REs accepted.
 ##
 
-def parseREs(regExpressions):
+def parseREs(regExpressions,factor=False):
     "Parse a number of (space-separated) REs and return an OuterChoiceNFA."
-    if isinstance(regExpressions,str):
-        return OuterChoiceNFA([parseRE(re) for re in regExpressions.split()])
-    elif isinstance(regExpressions,list):
-        return OuterChoiceNFA([parseRE(re) for re in regExpressions])
-    else:
+    if isinstance(regExpressions,str): regExpressions = regExpressions.split()
+    elif not isinstance(regExpressions,list):
         print "Input format is not correct, should be a string or list of strings."
         return None
+    return treesToNFA(parseTrees(regExpressions),factor)
 
-def parseRE(regExprStr):
-    "Parse a regular expression and return a (Thompson) NFA for it."
-    return parseOptionsRE(StringBuffer(regExprStr))
-
-def parseOptionsRE(sbuf):
-    "Outer-level RE, parsing Option ('|') operators."
-    nfa1 = parseConcatRE(sbuf)
-    nfa = nfa1
-    while nfa1 and sbuf.peek() == '|':
-        sbuf.next()
-        nfa1 = parseConcatRE(sbuf)
-        if nfa1: nfa = ChoiceNFA(nfa,nfa1)
-    return nfa
-
-def parseConcatRE(sbuf):
-    "Mid-level RE, parsing concatenations of lower-lvel REs."
-    nfa1 = parseClosureRE(sbuf)
-    nfa = nfa1
-    while nfa1 and sbuf.peek() and sbuf.peek() not in "|)":
-        nfa1 = parseClosureRE(sbuf)
-        if nfa1: nfa = CompositeNFA(nfa,nfa1)
-    return nfa
-
-def parseClosureRE(sbuf):
-    "Low-level RE, parsing optional Kleene Closures."
-    nfa = parsePrimitiveRE(sbuf)
-    if sbuf.peek() == '*':
-        sbuf.next()
-        while sbuf.peek() == '*': sbuf.next()
-        nfa = ClosureNFA(nfa)
-    return nfa
-
-def parsePrimitiveRE(sbuf):
-    "Lowest-level RE, either a single char or a parenthesised grouping."
-    ch = sbuf.peek()
-    if ch == '(':
-        sbuf.next()
-        nfa = parseOptionsRE(sbuf)
-        if sbuf.peek() == ')': sbuf.next()
-        else:
-            print "Syntax Error: ')' expected."
-            nfa = None
-    elif ch:
-        nfa = PrimitiveNFA(ch)
-        sbuf.next()
-    else:
-        print "Syntax Error: end of input encountered"
-        nfa = None
-    return nfa
+def treesToNFA(trees,factor=False):
+    """Build an OuterChoiceNFA (or, with factor=True, a FactoredChoiceNFA)
+       from a list of RE syntax trees, as parseREs."""
+    if trees is None: return None       ## Syntax error, already reported.
+    memo = {}       ## Shared by all the trees, see simplifyTree.
+    if factor:
+        branches = []
+        for tree in trees:
+            prefix,rest = literalPrefix(tree)
+            if rest is None: branches.append((prefix,None,tree.toString()))
+            else: branches.append((prefix,treeToNFA(simplifyTree(rest,memo)),tree.toString()))
+        return FactoredChoiceNFA(branches)
+    return OuterChoiceNFA([simplifiedNFA(tree,memo) for tree in trees])
 
+def commandLineNFA(trees,factor=False):
+    """Build the NFA re2nfa outputs for a list of RE syntax trees: a Thompson
+       NFA for a single RE (unless factor is True), otherwise as treesToNFA."""
+    if trees is None: return None
+    if len(trees) == 1 and not factor: return simplifiedNFA(trees[0])
+    return treesToNFA(trees,factor)
 
 ##------------------------------------------------------------------------------
 ##
-## StringBuffer is a convenience class for the regular-expression parser. 
-## It allows a string to be "walked-over" one character at a time, with
-## lookahead via method "peek" and advance via method "next".  Once the
-## buffer has been completely examined, calls to "peek" return None.
-##
-## Not for general use, only useful for the parser.
+## literalPrefix: split an RE syntax tree into its leading literal characters
+## (a string) and a tree for the rest (None if the whole RE is literal).
+## E.g., "get(x|y)*" splits into "get" and (x|y)*.
 ##
+def literalPrefix(tree):
+    "Split an RE syntax tree into a literal prefix string and the rest."
+    if isinstance(tree,Char): return tree.ch,None
+    if not isinstance(tree,Concat): return "",tree
+    count = 0
+    while count < len(tree.items) and isinstance(tree.items[count],Char): count += 1
+    prefix = "".join([item.ch for item in tree.items[:count]])
+    if count == len(tree.items): return prefix,None
+    return prefix,cat(tree.items[count:])
 
-class StringBuffer(object):
-    def __init__(this,string):
-        this.string = string
-        this.index = 0
+def parseRE(regExprStr):
+    "Parse a regular expression and return a (Thompson) NFA for it."
+    return simplifiedNFA(parseTree(regExprStr))
 
-    def peek(this):
-        if this.index < len(this.string):
-            return this.string[this.index]
-        else:
-            return None
+def simplifiedNFA(tree,memo=None):
+    """Build a Thompson NFA from an RE syntax tree, simplified first (see
+       simplifyTree in retree.py), for the RE as written."""
+    if tree is None: return None
+    nfa = treeToNFA(simplifyTree(tree,memo))
+    nfa.regExprs = [tree.toString()]
+    nfa.rePrecedence = tree.precedence
+    return nfa
 
-    def next(this):
-        this.index += 1
+def treeToNFA(tree):
+    "Build a Thompson NFA from an RE syntax tree (see retree.py)."
+    if tree is None: return None
+    if isinstance(tree,Char): return PrimitiveNFA(tree.ch)
+    if tree is EPSILON: return PrimitiveNFA(FA.EPS)    ## From written-out repetitions.
+    if isinstance(tree,CharClass) and tree.chars is not None:
+        return ClassNFA(tree.chars,tree.toString())
+    if isinstance(tree,Star): return ClosureNFA(treeToNFA(tree.item))
+    if isinstance(tree,Alt): combine = ChoiceNFA
+    else: combine = CompositeNFA
+    nfa = treeToNFA(tree.items[0])
+    for item in tree.items[1:]: nfa = combine(nfa,treeToNFA(item))
+    if isinstance(tree,(CharClass,Group,Repeat)):   ## Report these as written.
+        nfa.regExprs = [tree.toString()]
+        nfa.rePrecedence = tree.precedence
+    return nfa
 
 
 ##------------------------------------------------------------------------------
@@ -216,8 +263,6 @@ class StringBuffer(object):
 ## Startup code, run when this is a command-line operation.
 ##
 ##
-import sys
-
 ##if __name__ == "__main__":
 ##    print len(sys.argv)
 ##    for (i,s) in enumerate(sys.argv):
@@ -0,0 +1,711 @@
+##------------------------------------------------------------------------------
+##
+## retree.py -- Regular-expression syntax trees and the RE parser.
+##
+## The recursive-descent RE parser builds a syntax tree for each RE it
+## reads.  The trees are then handed to whichever construction is wanted:
+## "treeToNFA" in re2nfa.py builds a Thompson NFA from a tree, "followposDFA"
+## in followpos.py builds a DFA directly from a list of trees.
+##
+## Tree nodes:
+##
+##     Empty      -- The empty language (matches nothing).  Never built by the
+##                   parser, only by the smart constructors below.
+##     Epsilon    -- The empty string.  Also never built by the parser.
+##     Char       -- A single character, field "ch".
+##     Alt        -- Alternation, field "items", a tuple of two or more
+##                   subtrees (r1|r2|...|rN).
+##     Concat     -- Concatenation, field "items", a tuple of two or more
+##                   subtrees (r1r2...rN).
+##     Star       -- Kleene closure, field "item", a single subtree (r*).
+##     CharClass  -- A character class, [...].  This is a kind of Alt, whose
+##                   alternatives (one or more) are the UTF-8 byte sequences
+##                   of the class's members (see utf8.py), with a field "text", the class as
+##                   written, which is used as its "toString".  When all its
+##                   alternatives are single bytes, field "chars" is the
+##                   frozenset of them (otherwise it is None), so that the
+##                   constructions can treat it as one symbol.
+##     Repeat     -- Bounded repetition, r{n}, r{n,} or r{n,m}.  Also a kind of
+##                   Alt, whose single alternative is the repetition written
+##                   out (see "repeatTree"), with fields "item", "low" and
+##                   "high" (None for no upper bound).
+##     Group      -- A named capture group, (?<name>r).  Also a kind of Alt,
+##                   with a single alternative (so the constructions that
+##                   don't extract groups see straight through it), and a
+##                   field "name".  See tdfa.py.
+##
+## Every node has a method "toString", which returns the RE in the same
+## minimally-parenthesised form used for the "regExprs" of the NFAs built by
+## nfa.py (this depends on the "precedence" of each type of node).
+##
+## Note that the trees mirror the structure of the parse exactly: (a|b)|c
+## parses to Alt(Alt(a,b),c), not Alt(a,b,c).  This means that building an
+## NFA from a tree gives exactly the NFA the parser used to build directly.
+## Simplification is a separate pass, "simplifyTree" (below), which re2nfa
+## runs on each tree before building its NFA.
+##
+## Nodes are "hash-consed": creating a node that is structurally identical to
+## one that already exists returns the existing node, so identical subtrees
+## are shared, and two trees are equal exactly when they are the same object.
+## Nodes can therefore be compared, hashed and used as dictionary keys in
+## constant time.  Nodes must not be modified after they are created.
+##
+## Smart constructors:
+##
+##     alt, cat, star -- Build Alt, Concat and Star nodes, simplifying them
+##                   as they go using the identities
+##
+##                       r|r = r,  r|phi = r,  (r|s)|t = r|(s|t),  r|s = s|r
+##                       r eps = eps r = r,  r phi = phi r = phi
+##                       (rs)t = r(st),  (r*)* = r*,  eps* = phi* = eps
+##
+##                   (the alternatives of an "alt" are put in a canonical
+##                   order, and character classes are kept whole).  These keep the number of distinct REs produced
+##                   by repeated derivatives (see derivative.py) finite.
+##
+##     EMPTY, EPSILON -- The (unique) Empty and Epsilon nodes.  Epsilon also
+##                   appears in written-out repetitions.
+##
+## Each node also has a method "nullable", returning True if the node's RE
+## matches the empty string.
+##
+## Functions:
+##
+##     parseTree  -- Parse a string containing a single RE and return its
+##                   syntax tree (or None, if there is a syntax error).
+##
+##     parseTrees -- Parse a string containing a number of (space-separated)
+##                   REs, or a list of strings, each holding a single RE,
+##                   and return a list of syntax trees (or None, if there
+##                   are any errors).
+##
+##     simplifyTree -- Return a tree for the same language as a tree, but
+##                   usually smaller, using the identities of the smart
+##                   constructors and also
+##
+##                       r*|eps = r*,  (r|s*)* = (r|eps)* = (r|s)*,  r*r* = r*
+##                       a|b|[c-e] = [a-e]  (alternatives of single bytes
+##                                           merged into one class)
+##                       rs|rt|r = r(s|t|eps)  (common first items factored)
+##
+##                   Groups and repetitions are replaced by what they
+##                   contain (their expansions), so the result is for
+##                   building automata from, not for printing.
+##
+## The other routines implement the recursive-descent parser and are not
+## designed to be called directly.  The EBNF grammar is:
+##
+##      <OptionsRE>   :== <ConcatRE> { '|' <ConcatRE> }
+##      <ConcatRE>    :== <ClosureRE> { <ClosureRE> }
+##      <ClosureRE>   :== <PrimitiveRE> { '*' | <Bounds> }
+##      <Bounds>      :== "{" DIGITS [ "," [ DIGITS ] ] "}"
+##      <PrimitiveRE> :== "(" <OptionsRE> ")" | <GroupRE> | <ClassRE> | CHAR
+##      <GroupRE>     :== "(?<" NAME ">" <OptionsRE> ")"
+##      <ClassRE>     :== "[" [ "^" ] { <ClassChar> [ "-" <ClassChar> ] } "]"
+##
+## Note that the grammar collapses multiple Kleene closure operators
+## in a row into a single such operator (i.e., a** and a*** etc. parse
+## as a*).  This is because a* == a** == a*** etc.
+##
+## A class matches any one of the characters listed, or lying in the ranges
+## given (lo-hi), or, after "^", any character *not* listed.  Characters are
+## Unicode code points: a class may contain UTF-8 encoded characters, and
+## the escapes \xHH, \uHHHH and \UHHHHHHHH (hex code points) and \n, \r, \t.
+## A backslash before any other character (e.g. \], \-, \^, \\) stands for
+## that character.  The class is compiled into a choice of UTF-8 byte
+## sequences (see utf8.py), so every automaton built from it has only bytes
+## in its alphabet, and scans UTF-8 encoded text.  Outside classes, every
+## character (a byte) stands for itself, as before; so a non-ASCII character
+## outside a class is simply the sequence of its UTF-8 bytes.
+##
+## Bounds give a repetition count: r{n} is exactly n r's, r{n,} is n or more,
+## and r{n,m} is from n to m.  A '{' not followed by a digit is an ordinary
+## character.  A repetition is written out in full (so all the constructions
+## handle it), but compactly: r{2,5} becomes rr(r(r(r|eps)|eps)|eps), whose
+## copies of r (being hash-consed, see below) are a single shared subtree, and
+## whose followpos sets stay small (unlike those of rr(r|eps)(r|eps)(r|eps)).
+## Because the automata still grow with the bounds, a repetition that would
+## need more than REPEAT_LIMIT positions (characters, after writing it out) is
+## reported as an error, rather than silently building a huge automaton;
+## "positionCount" estimates the size of any tree in the same way.
+##
+## A group matches exactly what its RE does; the name (letters, digits and
+## underscores) is used to report the part of a match the group matched.
+##
+import weakref
+from utf8 import utf8Sequences, decodeCodePoint, normaliseRanges, complementRanges
+
+##------------------------------------------------------------------------------
+##
+## The intern table maps a (class,argument...) key to the unique node with that
+## structure.  It holds its nodes weakly, so nodes no longer referenced by any
+## tree are discarded.  Each node also gets a serial number, used to put the
+## alternatives of "alt" into a canonical (and reproducible) order.
+##
+internTable = weakref.WeakValueDictionary()
+nodeSerial = [0]
+
+
+class RENode(object):
+    "Base class for regular-expression syntax tree nodes."
+    precedence = 0
+
+    def __new__(cls,*args):
+        key = (cls,) + tuple([tuple(a) if isinstance(a,list) else a for a in args])
+        node = internTable.get(key)
+        if node is None:
+            node = object.__new__(cls)
+            node.serial = nodeSerial[0] ; nodeSerial[0] += 1
+            internTable[key] = node
+        return node
+
+    def __str__(this):
+        return this.toString()
+
+    def __repr__(this):
+        return "<%s %s>" % (this.__class__.__name__,this.toString())
+
+    def wrap(this,precedence):
+        "Return this RE as a string, parenthesised if it binds less tightly than precedence."
+        if this.precedence < precedence: return "(%s)" % this.toString()
+        return this.toString()
+
+
+class Empty(RENode):
+    "The empty language."
+    precedence = 30
+    def nullable(this):
+        return False
+
+    def toString(this):
+        return "phi"
+
+
+class Epsilon(RENode):
+    "The empty string."
+    precedence = 30
+    def nullable(this):
+        return True
+
+    def toString(this):
+        return "eps"
+
+
+class Char(RENode):
+    "A single character."
+    precedence = 30   ## Highest precedence, as for PrimitiveNFA.
+    def __init__(this,ch):
+        this.ch = ch
+
+    def nullable(this):
+        return False
+
+    def toString(this):
+        return this.ch
+
+
+class Alt(RENode):
+    "A choice between two or more REs."
+    precedence = 0    ## Lowest precedence, as for ChoiceNFA.
+    def __init__(this,items):
+        this.items = tuple(items)
+
+    def nullable(this):
+        for item in this.items:
+            if item.nullable(): return True
+        return False
+
+    def toString(this):
+        return "|".join([item.toString() for item in this.items])
+
+
+class CharClass(Alt):
+    "A character class: an Alt of byte sequences, printed as written."
+    precedence = 30   ## As for Char.
+    def __init__(this,items,text):
+        this.items = tuple(items)
+        this.text = text
+        if all([isinstance(item,Char) for item in this.items]):
+            this.chars = frozenset([item.ch for item in this.items])
+        else:
+            this.chars = None
+
+    def toString(this):
+        return this.text
+
+
+class Group(Alt):
+    "A named capture group: an Alt of one RE, printed as (?<name>r)."
+    precedence = 30   ## Parenthesised.
+    def __init__(this,item,name):
+        this.items = (item,)
+        this.name = name
+
+    def toString(this):
+        return "(?<%s>%s)" % (this.name,this.items[0].toString())
+
+
+class Repeat(Alt):
+    "A bounded repetition: an Alt of the written-out RE, printed as r{n,m}."
+    precedence = 20   ## As for Star.
+    def __init__(this,expansion,item,low,high):
+        this.items = (expansion,)
+        this.item = item
+        this.low = low
+        this.high = high
+
+    def toString(this):
+        if this.high is None: bounds = "{%d,}" % this.low
+        elif this.high == this.low: bounds = "{%d}" % this.low
+        else: bounds = "{%d,%d}" % (this.low,this.high)
+        return this.item.wrap(Repeat.precedence+1) + bounds
+
+
+class Concat(RENode):
+    "A sequence of two or more REs."
+    precedence = 10   ## As for CompositeNFA.
+    def __init__(this,items):
+        this.items = tuple(items)
+
+    def nullable(this):
+        for item in this.items:
+            if not item.nullable(): return False
+        return True
+
+    def toString(this):
+        return "".join([item.wrap(Concat.precedence) for item in this.items])
+
+
+class Star(RENode):
+    "The Kleene closure of an RE."
+    precedence = 20   ## As for ClosureNFA.
+    def __init__(this,item):
+        this.item = item
+
+    def nullable(this):
+        return True
+
+    def toString(this):
+        return this.item.wrap(Star.precedence) + "*"
+
+
+EMPTY = Empty()
+EPSILON = Epsilon()
+
+
+##------------------------------------------------------------------------------
+##
+## The smart constructors (see header).
+##
+##
+def alt(items):
+    "Build the (simplified) alternation of a list of trees."
+    alternatives = set()
+    for item in items:
+        if isinstance(item,Alt) and not isinstance(item,CharClass):
+            alternatives.update(item.items)
+        elif item is not EMPTY: alternatives.add(item)
+    if len(alternatives) == 0: return EMPTY
+    if len(alternatives) == 1: return alternatives.pop()
+    return Alt(sorted(alternatives,key=lambda item: item.serial))
+
+def cat(items):
+    "Build the (simplified) concatenation of a list of trees."
+    sequence = []
+    for item in items:
+        if item is EMPTY: return EMPTY
+        if isinstance(item,Concat): sequence.extend(item.items)
+        elif item is not EPSILON: sequence.append(item)
+    if len(sequence) == 0: return EPSILON
+    if len(sequence) == 1: return sequence[0]
+    return Concat(sequence)
+
+def star(item):
+    "Build the (simplified) Kleene closure of a tree."
+    if isinstance(item,Star): return item
+    if item is EMPTY or item is EPSILON: return EPSILON
+    return Star(item)
+
+
+##------------------------------------------------------------------------------
+##
+## The parser.
+##
+##
+def parseTrees(regExpressions):
+    "Parse a number of (space-separated) REs and return a list of syntax trees."
+    if isinstance(regExpressions,basestring): regExpressions = regExpressions.split()
+    elif not isinstance(regExpressions,list):
+        print "Input format is not correct, should be a string or list of strings."
+        return None
+    trees = [parseTree(re) for re in regExpressions]
+    if None in trees: return None
+    return trees
+
+def parseTree(regExprStr):
+    "Parse a regular expression and return a syntax tree for it."
+    return parseOptionsRE(StringBuffer(regExprStr))
+
+def parseOptionsRE(sbuf):
+    "Outer-level RE, parsing Option ('|') operators."
+    tree1 = parseConcatRE(sbuf)
+    if tree1 is None: return None
+    items = [tree1]
+    while sbuf.peek() == '|':
+        sbuf.next()
+        tree1 = parseConcatRE(sbuf)
+        if tree1 is None: return None
+        items.append(tree1)
+    if len(items) == 1: return items[0]
+    return Alt(items)
+
+def parseConcatRE(sbuf):
+    "Mid-level RE, parsing concatenations of lower-lvel REs."
+    tree1 = parseClosureRE(sbuf)
+    if tree1 is None: return None
+    items = [tree1]
+    while sbuf.peek() and sbuf.peek() not in "|)":
+        tree1 = parseClosureRE(sbuf)
+        if tree1 is None: return None
+        items.append(tree1)
+    if len(items) == 1: return items[0]
+    return Concat(items)
+
+def parseClosureRE(sbuf):
+    "Low-level RE, parsing optional Kleene Closures and repetition bounds."
+    tree = parsePrimitiveRE(sbuf)
+    while tree:
+        if sbuf.peek() == '*':
+            sbuf.next()
+            while sbuf.peek() == '*': sbuf.next()
+            tree = Star(tree)
+        elif sbuf.peek() == '{' and sbuf.string[sbuf.index+1:sbuf.index+2].isdigit():
+            tree = parseBoundsRE(sbuf,tree)
+        else: break
+    return tree
+
+def parseBoundsRE(sbuf,tree):
+    "Repetition bounds, {n}, {n,} or {n,m}, applied to tree."
+    end = sbuf.string.find('}',sbuf.index)
+    bounds = sbuf.string[sbuf.index+1:end].split(',')
+    if end < 0 or len(bounds) > 2 or not bounds[0].isdigit() or \
+       (len(bounds) == 2 and bounds[1] and not bounds[1].isdigit()):
+        print "Syntax Error: bad repetition bounds."
+        return None
+    sbuf.index = end + 1
+    low = int(bounds[0])
+    if len(bounds) == 1: high = low
+    elif bounds[1]: high = int(bounds[1])
+    else: high = None
+    if high is not None and high < low:
+        print "Syntax Error: bad repetition bounds."
+        return None
+    size = positionCount(tree) * repeatCopies(low,high)
+    if size > REPEAT_LIMIT:
+        print "Syntax Error: repetition too large (%d positions, the limit is %d)." % \
+              (size,REPEAT_LIMIT)
+        return None
+    return repeatTree(tree,low,high)
+
+def parsePrimitiveRE(sbuf):
+    "Lowest-level RE, either a single char or a parenthesised grouping."
+    ch = sbuf.peek()
+    if sbuf.string.startswith("(?<",sbuf.index):
+        tree = parseGroupRE(sbuf)
+    elif ch == '(':
+        sbuf.next()
+        tree = parseOptionsRE(sbuf)
+        if sbuf.peek() == ')': sbuf.next()
+        else:
+            print "Syntax Error: ')' expected."
+            tree = None
+    elif ch == '[':
+        tree = parseClassRE(sbuf)
+    elif ch:
+        tree = Char(ch)
+        sbuf.next()
+    else:
+        print "Syntax Error: end of input encountered"
+        tree = None
+    return tree
+
+
+def parseGroupRE(sbuf):
+    "A named capture group, (?<name>RE)."
+    end = sbuf.string.find('>',sbuf.index)
+    name = sbuf.string[sbuf.index+3:end]
+    if end < 0 or not name or not name.replace('_','a').isalnum():
+        print "Syntax Error: bad group name."
+        return None
+    sbuf.index = end + 1
+    tree = parseOptionsRE(sbuf)
+    if tree is None: return None
+    if sbuf.peek() != ')':
+        print "Syntax Error: ')' expected."
+        return None
+    sbuf.next()
+    return Group(tree,name)
+
+
+##------------------------------------------------------------------------------
+##
+## Bounded repetition (see header).  REPEAT_LIMIT is the largest number of
+## positions a single repetition may be written out to.
+##
+##
+REPEAT_LIMIT = 5000
+
+def repeatTree(item,low,high):
+    "Return the Repeat node for item{low,high} (high None for no upper bound)."
+    if high is None: tail = Star(item)
+    else:
+        tail = None             ## The optional copies, nested: (r(r|eps)|eps) etc.
+        for i in range(high-low):
+            if tail is None: tail = Alt([item,EPSILON])
+            else: tail = Alt([Concat([item,tail]),EPSILON])
+    items = [item] * low
+    if tail is not None: items.append(tail)
+    if len(items) == 0: expansion = EPSILON
+    elif len(items) == 1: expansion = items[0]
+    else: expansion = Concat(items)
+    return Repeat(expansion,item,low,high)
+
+def repeatCopies(low,high):
+    "The number of copies of r in r{low,high}, written out."
+    if high is None: return low + 1
+    return high
+
+def positionCount(tree):
+    "Estimate the size of a tree: the number of positions (characters) in it."
+    if isinstance(tree,Repeat):
+        return positionCount(tree.item) * repeatCopies(tree.low,tree.high)
+    if isinstance(tree,CharClass) and tree.chars is not None: return 1
+    if isinstance(tree,(Alt,Concat)): return sum([positionCount(item) for item in tree.items])
+    if isinstance(tree,Star): return positionCount(tree.item)
+    if isinstance(tree,Char): return 1
+    return 0        ## Empty and Epsilon.
+
+
+##------------------------------------------------------------------------------
+##
+## Simplification (see header).  The tree returned matches the same language
+## as the one given, but has no groups or repetitions (they are replaced by
+## what they contain, or their expansion), so it is for building automata,
+## not for reporting the RE: keep the original tree's "toString" for that.
+##
+## memo maps each node already simplified to its result: since the nodes are
+## hash-consed, a subtree shared by several REs (or by the copies of a
+## repetition) is simplified only once.
+##
+##
+def simplifyTree(tree,memo=None):
+    "Return a simpler tree for the same language as tree."
+    if memo is None: memo = {}
+    result = memo.get(tree)
+    if result is not None: return result
+    if isinstance(tree,(Char,Empty,Epsilon,CharClass)): result = tree
+    elif isinstance(tree,(Group,Repeat)): result = simplifyTree(tree.items[0],memo)
+    elif isinstance(tree,Alt):
+        result = simplifyAlt([simplifyTree(item,memo) for item in tree.items])
+    elif isinstance(tree,Concat):
+        result = cat([simplifyTree(item,memo) for item in tree.items])
+        if isinstance(result,Concat):   ## r*r* = r*
+            items = result.items
+            result = cat([item for i,item in enumerate(items)
+                          if not (i > 0 and isinstance(item,Star) and items[i-1] is item)])
+    else:
+        item = simplifyTree(tree.item,memo)
+        if isinstance(item,Alt) and not isinstance(item,CharClass):
+            ## (r|eps)* = (r|s*)* ... = (r|s)*
+            item = simplifyAlt([alternative.item if isinstance(alternative,Star) else alternative
+                                for alternative in item.items if alternative is not EPSILON])
+        result = star(item)
+    memo[tree] = result
+    return result
+
+def simplifyAlt(items):
+    """Return the simplified alternation of a list of (simplified) trees:
+       single characters are merged into a class, and common first items are
+       factored out, r|rs|rt = r(eps|s|t)."""
+    alternatives = alt(items)
+    if not isinstance(alternatives,Alt) or isinstance(alternatives,CharClass): return alternatives
+    alternatives = list(alternatives.items)
+    ## eps is redundant beside another nullable alternative: r*|eps = r*.
+    if EPSILON in alternatives and \
+       len([item for item in alternatives if item.nullable()]) > 1:
+        alternatives.remove(EPSILON)
+    ## Single characters (and single-byte classes) into one class.
+    singles = [item for item in alternatives if isinstance(item,Char) or
+               (isinstance(item,CharClass) and item.chars is not None)]
+    if len(singles) > 1:
+        chars = set()
+        for item in singles:
+            if isinstance(item,Char): chars.add(item.ch)
+            else: chars.update(item.chars)
+        merged = None
+        for item in singles:    ## A class already holding them all, e.g. a|[a-z].
+            if isinstance(item,CharClass) and len(item.chars) == len(chars): merged = item
+        if merged is None: merged = charsTree(chars)
+        alternatives = [item for item in alternatives if not item in singles] + [merged]
+    ## Common first items.
+    groups = []
+    rests = {}
+    for item in alternatives:
+        if isinstance(item,Concat): head,rest = item.items[0],cat(item.items[1:])
+        else: head,rest = item,EPSILON
+        if not head in rests:
+            groups.append(head)
+            rests[head] = []
+        rests[head].append(rest)
+    if len(groups) == len(alternatives): return alt(alternatives)
+    return alt([cat([head,simplifyAlt(rests[head])]) if len(rests[head]) > 1 else
+                cat([head,rests[head][0]]) for head in groups])
+
+def charsTree(chars):
+    "Return the tree (a Char or a CharClass) matching any one of a set of bytes."
+    if len(chars) == 1: return Char(iter(chars).next())
+    codes = sorted([ord(ch) for ch in chars])
+    text = []
+    i = 0
+    while i < len(codes):
+        j = i
+        while j+1 < len(codes) and codes[j+1] == codes[j] + 1: j += 1
+        if j - i >= 2: text.append("%s-%s" % (byteText(codes[i]),byteText(codes[j])))
+        else: text.extend([byteText(code) for code in codes[i:j+1]])
+        i = j + 1
+    return CharClass([Char(chr(code)) for code in codes],"[%s]" % "".join(text))
+
+
+##------------------------------------------------------------------------------
+##
+## Character classes.  "parseClassRE" reads a class into a list of code-point
+## ranges, and "classTree" turns these into a tree over UTF-8 bytes.
+##
+##
+ESCAPES = {'n': 0x0A, 'r': 0x0D, 't': 0x09}
+HEX_ESCAPES = {'x': 2, 'u': 4, 'U': 8}
+
+def parseClassRE(sbuf):
+    "Parse a character class, [...], returning its tree."
+    start = sbuf.index
+    sbuf.next()
+    negated = sbuf.peek() == '^'
+    if negated: sbuf.next()
+    ranges = []
+    while sbuf.peek() != ']':
+        lo = parseClassChar(sbuf)
+        if lo is None: return None
+        hi = lo
+        if sbuf.peek() == '-':
+            sbuf.next()
+            hi = parseClassChar(sbuf)
+            if hi is None: return None
+            if hi < lo:
+                print "Syntax Error: bad range in character class."
+                return None
+        ranges.append((lo,hi))
+    sbuf.next()
+    ranges = normaliseRanges(ranges)
+    if negated: ranges = complementRanges(ranges)
+    if len(ranges) == 0:
+        print "Syntax Error: empty character class."
+        return None
+    return classTree(ranges,sbuf.string[start:sbuf.index])
+
+def parseClassChar(sbuf):
+    "Parse one (possibly escaped) character of a class, returning its code point."
+    ch = sbuf.peek()
+    if ch is None:
+        print "Syntax Error: ']' expected."
+        return None
+    if ch == '\\':
+        sbuf.next()
+        ch = sbuf.peek()
+        if ch is None:
+            print "Syntax Error: end of input encountered"
+            return None
+        if ch in ESCAPES:
+            sbuf.next()
+            return ESCAPES[ch]
+        if ch in HEX_ESCAPES:
+            sbuf.next()
+            digits = sbuf.string[sbuf.index:sbuf.index+HEX_ESCAPES[ch]]
+            if len(digits) < HEX_ESCAPES[ch] or digits.strip("0123456789abcdefABCDEF") or \
+               int(digits,16) > 0x10FFFF:
+                print "Syntax Error: bad \\%s escape in character class." % ch
+                return None
+            sbuf.index += HEX_ESCAPES[ch]
+            return int(digits,16)
+        ## Any other escaped character stands for itself.
+    decoded = decodeCodePoint(sbuf.string,sbuf.index)
+    if decoded is None:
+        print "Syntax Error: invalid UTF-8 in character class."
+        return None
+    sbuf.index = decoded[1]
+    return decoded[0]
+
+def classTree(ranges,text):
+    "Return the tree matching the UTF-8 encodings of a list of code-point ranges."
+    sequences = []
+    for lo,hi in ranges: sequences.extend(utf8Sequences(lo,hi))
+    tree = sequencesTree(sequences)
+    if isinstance(tree,Alt): return CharClass(tree.items,text)
+    return CharClass([tree],text)
+
+def sequencesTree(sequences):
+    """Return the tree for a list of byte-range sequences, sharing common
+       leading byte ranges."""
+    groups = []
+    rests = {}
+    for sequence in sequences:
+        head = sequence[0]
+        if not head in rests:
+            groups.append(head)
+            rests[head] = []
+        if len(sequence) > 1: rests[head].append(sequence[1:])
+    alternatives = []
+    for head in groups:
+        tree = byteRangeTree(head[0],head[1])
+        if rests[head]:
+            rest = sequencesTree(rests[head])
+            if isinstance(rest,Concat): tree = Concat((tree,) + rest.items)
+            else: tree = Concat([tree,rest])
+        alternatives.append(tree)
+    if len(alternatives) == 1: return alternatives[0]
+    return Alt(alternatives)
+
+def byteRangeTree(lo,hi):
+    "Return the tree matching one byte in the range lo..hi."
+    if lo == hi: return Char(chr(lo))
+    return CharClass([Char(chr(b)) for b in range(lo,hi+1)],
+                     "[%s-%s]" % (byteText(lo),byteText(hi)))
+
+def byteText(b):
+    "A byte as it appears in a class: printable ASCII as itself, otherwise escaped."
+    if 0x21 <= b <= 0x7E and not chr(b) in "\\]-^": return chr(b)
+    return "\\x%02X" % b
+
+
+##------------------------------------------------------------------------------
+##
+## StringBuffer is a convenience class for the regular-expression parser.
+## It allows a string to be "walked-over" one character at a time, with
+## lookahead via method "peek" and advance via method "next".  Once the
+## buffer has been completely examined, calls to "peek" return None.
+##
+## Not for general use, only useful for the parser.
+##
+
+class StringBuffer(object):
+    def __init__(this,string):
+        this.string = string
+        this.index = 0
+
+    def peek(this):
+        if this.index < len(this.string):
+            return this.string[this.index]
+        else:
+            return None
+
+    def next(this):
+        this.index += 1
@@ -0,0 +1,122 @@
+#!/usr/bin/python
+##------------------------------------------------------------------------------
+##
+## scanbuild.py -- A single, fast-starting command-line entry point for the
+##                 scanner-builder tools.
+##
+## Use:
+##
+##     From the command-line:
+##
+##       $ ./scanbuild.py [-time] <command> [<option(s)>] [<argument(s)>]
+##
+##     where <command> is one of
+##
+##       re2nfa       Exactly as "re2nfa.py [<option(s)>] <re1> ... <reN>".
+##       nfa2dfa      Exactly as "nfa2dfa.py [<option(s)>] [<string>]".
+##       re2dfa       Exactly as "re2dfa.py [<option(s)>] <re1> ... <reN>".
+##       batch        Exactly as "batch.py [<option(s)>] <manifest>".
+##       memreport    Exactly as "memreport.py [<option(s)>] <re1> ... <reN>".
+##
+##     and the options and arguments are those of the command (use
+##     "scanbuild.py <command> -help" for details).  For example
+##
+##       $ ./scanbuild.py re2nfa '(a|b)*abb' | ./scanbuild.py nfa2dfa -min -tab
+##
+##     or, faster still, with no pipe,
+##
+##       $ ./scanbuild.py re2dfa -min -tab '(a|b)*abb'
+##
+##       -time        Report, on standard error, how long the command took
+##                    to start and to run (see below).
+##
+## This script is meant for build pipelines that run the tools many times.
+## It starts faster than running re2nfa.py or nfa2dfa.py directly because:
+##
+##   - Python compiles the script it is started with every time it runs, but
+##     loads imported modules from their cached, compiled (.pyc) versions.
+##     This script is tiny; the real work is done by the imported modules.
+##
+##   - Only the module for the requested command is imported, and the
+##     commands themselves only import the drawing code (and Tkinter), the
+##     binary format, the NFA optimiser etc. when an option needs them.
+##
+## The "-time" report gives the startup time (from when this script began to
+## when the command's modules had all been imported), the time the command
+## itself took, and the number of modules loaded.  The time Python takes to
+## start up before running this script isn't included; compare with
+## "time python -c pass" to see it.
+##
+##
+import sys
+import time
+
+startTime = time.time()
+
+## COMMANDS maps each command name to the module implementing it.  Each
+## module provides "processArgs" (taking the command's argument list) and
+## "print_help_text".
+##
+COMMANDS = {"re2nfa":  "re2nfa",
+            "nfa2dfa": "nfa2dfa",
+            "re2dfa":  "re2dfa",
+            "batch":   "batch",
+            "memreport": "memreport"}
+
+
+def importCommand(command):
+    """Import and return the module implementing a command.  Its processArgs
+       is called with the command's arguments, even if there are none (each
+       prints its own help then, except nfa2dfa, which reads stdin)."""
+    return __import__(COMMANDS[command])
+
+
+def processArgs(argList):
+    if len(argList) > 0 and argList[0] == "-time":
+        reportTime = True
+        argList = argList[1:]
+    else:
+        reportTime = False
+    if len(argList) == 0 or not argList[0] in COMMANDS:
+        if len(argList) > 0 and not argList[0].startswith("-h"):
+            print "Unknown command: %s" % argList[0]
+        print_help_text()
+        return
+    module = importCommand(argList[0])
+    importedTime = time.time()
+    module.processArgs(argList[1:])
+    sys.stdout.flush()
+    if reportTime:
+        endTime = time.time()
+        sys.stderr.write("scanbuild %s: startup %.1f ms, run %.1f ms, %d modules loaded\n" %
+                         (argList[0],1000*(importedTime-startTime),
+                          1000*(endTime-importedTime),len(sys.modules)))
+
+
+def print_help_text():
+    print """    Use:
+
+         From the command-line
+
+           $ ./scanbuild.py [-time] <command> [<option(s)>] [<argument(s)>]
+
+         where <command> is one of
+
+           re2nfa    Convert RE(s) to an NFA, as re2nfa.py.
+           nfa2dfa   Convert an NFA on stdin to a DFA, as nfa2dfa.py.
+           re2dfa    Convert RE(s) to a DFA in one process, as
+                     re2dfa.py.
+           batch     Build DFAs for a manifest of RE sets in parallel,
+                     as batch.py.
+           memreport Report the memory used by each phase of building a
+                     DFA, as memreport.py.
+
+         and the options and arguments are those of the command (use
+         "scanbuild.py <command> -help" to list them).
+
+           -time     Report startup, import and run times on stderr.
+    """
+
+
+if __name__ == "__main__":
+    processArgs(sys.argv[1:])
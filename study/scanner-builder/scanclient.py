@@ -0,0 +1,166 @@
+#!/usr/bin/python
+##------------------------------------------------------------------------------
+##
+## scanclient.py -- Thin client for the compile server (compileserver.py):
+##                  runs a scanbuild command in the server, which already has
+##                  the tools loaded and recently built DFAs in memory.
+##
+## The client is a drop-in replacement for scanbuild.py: it takes the same
+## command-line, sends it (and, for nfa2dfa, standard input) to the server,
+## and writes what the command wrote to standard output and standard error.
+## Only this small module (and the socket module) is loaded, so it starts in
+## a fraction of the time the tools themselves take.  If no server is
+## listening, the command is simply run in this process, as by scanbuild.
+##
+## Use:
+##
+##     From the command-line:
+##
+##       $ ./scanclient.py [-socket <path>] <command> [<option(s)>] [<argument(s)>]
+##       $ ./scanclient.py [-socket <path>] -stats
+##       $ ./scanclient.py [-socket <path>] -stop
+##
+##     where <command> and its options and arguments are as for scanbuild.py,
+##     e.g.,
+##
+##       $ ./scanclient.py re2dfa -min -tab '(a|b)*abb'
+##       $ ./scanclient.py re2nfa '(a|b)*abb' | ./scanclient.py nfa2dfa -min -tab
+##
+##     "-stats" prints the server's request count and DFA cache statistics;
+##     "-stop" shuts the server down.
+##
+##     The server's socket is <path>, or else the one named by the
+##     environment variable SCANBUILD_SOCKET, or else /tmp/scanbuild-<uid>.sock.
+##
+## Wire format.  A request and a response are each a list of byte strings
+## ("fields"), sent as the number of fields on a line, then each field as its
+## length on a line followed by its bytes.  A request is [command, standard
+## input, argument1, ... argumentN]; a response is [status, standard output,
+## standard error].  Commands "stats" and "stop" are handled by the server
+## itself.
+##
+## Functions:
+##
+##          socketPath()            -- The default socket path (see above).
+##          writeFields(stream,fields)
+##                                  -- Write a list of fields to a file object.
+##          readFields(stream)      -- Read a list of fields (None at end of
+##                                     input).
+##          sendRequest(command,args,stdin="",path=None)
+##                                  -- Run a command in the server, returning
+##                                     (status,stdout,stderr), or None if no
+##                                     server is listening.
+##
+##
+import os
+import sys
+import socket
+
+STDIN_COMMANDS = ("nfa2dfa",)       ## Commands reading standard input.
+
+
+def socketPath():
+    "Return the path of the compile server's socket."
+    path = os.environ.get("SCANBUILD_SOCKET")
+    if path: return path
+    return "/tmp/scanbuild-%d.sock" % os.getuid()
+
+
+def writeFields(stream,fields):
+    "Write a list of byte strings to a file object, in the wire format."
+    stream.write("%d\n" % len(fields))
+    for field in fields: stream.write("%d\n%s" % (len(field),field))
+    stream.flush()
+
+
+def readFields(stream):
+    "Read a list of byte strings written by writeFields, None at end of input."
+    line = stream.readline()
+    if not line: return None
+    fields = []
+    for i in xrange(int(line)):
+        size = int(stream.readline())
+        field = stream.read(size)
+        if len(field) < size: raise EOFError, "connection closed"
+        fields.append(field)
+    return fields
+
+
+def sendRequest(command,args,stdin="",path=None):
+    """Run a command in the compile server, returning (status,stdout,stderr),
+       or None if there is no server listening on the socket."""
+    if not hasattr(socket,"AF_UNIX"): return None   ## No Unix sockets (Windows).
+    sock = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+    try:
+        try: sock.connect(path or socketPath())
+        except socket.error: return None
+        stream = sock.makefile("rwb")
+        writeFields(stream,[command,stdin] + list(args))
+        response = readFields(stream)
+        stream.close()
+    finally:
+        sock.close()
+    if response is None or len(response) != 3: raise EOFError, "no response from the server"
+    return int(response[0]),response[1],response[2]
+
+
+##------------------------------------------------------------------------------
+##
+## Command-line handling.
+##
+##
+def processArgs(argList):
+    path = None
+    if len(argList) > 1 and argList[0] == "-socket":
+        path,argList = argList[1],argList[2:]
+    if len(argList) == 0 or argList[0].startswith("-h"):
+        print_help_text()
+        return 0
+    if argList[0] in ("-stats","-stop"):
+        result = sendRequest(argList[0][1:],[],"",path)
+        if result is None:
+            print "No compile server is listening on %s" % (path or socketPath())
+            return 1
+    else:
+        command,args = argList[0],argList[1:]
+        stdin = ""
+        if command in STDIN_COMMANDS and not (args and args[0].startswith("-h")):
+            stdin = sys.stdin.read()
+        result = sendRequest(command,args,stdin,path)
+        if result is None:
+            ## No server: run the command here, as scanbuild does.
+            from StringIO import StringIO
+            import scanbuild
+            sys.stdin = StringIO(stdin)
+            scanbuild.processArgs(argList)
+            return 0
+    status,output,errors = result
+    sys.stdout.write(output)     ## Unix only, so no binary mode to set.
+    sys.stderr.write(errors)
+    return status
+
+
+def print_help_text():
+    print """    Use:
+
+         From the command-line
+
+           $ ./scanclient.py [-socket <path>] <command> [<option(s)>] [<argument(s)>]
+
+         Run a scanbuild command (re2nfa, nfa2dfa, re2dfa ...) in the
+         compile server (see compileserver.py), exactly as
+         "scanbuild.py <command> ..." would run it.  If no server is
+         listening, the command is run in this process.
+
+           $ ./scanclient.py [-socket <path>] -stats
+           $ ./scanclient.py [-socket <path>] -stop
+
+         Report the server's statistics, or stop it.
+
+         The socket is <path>, $SCANBUILD_SOCKET, or
+         /tmp/scanbuild-<uid>.sock.
+    """
+
+
+if __name__ == "__main__":
+    sys.exit(processArgs(sys.argv[1:]))
@@ -0,0 +1,393 @@
+##------------------------------------------------------------------------------
+##
+## tdfa.py -- Submatch extraction with a tagged DFA: scanning that reports,
+##            for each token, the spans matched by the named groups,
+##            (?<name>r), of its RE, in the same single pass over the input.
+##
+## Each group has two "tags", its opening and closing boundaries.  The
+## construction (after Laurikari, "NFAs with tagged transitions, their
+## conversion to deterministic automata and application to regular
+## expressions", SPIRE 2000) is:
+##
+##     1. A position analysis, as for followpos.py, in which every
+##        transition between positions also records the tags crossed on the
+##        way (e.g., from the last character before a group to its first,
+##        the group's opening tag).  The transitions out of each position
+##        are kept in priority order: earlier alternatives first (an
+##        alternative's empty match ranking where that alternative does), and
+##        another time round a loop before leaving it (so that, as in Perl,
+##        the leftmost alternative and the longest repetition win).
+##
+##     2. A subset construction over *ordered* lists of positions (the
+##        "configurations" of the state, highest priority first).  Each
+##        configuration has a row of tag values (its "registers").  Every
+##        DFA transition carries a small program, computed once, saying, for
+##        each configuration of the target state, which configuration of the
+##        source it comes from and which of its tags to set to the current
+##        input position.  Likewise each accepting state has a program for
+##        the tags of the match it accepts.
+##
+## Scanning then runs the DFA as usual, running each transition's program on
+## the registers as it goes: no backtracking and no second pass over the
+## token.  The tokens are the same as those of DFA.scan (longest match, the
+## earliest RE winning ties); a group that took no part in a match has span
+## None, and a group inside a Kleene closure reports its last iteration.
+##
+## Function:
+##
+##          taggedDFA(regExpressions)
+##
+##              Arguments:
+##
+##                  regExpressions - As for parseREs: either a string
+##                            containing a number of (space-separated) REs,
+##                            or a list of strings, each holding one RE.
+##                            Group names must be distinct within an RE.
+##
+##              Returns: a TaggedDFA object (or None if there is an error in
+##                       an RE).
+##
+## Class:
+##
+##          TaggedDFA
+##
+##              methods: scan  -- tokenise a string, as DFA.scan, returning
+##                                a list of (regExpr,matched-string,groups)
+##                                tuples, where groups maps each group name
+##                                of the RE to its (start,end) span in the
+##                                string, or None.
+##                       show  -- print the states and their programs.
+##
+##
+from retree import parseTrees, Char, CharClass, Group, Repeat, Alt, Concat, Star, EPSILON
+
+
+##------------------------------------------------------------------------------
+##
+## TaggedPositions: the position analysis, with tags (see header).  Positions
+## are numbered from 1; position 0 is a virtual position before the start of
+## every RE, whose follow list is the firstpos of all of them.
+##
+## Fields are:
+##
+##    symbols:    Per position, the tuple of characters it matches (empty
+##                for end-markers and position 0).
+##
+##    follow:     Per position, the list of (position,tags) pairs it can be
+##                followed by, in priority order, each position at most once.
+##                tags is the tuple of tags crossed on the way.  While the
+##                analysis runs, the follow list of a last position also holds
+##                an "exit", (None,tags), standing for whatever follows the
+##                subtree analysed so far: keeping it in the list, rather than
+##                appending what follows at the end, keeps a nullable item's
+##                empty match ahead of lower-priority alternatives.
+##
+##    accepts:    A dictionary mapping each end-marker position to the index
+##                of the RE it terminates.
+##
+##    groups:     Per RE, a list of (name,tag,group) triples: the opening tag of
+##                each group, whose closing tag is tag+1, and its tree node.
+##
+##    tagCount:   The number of tags.
+##
+##
+class TaggedPositions(object):
+    "The tagged firstpos/followpos analysis of a list of RE syntax trees."
+    def __init__(this,trees):
+        this.symbols = [()]
+        this.follow = [[]]
+        this.accepts = {}
+        this.groups = []
+        this.tagCount = 0
+        this.regExprs = [tree.toString() for tree in trees]
+        for i,tree in enumerate(trees):
+            this.groups.append([])
+            names = groupNames(tree)
+            for name in set(names):
+                if names.count(name) > 1:
+                    print "Error: group name '%s' used twice in RE %s" % (name,this.regExprs[i])
+                    raise ValueError, name
+            first,last = this.analyse(tree,i)
+            endMarker = this.newPosition(())
+            this.accepts[endMarker] = i
+            for p in last: this.resolve(p,[(endMarker,())])
+            this.addFollow(0,continueWith(first,[(endMarker,())]))
+
+    def newPosition(this,symbols):
+        "Allocate a new position, matching the characters in symbols."
+        this.symbols.append(symbols)
+        this.follow.append([])
+        return len(this.symbols) - 1
+
+    def addFollow(this,p,pairs):
+        "Add (position,tags) pairs to the follow list of p, keeping the first for each position."
+        this.follow[p] = firstOfEach(this.follow[p] + pairs)
+
+    def resolve(this,p,pairs):
+        """Replace the exit, (None,tags), in the follow list of p by pairs, a
+           list of (position,tags) pairs (which may hold an exit itself)."""
+        this.follow[p] = continueWith(this.follow[p],pairs)
+
+    def analyse(this,tree,re):
+        """Return (first,last) for a syntax tree.  first is the list of
+           (position,tags) pairs for its first positions, in priority order,
+           with tags crossed before each; if the tree is nullable, one entry
+           is (None,tags), the exit, for the empty match.  last is the list of
+           its last positions: the follow list of each of these holds an exit
+           at its place in the priority order, resolved by "resolve" once what
+           follows the tree is known.  Follow lists are added to along the
+           way."""
+        if isinstance(tree,Char) or (isinstance(tree,CharClass) and tree.chars is not None):
+            if isinstance(tree,Char): p = this.newPosition((tree.ch,))
+            else: p = this.newPosition(tuple(sorted(tree.chars)))
+            this.follow[p] = [(None,())]
+            return [(p,())],[p]
+        if tree is EPSILON: return [(None,())],[]
+        if isinstance(tree,Group):
+            ## The copies of a group in a written-out repetition (the same
+            ## node, see retree.py) share its tags; "groupNames" has already
+            ## checked that no name is written twice.
+            openTag = None
+            for name,tag,group in this.groups[re]:
+                if name == tree.name: openTag = tag
+            if openTag is None:
+                openTag = this.tagCount
+                this.tagCount += 2
+                this.groups[re].append((tree.name,openTag,tree))
+            first,last = this.analyse(tree.items[0],re)
+            for p in last: this.resolve(p,[(None,(openTag+1,))])
+            return [(q,(openTag,)+tags+(openTag+1,)) if q is None else (q,(openTag,)+tags)
+                    for q,tags in first],last
+        if isinstance(tree,Star):
+            ## Another time round the loop before leaving it.
+            first,last = this.analyse(tree.item,re)
+            ## As in Perl and re, a body that can match the empty string
+            ## does so once more on the way out (setting its tags).
+            exit = [(q,tags) for q,tags in first if q is None] or [(None,())]
+            loop = [(q,tags) for q,tags in first if q is not None] + exit
+            for p in last: this.resolve(p,loop)
+            return loop,last
+        if isinstance(tree,Alt):
+            first,last = [],[]
+            for item in tree.items:
+                f,l = this.analyse(item,re)
+                first.extend(f)
+                last.extend(l)
+            return firstOfEach(first),last
+        assert isinstance(tree,Concat)
+        first,last = this.analyse(tree.items[0],re)
+        for item in tree.items[1:]:
+            f,l = this.analyse(item,re)
+            for p in last: this.resolve(p,f)
+            first = continueWith(first,f)
+            if hasExit(f): last = l + last
+            else: last = l
+        return first,last
+
+
+def groupNames(tree):
+    """Return the list of the group names in a syntax tree, as written: a
+       repetition's item is counted once, not once per copy."""
+    if isinstance(tree,Group): return [tree.name] + groupNames(tree.items[0])
+    if isinstance(tree,Repeat): return groupNames(tree.item)
+    if isinstance(tree,(Alt,Concat)) and not isinstance(tree,CharClass):
+        return [name for item in tree.items for name in groupNames(item)]
+    if isinstance(tree,Star): return groupNames(tree.item)
+    return []
+
+def firstOfEach(pairs):
+    "Keep only the first (highest priority) of the (position,tags) pairs for each position."
+    present = set()
+    result = []
+    for q,tags in pairs:
+        if not q in present:
+            present.add(q)
+            result.append((q,tags))
+    return result
+
+def continueWith(pairs,following):
+    """Replace the exit, (None,tags), in a priority-ordered list of
+       (position,tags) pairs by the pairs following it, each with tags
+       prefixed."""
+    for i,(q,tags) in enumerate(pairs):
+        if q is None:
+            return firstOfEach(pairs[:i] + [(r,tags+rTags) for r,rTags in following] + pairs[i+1:])
+    return pairs
+
+def hasExit(pairs):
+    "True if a list of (position,tags) pairs holds an exit."
+    for q,tags in pairs:
+        if q is None: return True
+    return False
+
+
+##------------------------------------------------------------------------------
+##
+## TaggedDFA (see header).  Fields are:
+##
+##    states:      Per state, the tuple of its configurations (positions,
+##                 highest priority first).  State 0 is the start state,
+##                 whose only configuration is the virtual position 0.
+##
+##    transitions: Per state, a dictionary mapping each character to a pair
+##                 (target,program), where program has an entry per
+##                 configuration of the target: (source,tags), the index of
+##                 the source configuration and the tags to set.
+##
+##    accepting:   Per state, None, or (re,source,tags): the RE accepted, and
+##                 the configuration (and the tags to set) giving its tags.
+##
+##
+class TaggedDFA(object):
+    "A tagged DFA, scanning with submatch extraction."
+    def __init__(this,positions):
+        this.regExprs = positions.regExprs
+        this.groups = positions.groups
+        this.tagCount = positions.tagCount
+        symbols,follow,accepts = positions.symbols,positions.follow,positions.accepts
+        this.alphabet = set([ch for chars in symbols for ch in chars])
+        this.states = [(0,)]
+        this.transitions = []
+        this.accepting = []
+        stateNumbers = {(0,): 0}
+        index = 0
+        while index < len(this.states):
+            configurations = this.states[index] ; index += 1
+            moves = {}      ## Character -> list of (position,source,tags), in priority order.
+            best = None
+            for source,p in enumerate(configurations):
+                for q,tags in follow[p]:
+                    if q in accepts:
+                        if best is None or accepts[q] < best[0]: best = (accepts[q],source,tags)
+                    else:
+                        for ch in symbols[q]: moves.setdefault(ch,[]).append((q,source,tags))
+            this.accepting.append(best)
+            row = {}
+            for ch,targets in moves.iteritems():
+                seen = set()
+                target,program = [],[]
+                for q,source,tags in targets:
+                    if not q in seen:
+                        seen.add(q)
+                        target.append(q)
+                        program.append((source,tags))
+                target = tuple(target)
+                if not target in stateNumbers:
+                    stateNumbers[target] = len(this.states)
+                    this.states.append(target)
+                row[ch] = (stateNumbers[target],tuple(program))
+            this.transitions.append(row)
+        this.stateCount = len(this.states)
+
+    def scan(this,string):
+        """Tokenise a string, as DFA.scan, returning (regExpr,matched-string,groups)
+           tuples, where groups maps the RE's group names to (start,end) spans."""
+        transitions,accepting = this.transitions,this.accepting
+        matches = []
+        start = 0
+        noTags = [-1] * this.tagCount
+        while True:
+            state = 0
+            registers = [noTags]    ## Tag values, per configuration.
+            matched = None
+            i = start
+            while True:
+                accept = accepting[state]
+                if accept is not None:
+                    tags = list(registers[accept[1]])
+                    for tag in accept[2]: tags[tag] = i
+                    matched,end,matchTags = accept[0],i,tags
+                if i >= len(string): break
+                move = transitions[state].get(string[i])
+                if move is None: break
+                state,program = move
+                newRegisters = []
+                for source,setTags in program:
+                    if setTags:
+                        tags = list(registers[source])
+                        for tag in setTags: tags[tag] = i
+                        newRegisters.append(tags)
+                    else: newRegisters.append(registers[source])
+                registers = newRegisters
+                i += 1
+            if matched is None: break
+            groups = {}
+            for name,tag,group in this.groups[matched]:
+                if matchTags[tag] >= 0 and matchTags[tag+1] >= 0:
+                    groups[name] = (matchTags[tag],matchTags[tag+1])
+                else: groups[name] = None
+            matches.append((this.regExprs[matched],string[start:end],groups))
+            if end == start: break     ## Empty match.
+            start = end
+        return matches
+
+    def show(this):
+        "Print the states, with their configurations and programs."
+        for s,configurations in enumerate(this.states):
+            line = "State %d: positions %s" % (s,", ".join([str(p) for p in configurations]))
+            if this.accepting[s] is not None:
+                re,source,tags = this.accepting[s]
+                line += "  accepts %s (from %d, set %s)" % (this.regExprs[re],source,list(tags))
+            print line
+            for ch in sorted(this.transitions[s]):
+                target,program = this.transitions[s][ch]
+                print "    '%s' -> %d  %s" % (ch,target,
+                      "; ".join(["%d%s" % (source,"".join([" t%d" % t for t in tags]))
+                                 for source,tags in program]))
+
+
+##------------------------------------------------------------------------------
+##
+## taggedDFA: build a tagged DFA for a list of REs (see header).
+##
+##
+def taggedDFA(regExpressions):
+    "Build a tagged DFA, for scanning with group spans, for a list of REs."
+    trees = parseTrees(regExpressions)
+    if trees is None: return None
+    try:
+        positions = TaggedPositions(trees)
+    except ValueError:
+        return None
+    return TaggedDFA(positions)
+
+
+##------------------------------------------------------------------------------
+##
+## checkAgainstRe: a regression check of the group spans against Python's
+## "re" module (whose groups follow the same leftmost-greedy rules), over
+## every string of up to "length" characters from "alphabet" that the RE
+## matches in full.  Prints each disagreement and returns their number.
+## Run as "python tdfa.py" to check a set of REs with nullable alternatives,
+## nested groups and loops.
+##
+##
+CHECK_RES = ["((?<x>b*)|(?<y>a))a*", "(?<x>a*)(?<y>a*)", "((?<x>a)|(?<y>b*))*c",
+             "(?<x>ab|a)(?<y>b*)", "((?<x>a*)(?<y>b*))*", "(?<o>(?<i>a)*b)*",
+             "(a|(?<x>b*))(?<y>ab|b)", "(?<x>(ab|a)(c|bcd))(?<y>d*)"]
+
+def checkAgainstRe(regExpr,alphabet="abc",length=5):
+    "Compare the group spans of taggedDFA with those of Python's re (see above)."
+    import re, itertools
+    tdfa = taggedDFA([regExpr])
+    pattern = re.compile("(?:%s)\\Z" % regExpr.replace("(?<","(?P<"))
+    failures = 0
+    for n in range(length+1):
+        for chars in itertools.product(alphabet,repeat=n):
+            string = "".join(chars)
+            expected = pattern.match(string)
+            if expected is None: continue
+            groups = tdfa.scan(string)[0][2]
+            for name in pattern.groupindex:
+                span = expected.span(name)
+                if span == (-1,-1): span = None
+                if groups[name] != span:
+                    print "%s on '%s': group %s is %s, re gives %s" % \
+                          (regExpr,string,name,groups[name],span)
+                    failures += 1
+    return failures
+
+
+if __name__ == "__main__":
+    failures = sum([checkAgainstRe(regExpr) for regExpr in CHECK_RES])
+    print "%d REs checked against re, %d disagreements." % (len(CHECK_RES),failures)
@@ -0,0 +1,159 @@
+##------------------------------------------------------------------------------
+##
+## utf8.py -- UTF-8 encoding of Unicode code-point ranges as byte-range
+##            sequences, for building byte-level automata.
+##
+## The automata built here treat every distinct character as an alphabet
+## symbol.  A character class such as "all Cyrillic letters" or "all CJK
+## ideographs" has thousands (or tens of thousands) of code points, which
+## would make the alphabet, the subset construction and every transition
+## table enormous.  Instead, a class is compiled into a small RE over the
+## *bytes* of the UTF-8 encodings of its code points, so the alphabet of any
+## automaton is at most the 256 byte values, and a scanner runs directly
+## over UTF-8 encoded text, with no decoding step.
+##
+## The compilation rests on the fact that the UTF-8 encodings of a range of
+## code points with the same encoded length, split suitably, are exactly the
+## byte strings matching a sequence of byte ranges.  For example
+##
+##     U+0400..U+04FF  (Cyrillic)      ->  [D0-D3][80-BF]
+##     U+4E00..U+9FFF  (CJK)           ->  [E4][B8-BF][80-BF]
+##                                         [E5-E9][80-BF][80-BF]
+##
+## (the method of Russ Cox's "utf8-ranges", also used by RE2 and Go's
+## regexp package).  A range is split at the boundaries between encoded
+## lengths (U+007F, U+07FF, U+FFFF), then recursively at the points where
+## its first and last code points stop sharing the leading bytes of their
+## encodings, until each piece is a product of byte ranges.  The surrogate
+## code points U+D800..U+DFFF, which are not valid in UTF-8, are left out.
+##
+## Functions:
+##
+##          utf8Sequences(lo,hi)
+##                  -- Return the list of byte-range sequences matching the
+##                     UTF-8 encodings of code points lo..hi.  Each sequence
+##                     is a list of (firstByte,lastByte) pairs of integers.
+##
+##          encodeCodePoint(codePoint)
+##                  -- The UTF-8 encoding (a byte string) of a code point.
+##
+##          decodeCodePoint(string,index)
+##                  -- Decode the UTF-8 character starting at string[index].
+##                     Returns (codePoint,nextIndex), or None if the bytes
+##                     there aren't valid UTF-8.
+##
+##          normaliseRanges(ranges)
+##                  -- Sort a list of (lo,hi) code-point ranges, merging any
+##                     that overlap or touch.
+##
+##          complementRanges(ranges)
+##                  -- The ranges of all the code points (surrogates
+##                     excepted) *not* in a normalised list of ranges.
+##
+##
+MAX_CODE_POINT = 0x10FFFF
+SURROGATES = (0xD800,0xDFFF)
+
+## The largest code point with an encoding of each length, 1 to 4 bytes.
+LENGTH_LIMITS = (0x7F,0x7FF,0xFFFF,0x10FFFF)
+
+
+def encodeCodePoint(codePoint):
+    "Return the UTF-8 encoding of a code point as a byte string."
+    if codePoint <= 0x7F: return chr(codePoint)
+    if codePoint <= 0x7FF:
+        return chr(0xC0 | codePoint >> 6) + chr(0x80 | codePoint & 0x3F)
+    if codePoint <= 0xFFFF:
+        return chr(0xE0 | codePoint >> 12) + chr(0x80 | codePoint >> 6 & 0x3F) + \
+               chr(0x80 | codePoint & 0x3F)
+    return chr(0xF0 | codePoint >> 18) + chr(0x80 | codePoint >> 12 & 0x3F) + \
+           chr(0x80 | codePoint >> 6 & 0x3F) + chr(0x80 | codePoint & 0x3F)
+
+
+def decodeCodePoint(string,index):
+    "Decode the UTF-8 character at string[index], returning (codePoint,nextIndex) or None."
+    lead = ord(string[index])
+    if lead <= 0x7F: return lead,index+1
+    if 0xC2 <= lead <= 0xDF: length,codePoint = 2,lead & 0x1F
+    elif 0xE0 <= lead <= 0xEF: length,codePoint = 3,lead & 0x0F
+    elif 0xF0 <= lead <= 0xF4: length,codePoint = 4,lead & 0x07
+    else: return None
+    if index + length > len(string): return None
+    for ch in string[index+1:index+length]:
+        if ord(ch) & 0xC0 != 0x80: return None
+        codePoint = codePoint << 6 | ord(ch) & 0x3F
+    ## Reject over-long encodings, surrogates and values beyond U+10FFFF.
+    if codePoint <= LENGTH_LIMITS[length-2] or codePoint > MAX_CODE_POINT or \
+       SURROGATES[0] <= codePoint <= SURROGATES[1]: return None
+    return codePoint,index+length
+
+
+##------------------------------------------------------------------------------
+##
+## utf8Sequences (see header).
+##
+##
+def utf8Sequences(lo,hi):
+    "Return the byte-range sequences matching the UTF-8 encodings of code points lo..hi."
+    sequences = []
+    pending = [(lo,hi)]
+    while pending:
+        lo,hi = pending.pop()
+        if lo > hi: continue
+        ## Leave out the surrogates.
+        if lo <= SURROGATES[1] and hi >= SURROGATES[0]:
+            pending.append((SURROGATES[1]+1,hi))
+            pending.append((lo,SURROGATES[0]-1))
+            continue
+        ## Split at the boundaries between encoded lengths.
+        for limit in LENGTH_LIMITS[:-1]:
+            if lo <= limit < hi:
+                pending.append((limit+1,hi))
+                pending.append((lo,limit))
+                break
+        else:
+            if hi <= 0x7F:
+                sequences.append([(lo,hi)])
+                continue
+            ## Split until all but the leading bytes of lo and hi span their
+            ## full range of continuation bytes.
+            for i in (1,2,3):
+                mask = (1 << 6*i) - 1
+                if lo & ~mask != hi & ~mask:
+                    if lo & mask != 0:
+                        pending.append(((lo | mask) + 1,hi))
+                        pending.append((lo,lo | mask))
+                        break
+                    if hi & mask != mask:
+                        pending.append((hi & ~mask,hi))
+                        pending.append((lo,(hi & ~mask) - 1))
+                        break
+            else:
+                first,last = encodeCodePoint(lo),encodeCodePoint(hi)
+                sequences.append([(ord(a),ord(b)) for a,b in zip(first,last)])
+    return sequences
+
+
+##------------------------------------------------------------------------------
+##
+## Range-list operations, for building classes from their members.
+##
+##
+def normaliseRanges(ranges):
+    "Sort a list of (lo,hi) code-point ranges, merging overlapping or adjacent ones."
+    merged = []
+    for lo,hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + 1:
+            if hi > merged[-1][1]: merged[-1] = (merged[-1][0],hi)
+        else: merged.append((lo,hi))
+    return merged
+
+
+def complementRanges(ranges):
+    "Return the code-point ranges not in a normalised list of ranges."
+    complement = []
+    nextFree = 0
+    for lo,hi in ranges + [(MAX_CODE_POINT+1,MAX_CODE_POINT+1)]:
+        if lo > nextFree: complement.append((nextFree,lo-1))
+        nextFree = max(nextFree,hi+1)
+    return complement